@@ -1,29 +1,30 @@
 import asyncio
 import os
 import logging
-import spotipy
-from bson import ObjectId
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Literal
 from datetime import datetime
-from fastapi import FastAPI,HTTPException, status, Body, Request, Query,Response
+from fastapi import FastAPI,HTTPException, status, Body, Request, Query,Response, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from dotenv import load_dotenv
-from tenacity import retry, wait_exponential, stop_after_attempt
-from fastapi.responses import RedirectResponse
-from functools import lru_cache
+from fastapi.responses import RedirectResponse, StreamingResponse
+from functools import lru_cache, partial
+from contextlib import asynccontextmanager
 
 # Dahili Modüller
 from playlist_creator import PlaylistCreator
-from spotify_auth import auth_manager
+from spotify_auth import auth_manager, AuthContext, USER_COOKIE
 from data_store import (
     cache_tracks,
     get_cached_tracks,
     save_analysis,
+    save_analysis_trace,
     load_analysis,
+    analysis_exists,
     save_user_tracks,
     save_playlist_records,
-    check_mongo_connection
+    MongoDBManager,
+    drain_write_behind_queues,
+    get_write_behind_stats
 )
 from workflow import (
     create_playlists,
@@ -31,7 +32,10 @@ from workflow import (
     analyze_genres,
     get_breakdown_for_analysis,
     get_analysis_details,
+    stream_analysis_details,
     get_filtered_genres,
+    get_genre_clusters,
+    group_by_clusters,
     get_user_analysis_history,
     delete_user_analysis_history
 )
@@ -40,23 +44,58 @@ from utils import (
     RateLimiter,
     validate_track_ids,
     chunk_list,
-    smart_request_with_retry
+    smart_request_with_retry,
+    create_spotify_client
 )
 from logger import configure_logging
+from models import AnalysisIndex, tracks_to_dicts
+from genre_clustering import DEFAULT_CLUSTER_COUNT, MAX_CLUSTER_COUNT
+import metrics
+import tracing
+import health
+import progress
+import retry_budget
+from retry_budget import RetryBudgetMiddleware
+from responses import (
+    FastJSONResponse,
+    CompressionMiddleware,
+    analysis_etag,
+    content_etag,
+    cache_headers,
+    not_modified,
+    ndjson_chunks,
+    NDJSON_MEDIA_TYPE,
+    DERIVED_CACHE_CONTROL
+)
 
 # --- Konfigürasyon ---
-load_dotenv()
 configure_logging()
 logger = logging.getLogger(__name__)
 
+# --- Uygulama Yaşam Döngüsü ---
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    MongoDBManager.bootstrap_schema()
+    health.monitor.start()
+    yield
+    health.monitor.stop()
+    await asyncio.to_thread(drain_write_behind_queues)
+
 # --- CORS Ayarı ---
 app = FastAPI(
     title="Spotify Analytics API",
     version="2.3.0",
     description="Spotify kullanıcı analizleri ve playlist yönetimi için gelişmiş API",
-    docs_url="/docs"
+    docs_url="/docs",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
+app.add_middleware(CompressionMiddleware)
+# İstek başına ortak yeniden deneme bütçesi ve son tarih (tüm tenacity katmanları için)
+app.add_middleware(RetryBudgetMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://127.0.0.1:5173"],
@@ -79,20 +118,17 @@ class PlaylistCreateRequest(BaseModel):
     confirmation: bool
     selected_tracks: Optional[Dict[str, List[str]]] = None
     excluded_track_ids: Optional[List[str]] = None
-
-# --- Retry Ayarları ---
-SPOTIFY_RETRY_CONFIG = {
-    'wait': wait_exponential(multiplier=1, min=2, max=30),
-    'stop': stop_after_attempt(5),
-    'reraise': True
-}
+    # "clusters": playlistler birincil tür yerine tür kümelerine göre oluşturulur
+    grouping: Literal["genres", "clusters"] = "genres"
+    k: int = Field(default=DEFAULT_CLUSTER_COUNT, ge=1, le=MAX_CLUSTER_COUNT)
 
 # --- Yardımcı Fonksiyonlar ---
-def get_spotify_client(request: Request | None = None):
-    if request:
-        user_id = request.cookies.get("spotify_user_id")
-        auth_manager.set_current_user(user_id)
-    return auth_manager.get_valid_client()
+def get_auth_context(request: Request) -> AuthContext:
+    """Kimliği her istek için çerezden oluşturur; istekler arasında kullanıcı durumu paylaşılmaz"""
+    auth = AuthContext.from_cookies(request.cookies)
+    if not auth.user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Giriş yapılmamış")
+    return auth
 
 # --- Giriş ve Auth Endpointleri ---
 @app.get("/hello")
@@ -118,14 +154,12 @@ def start_auth():
 @app.get("/auth/callback")
 def auth_callback(code: str):
     try:
-        token_info = auth_manager.oauth.get_access_token(code)
-        token_info = auth_manager._add_metadata(token_info)
+        token_info = auth_manager.exchange_code(code)
 
-        sp = spotipy.Spotify(auth=token_info["access_token"])
+        sp = create_spotify_client(auth=token_info["access_token"])
         user = sp.me()
         user_id = user.get("id")
 
-        auth_manager.set_current_user(user_id)
         auth_manager._save_token(token_info, user_id)
 
         response = RedirectResponse(
@@ -134,29 +168,48 @@ def auth_callback(code: str):
                 "http://127.0.0.1:5173/callback?login=success",
             )
         )
-        response.set_cookie("spotify_user_id", user_id, httponly=True, samesite="lax")
+        response.set_cookie(USER_COOKIE, user_id, httponly=True, samesite="lax")
         return response
     except Exception as e:
         logger.error(f"Auth callback hatası: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Authentication failed")
 
+# --- Sağlık Kontrolleri (arka plan kontrollerinin önbelleklenmiş durumu) ---
 @app.get("/health", summary="Sistem Sağlık Durumu")
-async def health_check():
-    try:
-        health_status = {
-            "mongo_connected": check_mongo_connection(),
-            "spotify_connected": False,
-            "environment": os.getenv("ENVIRONMENT", "development"),
-            "version": app.version
-        }
-
-        sp = get_spotify_client()
-        user = smart_request_with_retry(sp.me)
-        health_status["spotify_connected"] = bool(user.get("id"))
-
-        return ApiResponseFormatter.success(health_status)
-    except Exception as e:
-        return ApiResponseFormatter.error(e)
+def health_check():
+    dependencies = health.monitor.dependencies()
+    return ApiResponseFormatter.success({
+        "status": health.monitor.status(),
+        "mongo_connected": dependencies["mongo"]["status"] == "up",
+        "spotify_connected": dependencies["spotify"]["status"] == "up",
+        "dependencies": dependencies,
+        "environment": os.getenv("ENVIRONMENT", "development"),
+        "version": app.version,
+        "uptime_s": health.monitor.uptime(),
+        "write_behind": get_write_behind_stats()
+    })
+
+@app.get("/health/live", summary="Canlılık Kontrolü")
+def liveness_check(response: Response):
+    alive = health.monitor.is_alive()
+    if not alive:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"status": "alive" if alive else "probes_stopped", "uptime_s": health.monitor.uptime()}
+
+@app.get("/health/ready", summary="Hazırlık Kontrolü")
+def readiness_check(response: Response):
+    ready, dependencies = health.monitor.readiness()
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {
+        "status": "ready" if ready else "not_ready",
+        "critical": list(health.monitor.critical),
+        "dependencies": {name: dep["status"] for name, dep in dependencies.items()}
+    }
+
+@app.get("/metrics", summary="Prometheus Metrikleri", include_in_schema=False)
+def metrics_endpoint():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 # --- Analiz Başlat ---
 @app.post("/analyze", status_code=status.HTTP_410_GONE)
@@ -165,38 +218,62 @@ async def analyze_playlist(_: AnalysisRequest):
     raise HTTPException(status_code=status.HTTP_410_GONE, detail="Playlist analysis feature has been removed")
 
 @app.post("/analyze-liked", status_code=status.HTTP_202_ACCEPTED)
-@retry(**SPOTIFY_RETRY_CONFIG)
-async def analyze_liked_tracks(request: Request):
+async def analyze_liked_tracks(auth: AuthContext = Depends(get_auth_context)):
     try:
-        sp = get_spotify_client()
-
-        tracks = get_user_tracks(sp, max_tracks=50)
-        if not tracks:
-            raise HTTPException(status_code=404, detail="Beğenilen şarkı bulunamadı.")
-
-        track_ids = [t["id"] for t in tracks]
-        genre_map = analyze_genres(track_ids)
-
-        user_id = smart_request_with_retry(sp.me)["id"]
-        analysis_id = save_analysis({
-            "source": "liked_tracks",
-            "user_id": user_id,
-            "tracks": tracks,
-            "genres": genre_map,
-            "created_at": datetime.utcnow()
-        })
-
-        save_user_tracks(user_id, tracks)
-
-        return ApiResponseFormatter.success({"analysis_id": analysis_id})
+        # Bloklayan iş akışı thread'de çalışır; event loop SSE ilerleme olaylarını anında iletebilir.
+        # to_thread contextvar'ları kopyalar: ilerleme kanalı, trace ve retry bütçesi korunur.
+        return await asyncio.to_thread(_analyze_liked_tracks, auth)
 
     except Exception as e:
         logger.error(f"Beğenilen şarkı analizi hatası: {str(e)}", exc_info=True)
         return ApiResponseFormatter.error(e)
 
+def _analyze_liked_tracks(auth: AuthContext) -> Dict:
+    user_id = auth.user_id
+    with progress.bind(user_id, "analyze_liked"), tracing.start_trace("analyze_liked", user_id=user_id) as trace:
+        progress.stage("initialization")
+        with tracing.span("initialization"):
+            sp = auth.client
+
+        progress.stage("track_loading", max_tracks=50)
+        with tracing.span("track_loading"):
+            tracks = get_user_tracks(sp, max_tracks=50)
+        if not tracks:
+            raise HTTPException(status_code=404, detail="Beğenilen şarkı bulunamadı.")
+
+        track_ids = [t.id for t in tracks]
+        genre_map = analyze_genres(track_ids, sp)
+
+        budget = retry_budget.current_budget()
+        if budget is not None:
+            tracing.set_attribute("retry_budget", budget.to_dict())
+
+        progress.stage("persistence")
+        with tracing.span("persistence"):
+            track_dicts = tracks_to_dicts(tracks)
+            analysis_id = save_analysis({
+                "source": "liked_tracks",
+                "user_id": user_id,
+                "tracks": track_dicts,
+                "genres": genre_map,
+                "created_at": datetime.utcnow()
+            })
+            save_user_tracks(user_id, track_dicts)
+        progress.completed("analyze_liked", analysis_id=analysis_id, tracks=len(tracks), genres=len(genre_map))
+
+    trace.log_summary()
+    trace_data = trace.to_dict()
+    save_analysis_trace(analysis_id, trace_data)
+    return ApiResponseFormatter.success({"analysis_id": analysis_id, "trace": trace_data})
+
 # --- Playlist Oluşturma ---
 @app.post("/playlists/full-auto")
-async def full_auto_playlist_creation(analysis_id: str = Body(..., embed=True)):
+async def full_auto_playlist_creation(
+        analysis_id: str = Body(..., embed=True),
+        grouping: Literal["genres", "clusters"] = Body("genres", embed=True),
+        k: int = Body(DEFAULT_CLUSTER_COUNT, embed=True, ge=1, le=MAX_CLUSTER_COUNT),
+        auth: AuthContext = Depends(get_auth_context)
+):
     try:
         # 1. Analiz verisini yükle
         analysis = load_analysis(analysis_id)
@@ -206,17 +283,24 @@ async def full_auto_playlist_creation(analysis_id: str = Body(..., embed=True)):
                 detail="Analiz bulunamadı"
             )
 
-        # 2. Tür verisi hazır mı kontrol et
-        if analysis.get("genres"):
-            genre_map = analysis["genres"]
-        else:
-            # Önceden analiz edilmemişse şarkıları alıp analiz et
-            track_ids = [track["id"] for track in analysis.get("tracks", [])]
-            genre_map = analyze_genres(track_ids)
-
-        # 4. Playlist oluştur
-        creator = PlaylistCreator()
-        results = await creator.create_genre_playlists(genre_map, confirmation=True)
+        with progress.bind(auth.user_id, "create_playlists"):
+            # 2. Tür verisi hazır mı kontrol et
+            if analysis.get("genres"):
+                genre_map = analysis["genres"]
+            else:
+                # Önceden analiz edilmemişse şarkıları alıp analiz et (bloklayan iş thread'de)
+                track_ids = [track["id"] for track in analysis.get("tracks", [])]
+                genre_map = await asyncio.to_thread(analyze_genres, track_ids, auth.client)
+
+            # 3. İstenirse türleri kümelere göre grupla
+            if grouping == "clusters":
+                index = AnalysisIndex.from_analysis({**analysis, "genres": genre_map})
+                genre_map = await asyncio.to_thread(group_by_clusters, index, genre_map, k)
+
+            # 4. Playlist oluştur
+            creator = PlaylistCreator(auth.client, auth.user_id)
+            results = await creator.create_genre_playlists(genre_map, confirmation=True)
+            progress.completed("create_playlists", created_playlists=len(results))
 
         # 5. Sonuçları döndür
         return {
@@ -234,7 +318,10 @@ async def full_auto_playlist_creation(analysis_id: str = Body(..., embed=True)):
 
 @app.post("/playlists", summary="Playlist Oluştur", status_code=status.HTTP_201_CREATED)
 @RateLimiter(calls=3, period=60)
-async def create_playlists_endpoint(request: PlaylistCreateRequest = Body(...)):
+async def create_playlists_endpoint(
+        request: PlaylistCreateRequest = Body(...),
+        auth: AuthContext = Depends(get_auth_context)
+):
     try:
         if not request.confirmation:
             raise HTTPException(
@@ -249,12 +336,18 @@ async def create_playlists_endpoint(request: PlaylistCreateRequest = Body(...)):
                 detail="Geçersiz analiz ID"
             )
 
-        result = await create_playlists(
-            analysis_data=analysis,
-            confirmation=True,
-            selected_tracks=request.selected_tracks,
-            excluded_track_ids=request.excluded_track_ids or []
-        )
+        with progress.bind(auth.user_id, "create_playlists"):
+            result = await create_playlists(
+                auth.client,
+                analysis_data=analysis,
+                confirmation=True,
+                selected_tracks=request.selected_tracks,
+                excluded_track_ids=request.excluded_track_ids or [],
+                user_id=auth.user_id,
+                grouping=request.grouping,
+                k=request.k
+            )
+            progress.completed("create_playlists", **result.get("stats", {}))
 
         return ApiResponseFormatter.success({
             "created_playlists": len(result.get("results", {})),
@@ -269,33 +362,77 @@ async def create_playlists_endpoint(request: PlaylistCreateRequest = Body(...)):
 
 # --- Analiz Sonuçları ve Ek Veriler ---
 @app.get("/analysis/{analysis_id}")
-async def get_analysis_results(analysis_id: str):
+async def get_analysis_results(analysis_id: str, request: Request):
+    etag = analysis_etag(analysis_id, "full")
+    cached = not_modified(request, etag, exists=partial(analysis_exists, analysis_id))
+    if cached:
+        return cached
+
     try:
         analysis = load_analysis(analysis_id)
         if not analysis:
             raise HTTPException(status_code=404, detail="Analiz bulunamadı")
 
-        if "_id" in analysis and isinstance(analysis["_id"], ObjectId):
-            analysis["_id"] = str(analysis["_id"])
-
-        return ApiResponseFormatter.success(analysis)
+        return FastJSONResponse(ApiResponseFormatter.success(analysis), headers=cache_headers(etag))
 
     except Exception as e:
         return ApiResponseFormatter.error(e)
 
 @app.get("/analysis/{analysis_id}/breakdown")
-async def get_analysis_breakdown(analysis_id: str):
+async def get_analysis_breakdown(analysis_id: str, request: Request):
+    etag = analysis_etag(analysis_id, "breakdown")
+    cached = not_modified(request, etag, exists=partial(analysis_exists, analysis_id))
+    if cached:
+        return cached
+
     try:
         breakdown = get_breakdown_for_analysis(analysis_id)
-        return ApiResponseFormatter.success(breakdown)
+        return FastJSONResponse(ApiResponseFormatter.success(breakdown), headers=cache_headers(etag))
     except Exception as e:
         return ApiResponseFormatter.error(e)
 
 @app.get("/analysis/{analysis_id}/details")
-async def get_analysis_details_endpoint(analysis_id: str):
+async def get_analysis_details_endpoint(analysis_id: str, request: Request):
+    etag = analysis_etag(analysis_id, "details")
+    cached = not_modified(request, etag, exists=partial(analysis_exists, analysis_id))
+    if cached:
+        return cached
+
     try:
         details = get_analysis_details(analysis_id)
-        return ApiResponseFormatter.success({"tracks": details})
+        return FastJSONResponse(ApiResponseFormatter.success({"tracks": details}), headers=cache_headers(etag))
+    except Exception as e:
+        return ApiResponseFormatter.error(e)
+
+@app.get("/analysis/{analysis_id}/details/stream")
+async def stream_analysis_details_endpoint(analysis_id: str, request: Request):
+    """/details ile aynı veri, NDJSON olarak: önce tür satırları, sonra şarkı satırları, en sonda özet satırı"""
+    etag = analysis_etag(analysis_id, "details-ndjson")
+    cached = not_modified(request, etag, exists=partial(analysis_exists, analysis_id))
+    if cached:
+        return cached
+
+    try:
+        records = await asyncio.to_thread(stream_analysis_details, analysis_id)
+    except Exception as e:
+        return ApiResponseFormatter.error(e)
+    # Senkron üreteç Starlette tarafından thread havuzunda tüketilir; event loop bloklanmaz
+    return StreamingResponse(ndjson_chunks(records), media_type=NDJSON_MEDIA_TYPE, headers=cache_headers(etag))
+
+@app.get("/analysis/{analysis_id}/clusters")
+async def get_analysis_clusters(
+        analysis_id: str,
+        request: Request,
+        k: int = Query(default=DEFAULT_CLUSTER_COUNT, ge=1, le=MAX_CLUSTER_COUNT)
+):
+    try:
+        # Kümeler değişebilen track_cache tür listelerinden hesaplanır; ETag sonucun özetidir
+        clusters = get_genre_clusters(analysis_id, k)
+        etag = content_etag(clusters)
+        cached = not_modified(request, etag, DERIVED_CACHE_CONTROL)
+        if cached:
+            return cached
+        return FastJSONResponse(ApiResponseFormatter.success(clusters), headers=cache_headers(etag, DERIVED_CACHE_CONTROL))
     except Exception as e:
         return ApiResponseFormatter.error(e)
 
@@ -308,28 +445,31 @@ async def get_filtered_analysis(analysis_id: str, exclude: List[str] = Query(def
         return ApiResponseFormatter.error(e)
 
 @app.get("/user/analyses")
-async def list_user_analyses(request: Request):
+async def list_user_analyses(
+        auth: AuthContext = Depends(get_auth_context),
+        limit: int = Query(default=20, ge=1, le=100),
+        cursor: Optional[str] = Query(default=None)
+):
     try:
-        user_id = get_spotify_client(request).me()["id"]
-        history = get_user_analysis_history(user_id)
-        return ApiResponseFormatter.success(history)
+        history, next_cursor = get_user_analysis_history(auth.user_id, limit=limit, cursor=cursor)
+        response = ApiResponseFormatter.success(history)
+        response["next_cursor"] = next_cursor
+        return response
     except Exception as e:
         return ApiResponseFormatter.error(e)
 @app.delete("/user/analyses")
-async def clear_user_analyses(request: Request):
+async def clear_user_analyses(auth: AuthContext = Depends(get_auth_context)):
     try:
-        user_id = get_spotify_client(request).me()["id"]
-        deleted = delete_user_analysis_history(user_id)
+        deleted = delete_user_analysis_history(auth.user_id)
         return ApiResponseFormatter.success({"deleted": deleted})
     except Exception as e:
         return ApiResponseFormatter.error(e)
 
 @app.get("/user/profile")
-async def get_user_profile(request: Request):
+async def get_user_profile(auth: AuthContext = Depends(get_auth_context)):
 
     try:
-        sp = get_spotify_client(request)
-        profile = smart_request_with_retry(sp.me)
+        profile = smart_request_with_retry(auth.client.me)
         data = {
             "display_name": profile.get("display_name"),
             "id": profile.get("id"),
@@ -339,6 +479,15 @@ async def get_user_profile(request: Request):
     except Exception as e:
         return ApiResponseFormatter.error(e)
 
+@app.get("/progress/stream", summary="İlerleme Olayları (SSE)")
+async def progress_stream(auth: AuthContext = Depends(get_auth_context)):
+    """Kullanıcının analiz ve playlist işlemlerinin aşama/sayaç olaylarını tek bağlantıda akıtır"""
+    return StreamingResponse(
+        progress.event_stream(auth.user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/progress/{analysis_id}")
 async def get_analysis_progress(analysis_id: str):
     try:
@@ -355,11 +504,8 @@ async def get_analysis_progress(analysis_id: str):
 async def logout_user(response: Response, request: Request):
     """Clear stored Spotify tokens and log the user out."""
     try:
-        user_id = request.cookies.get("spotify_user_id")
-        auth_manager.clear_tokens(user_id)
-        # clear current user so a new user can log in
-        auth_manager.set_current_user(None)
-        response.delete_cookie("spotify_user_id")
+        auth_manager.clear_tokens(request.cookies.get(USER_COOKIE))
+        response.delete_cookie(USER_COOKIE)
         return ApiResponseFormatter.success({"message": "Logout successful"})
     except Exception as e:
         return ApiResponseFormatter.error(e)
@@ -371,5 +517,7 @@ if __name__ == "__main__":
         "app:app",
         host=os.getenv("HOST", "0.0.0.0"),
         port=int(os.getenv("PORT", 8080)),
+        # Kimlik istek başına çerezden kurulduğu için birden çok worker güvenlidir
+        workers=int(os.getenv("WEB_CONCURRENCY", 1)),
         reload=os.getenv("DEBUG_MODE", "false").lower() == "true"
     )
@@ -0,0 +1,5 @@
+# Eski analizlere kayıtlı tür özetini ekler (tek seferlik / tekrar çalıştırılabilir)
+from data_store import backfill_analysis_summaries
+
+updated = backfill_analysis_summaries()
+print(f"[*] {updated} analiz güncellendi")
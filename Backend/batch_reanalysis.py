@@ -0,0 +1,221 @@
+"""
+auth_tokens'taki tüm kullanıcıların beğenilen şarkılarını toplu olarak
+yeniden analiz eden zamanlanmış iş.
+
+Kullanıcılar sınırlı sayıda eşzamanlı işçiyle işlenir; tüm kullanıcılar tek
+bir SharedGenreCache paylaşır, böylece örtüşen kütüphanelerdeki şarkı ve
+sanatçılar bir çalıştırmada yalnızca bir kez çözülür. Her çalıştırmanın
+sonunda throughput ve önbellek yeniden kullanım istatistikleri raporlanır.
+
+Çalıştırma (Backend dizininde):
+    python batch_reanalysis.py --concurrency 4 --output reanalysis.json
+    python batch_reanalysis.py --daily-at 03:00
+"""
+import os
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from data_store import MongoDBManager, save_analysis, save_analysis_trace, save_user_tracks, check_mongo_connection
+from genre_finder import SharedGenreCache
+from spotify_auth import auth_manager
+from workflow import get_user_tracks, analyze_genres, WorkflowError
+from models import tracks_to_dicts
+from logger import configure_logging
+import tracing
+
+# --- Konfigürasyon ---
+logger = logging.getLogger(__name__)
+
+# --- Ayarlar ---
+TOKEN_COLLECTION = "auth_tokens"
+# Aynı anda analiz edilen en fazla kullanıcı sayısı (tüm çalıştırma için)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_REANALYSIS_CONCURRENCY", 3))
+BATCH_MAX_TRACKS = int(os.getenv("BATCH_REANALYSIS_MAX_TRACKS", 500))
+BATCH_DAILY_AT = os.getenv("BATCH_REANALYSIS_DAILY_AT", "03:00")
+
+
+# --- Kullanıcılar ---
+def list_users(limit: Optional[int] = None) -> List[str]:
+    """Yenilenebilir token'ı olan kullanıcıları döndürür"""
+    collection = MongoDBManager().get_collection(TOKEN_COLLECTION)
+    cursor = collection.find({"refresh_token": {"$exists": True}}, {"_id": 1}).sort("_id", 1)
+    if limit:
+        cursor = cursor.limit(limit)
+    return [doc["_id"] for doc in cursor]
+
+
+def reanalyze_user(user_id: str, shared_cache: SharedGenreCache, max_tracks: int) -> Dict:
+    """Tek kullanıcının kütüphanesini analiz edip kaydeder"""
+    start = time.perf_counter()
+    with tracing.start_trace("batch_reanalysis", user_id=user_id) as trace:
+        with tracing.span("initialization"):
+            sp = auth_manager.get_valid_client(user_id)
+        with tracing.span("track_loading"):
+            tracks = get_user_tracks(sp, max_tracks)
+        if not tracks:
+            return {"user_id": user_id, "status": "skipped", "tracks": 0}
+
+        genre_map = analyze_genres([t.id for t in tracks], sp, shared_cache)
+
+        with tracing.span("persistence"):
+            track_dicts = tracks_to_dicts(tracks)
+            analysis_id = save_analysis({
+                "source": "scheduled_reanalysis",
+                "user_id": user_id,
+                "tracks": track_dicts,
+                "genres": genre_map,
+                "created_at": datetime.utcnow()
+            })
+            save_user_tracks(user_id, track_dicts)
+
+    save_analysis_trace(analysis_id, trace.to_dict())
+    return {
+        "user_id": user_id,
+        "status": "completed",
+        "analysis_id": analysis_id,
+        "tracks": len(tracks),
+        "genres": len(genre_map),
+        "elapsed_s": round(time.perf_counter() - start, 2)
+    }
+
+
+# --- Çalıştırma ---
+def cache_reuse(stats: Dict[str, int]) -> Dict:
+    """Paylaşılan önbellek sayaçlarından yeniden kullanım oranlarını hesaplar"""
+    report = {}
+    for kind in ("track", "artist"):
+        resolved = stats.get(f"{kind}.resolved", 0)
+        shared = stats.get(f"{kind}.shared", 0)
+        stored = stats.get(f"{kind}.stored", 0)
+        total = resolved + shared + stored
+        report[kind] = {
+            "resolved": resolved,
+            "shared": shared,
+            "stored": stored,
+            "reuse_ratio": round((shared + stored) / total, 3) if total else 0.0
+        }
+    return report
+
+
+def run_batch(
+        user_ids: Optional[List[str]] = None,
+        concurrency: int = BATCH_CONCURRENCY,
+        max_tracks: int = BATCH_MAX_TRACKS
+) -> Dict:
+    """Kullanıcıları sınırlı eşzamanlılıkla analiz eder ve çalıştırma raporunu döndürür"""
+    if not check_mongo_connection():
+        raise WorkflowError("MongoDB bağlantısı başarısız", "initialization")
+
+    user_ids = list_users() if user_ids is None else user_ids
+    shared_cache = SharedGenreCache()
+    results: List[Dict] = []
+    logger.info("🌙 Toplu yeniden analiz başlıyor: %d kullanıcı, eşzamanlılık %d", len(user_ids), concurrency)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="reanalysis") as executor:
+        futures = {
+            executor.submit(reanalyze_user, user_id, shared_cache, max_tracks): user_id
+            for user_id in user_ids
+        }
+        for future in as_completed(futures):
+            user_id = futures[future]
+            try:
+                result = future.result()
+            except WorkflowError as e:
+                result = {"user_id": user_id, "status": "failed", "error": str(e), "error_stage": e.stage}
+            except Exception as e:
+                result = {"user_id": user_id, "status": "failed", "error": str(e)}
+            if result["status"] == "failed":
+                logger.error("❌ %s analiz edilemedi: %s", user_id, result["error"])
+            results.append(result)
+    elapsed = time.perf_counter() - start
+
+    total_tracks = sum(r.get("tracks", 0) for r in results)
+    statuses = {}
+    for r in results:
+        statuses[r["status"]] = statuses.get(r["status"], 0) + 1
+
+    report = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "users": len(user_ids),
+        "concurrency": concurrency,
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 2),
+        "total_tracks": total_tracks,
+        "users_per_min": round(len(results) / elapsed * 60, 2) if elapsed else 0.0,
+        "tracks_per_s": round(total_tracks / elapsed, 2) if elapsed else 0.0,
+        "cache": cache_reuse(shared_cache.stats()),
+        "results": sorted(results, key=lambda r: r["user_id"])
+    }
+    logger.info(
+        "✅ Toplu yeniden analiz bitti: %d kullanıcı, %d şarkı, %.1fs (%.2f şarkı/s), "
+        "şarkı yeniden kullanımı %.0f%%, sanatçı yeniden kullanımı %.0f%%",
+        len(results), total_tracks, elapsed, report["tracks_per_s"],
+        report["cache"]["track"]["reuse_ratio"] * 100, report["cache"]["artist"]["reuse_ratio"] * 100
+    )
+    return report
+
+
+def print_report(report: Dict) -> None:
+    print(
+        f"\n{report['users']} kullanıcı, {report['elapsed_s']}s, {report['total_tracks']} şarkı "
+        f"({report['tracks_per_s']} şarkı/s, {report['users_per_min']} kullanıcı/dk)"
+    )
+    print("Durumlar: " + ", ".join(f"{k}={v}" for k, v in sorted(report["statuses"].items())))
+    print(f"\n{'önbellek':<10}{'çözülen':>10}{'paylaşılan':>12}{'kayıtlı':>10}{'yeniden kullanım':>18}")
+    for kind, item in report["cache"].items():
+        print(
+            f"{kind:<10}{item['resolved']:>10}{item['shared']:>12}{item['stored']:>10}"
+            f"{item['reuse_ratio'] * 100:>17.1f}%"
+        )
+
+
+def seconds_until(daily_at: str, now: Optional[datetime] = None) -> float:
+    """Bir sonraki HH:MM anına kadar geçecek süre (yerel saat)"""
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in daily_at.split(":", 1))
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Kullanıcı kütüphanelerini toplu yeniden analiz et")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--max-tracks", type=int, default=BATCH_MAX_TRACKS)
+    parser.add_argument("--users", nargs="*", help="Yalnızca bu kullanıcılar (varsayılan: auth_tokens'taki tümü)")
+    parser.add_argument("--daily-at", nargs="?", const=BATCH_DAILY_AT, help="Her gün HH:MM'de çalış")
+    parser.add_argument("--output", help="Raporun yazılacağı JSON dosyası")
+    args = parser.parse_args()
+
+    configure_logging()
+    while True:
+        if args.daily_at:
+            wait = seconds_until(args.daily_at)
+            logger.info("⏰ Sonraki toplu analiz %.0f dakika sonra", wait / 60)
+            time.sleep(wait)
+
+        try:
+            report = run_batch(args.users or None, args.concurrency, args.max_tracks)
+        except Exception as e:
+            logger.error("Toplu yeniden analiz başarısız: %s", e, exc_info=True)
+            if not args.daily_at:
+                raise
+            continue
+
+        print_report(report)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, default=str)
+        if not args.daily_at:
+            return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+MongoDBManager() çağrısının thread başına maliyetini ölçer.
+
+Her data_store fonksiyonu MongoDBManager() çağırdığı için bu maliyet tüm
+Mongo işlemlerine eklenir. Eski davranış (her çağrıda sınıf kilidi) ile
+kilitsiz hızlı yol karşılaştırılır. Gerçek bağlantı kurulmaz.
+
+Kullanım (Backend klasöründen):
+    python benchmarks/bench_mongo_manager.py
+"""
+import os
+import sys
+import time
+from threading import Lock, Barrier, Thread
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_store import MongoDBManager
+
+THREAD_COUNTS = (1, 8, 32, 64)
+CALLS_PER_THREAD = 50_000
+
+
+class LockedManager:
+    """Önceki uygulama: her çağrıda sınıf kilidi alınır"""
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+        return cls._instance
+
+
+def run(factory, thread_count: int) -> float:
+    barrier = Barrier(thread_count + 1)
+
+    def worker():
+        barrier.wait()
+        for _ in range(CALLS_PER_THREAD):
+            factory()
+
+    threads = [Thread(target=worker) for _ in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    start = time.perf_counter()
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return elapsed / (thread_count * CALLS_PER_THREAD) * 1e9
+
+
+def main():
+    # Bağlantı kurmadan başlatılmış singleton durumunu taklit et
+    MongoDBManager._instance = object.__new__(MongoDBManager)
+    LockedManager()
+
+    print(f"{'threads':>8} {'locked ns/call':>16} {'lock-free ns/call':>18}")
+    for thread_count in THREAD_COUNTS:
+        locked = run(LockedManager, thread_count)
+        lock_free = run(MongoDBManager, thread_count)
+        print(f"{thread_count:>8} {locked:>16.1f} {lock_free:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
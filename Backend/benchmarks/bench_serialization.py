@@ -0,0 +1,92 @@
+"""
+Analiz yanıtlarının serileştirme süresini ve ağdaki boyutunu ölçer.
+
+Kullanım (Backend klasöründen):
+    python benchmarks/bench_serialization.py
+"""
+import os
+import sys
+import json
+import time
+import random
+import string
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from responses import dumps, compress, brotli, orjson
+from utils import ApiResponseFormatter
+
+SIZES = (500, 5000)
+GENRES = ["rock", "pop", "indie", "hip hop", "jazz", "electronic", "metal", "folk", "soul", "turkish pop"]
+REPEAT = 5
+
+
+def _track_id(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_letters + string.digits, k=22))
+
+
+def build_analysis(size: int, seed: int = 42) -> dict:
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    tracks = [
+        {
+            "id": _track_id(rng),
+            "name": f"Song {i}",
+            "artist": f"Artist {rng.randint(1, size // 4 or 1)}",
+            "added_at": (now - timedelta(days=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "preview_url": f"https://p.scdn.co/mp3-preview/{_track_id(rng)}"
+        }
+        for i in range(size)
+    ]
+    genres = {}
+    for track in tracks:
+        genres.setdefault(rng.choice(GENRES), []).append(track["id"])
+    return {
+        "_id": ObjectId(),
+        "source": "liked_tracks",
+        "user_id": "benchmark_user",
+        "tracks": tracks,
+        "genres": genres,
+        "created_at": now
+    }
+
+
+def default_encode(payload: dict) -> bytes:
+    """FastAPI'nin varsayılan yolu: jsonable_encoder + json.dumps"""
+    return json.dumps(
+        jsonable_encoder(payload, custom_encoder={ObjectId: str}),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+def measure(func, payload) -> tuple:
+    best = float("inf")
+    body = b""
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        body = func(payload)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, body
+
+
+def main():
+    print(f"orjson: {'var' if orjson else 'yok'} | brotli: {'var' if brotli else 'yok'}")
+    print(f"{'tracks':>7} {'encoder':>10} {'ms':>9} {'raw KB':>9} {'gzip KB':>9} {'br KB':>9}")
+
+    for size in SIZES:
+        payload = ApiResponseFormatter.success(build_analysis(size))
+        for name, func in (("default", default_encode), ("fast", dumps)):
+            elapsed, body = measure(func, payload)
+            gzip_size = len(compress(body, "gzip")) / 1024
+            br_size = f"{len(compress(body, 'br')) / 1024:9.1f}" if brotli else f"{'-':>9}"
+            print(f"{size:>7} {name:>10} {elapsed:9.2f} {len(body) / 1024:9.1f} {gzip_size:9.1f} {br_size}")
+
+
+if __name__ == "__main__":
+    main()
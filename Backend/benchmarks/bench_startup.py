@@ -0,0 +1,101 @@
+"""
+Worker açılış süresini ölçer ve bütçeyi aşarsa hata koduyla çıkar.
+
+`import app` ve lifespan başlangıcı temiz bir Python sürecinde ölçülür.
+MONGO_URI erişilemeyen bir adrese yönlendirilir: açılış hiçbir dış
+bağlantıyı beklememelidir, Mongo kapalıyken de uygulama ayağa kalkmalıdır.
+
+Kullanım (Backend klasöründen):
+    python benchmarks/bench_startup.py
+    STARTUP_BUDGET_MS=1500 python benchmarks/bench_startup.py
+"""
+import os
+import sys
+import json
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = int(os.getenv("STARTUP_RUNS", 5))
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", 1500))
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", 2000))
+TOP_MODULES = 10
+
+PROBE = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.app):
+    ready = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "startup_ms": (ready - start) * 1000}))
+"""
+
+
+def probe_env() -> dict:
+    env = dict(os.environ)
+    env.update({
+        "MONGO_URI": "mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=100",
+        "SPOTIPY_CLIENT_ID": env.get("SPOTIPY_CLIENT_ID", "benchmark"),
+        "SPOTIPY_CLIENT_SECRET": env.get("SPOTIPY_CLIENT_SECRET", "benchmark"),
+        "SPOTIPY_REDIRECT_URI": env.get("SPOTIPY_REDIRECT_URI", "http://127.0.0.1:8080/auth/callback"),
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+    return env
+
+
+def run_probe() -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=BACKEND_DIR,
+        env=probe_env(),
+        capture_output=True,
+        text=True,
+        timeout=60,
+        check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports() -> list:
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=BACKEND_DIR,
+        env=probe_env(),
+        capture_output=True,
+        text=True,
+        timeout=60
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        # app'in doğrudan import ettiği modüller
+        if depth == 1:
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:TOP_MODULES]
+
+
+def main() -> int:
+    results = [run_probe() for _ in range(RUNS)]
+    import_ms = statistics.median(r["import_ms"] for r in results)
+    startup_ms = statistics.median(r["startup_ms"] for r in results)
+
+    print(f"import app     : {import_ms:8.1f} ms (bütçe {IMPORT_BUDGET_MS:.0f} ms)")
+    print(f"lifespan hazır : {startup_ms:8.1f} ms (bütçe {STARTUP_BUDGET_MS:.0f} ms)")
+    print("\napp tarafından import edilen en yavaş modüller:")
+    for cumulative, name in slowest_imports():
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    if import_ms > IMPORT_BUDGET_MS or startup_ms > STARTUP_BUDGET_MS:
+        print("\n× Açılış bütçesi aşıldı")
+        return 1
+    print("\n✓ Açılış bütçe içinde")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
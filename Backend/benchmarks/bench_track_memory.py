@@ -0,0 +1,89 @@
+"""
+Şarkı başına bellek kullanımını tracemalloc ile ölçer.
+
+Eski temsil (şarkı başına dict) ile TrackRecord (__slots__ + intern
+edilmiş sanatçı adları) karşılaştırılır. Girdi, Spotify saved-tracks
+yanıtını taklit eden öğelerdir; ham yanıt atıldıktan sonra dönüştürülmüş
+listenin tuttuğu bellek ölçülür.
+
+Kullanım (Backend klasöründen):
+    python benchmarks/bench_track_memory.py
+"""
+import os
+import sys
+import gc
+import random
+import string
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import TrackRecord
+
+SIZES = (5000, 50000)
+ARTIST_RATIO = 4  # ortalama sanatçı başına şarkı
+
+
+def fake_items(size: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    artists = [f"Artist {i}" for i in range(max(size // ARTIST_RATIO, 1))]
+
+    def rid() -> str:
+        return "".join(rng.choices(string.ascii_letters + string.digits, k=22))
+
+    # Her öğe JSON'dan çözülmüş gibi kendi string nesnelerini taşır
+    return [
+        {
+            "added_at": f"2024-01-{i % 28 + 1:02d}T10:00:00Z",
+            "track": {
+                "id": rid(),
+                "name": f"Song {i}",
+                "artists": [{"name": "".join(rng.choice(artists))}],
+                "preview_url": f"https://p.scdn.co/mp3-preview/{rid()}"
+            }
+        }
+        for i in range(size)
+    ]
+
+
+def as_dicts(items: list) -> list:
+    return [
+        {
+            "id": item["track"]["id"],
+            "name": item["track"]["name"],
+            "artist": item["track"]["artists"][0]["name"],
+            "added_at": item["added_at"],
+            "preview_url": item["track"].get("preview_url")
+        } for item in items
+    ]
+
+
+def as_records(items: list) -> list:
+    return [TrackRecord.from_saved_item(item) for item in items]
+
+
+def measure(convert, size: int) -> int:
+    """Ham yanıt atıldıktan sonra dönüştürülmüş listenin tuttuğu bellek"""
+    gc.collect()
+    tracemalloc.start()
+    items = fake_items(size)
+    result = convert(items)
+    del items
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return retained
+
+
+def main():
+    print(f"{'tracks':>7} {'dict B/track':>14} {'record B/track':>16} {'saving':>8}")
+    for size in SIZES:
+        dict_bytes = measure(as_dicts, size) / size
+        record_bytes = measure(as_records, size) / size
+        saving = (1 - record_bytes / dict_bytes) * 100
+        print(f"{size:>7} {dict_bytes:>14.1f} {record_bytes:>16.1f} {saving:>7.1f}%")
+
+
+if __name__ == "__main__":
+    main()
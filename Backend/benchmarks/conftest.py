@@ -0,0 +1,144 @@
+"""
+Sıcak yol benchmark'ları için ortak fixture'lar.
+
+pytest-benchmark kuruluysa onun `benchmark` fixture'ı kullanılır
+(`--benchmark-json`, `--benchmark-compare` vb.). Kurulu değilse aynı
+çağrı biçimini destekleyen hafif bir yedek fixture devreye girer ve
+sonuçları BENCHMARK_JSON (varsayılan benchmarks/results/latest.json)
+dosyasına yazar. BENCHMARK_BASELINE verilirse oranlar özette gösterilir.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import statistics
+from datetime import datetime
+
+import pytest
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+os.environ.setdefault("SPOTIPY_CLIENT_ID", "benchmark")
+os.environ.setdefault("SPOTIPY_CLIENT_SECRET", "benchmark")
+os.environ.setdefault("SPOTIPY_REDIRECT_URI", "http://127.0.0.1:8080/auth/callback")
+
+from data_store import MongoDBManager, drain_write_behind_queues  # noqa: E402
+from tests.fakes import FakeDatabase  # noqa: E402
+
+RESULTS_PATH = os.getenv("BENCHMARK_JSON", os.path.join(BENCHMARK_DIR, "results", "latest.json"))
+BASELINE_PATH = os.getenv("BENCHMARK_BASELINE")
+MIN_ROUNDS = int(os.getenv("BENCHMARK_MIN_ROUNDS", 5))
+MAX_TIME = float(os.getenv("BENCHMARK_MAX_TIME", 0.5))
+
+try:
+    import pytest_benchmark  # noqa: F401
+    HAS_PLUGIN = True
+except ImportError:
+    HAS_PLUGIN = False
+
+_results = []
+
+
+@pytest.fixture
+def fake_mongo():
+    """MongoDBManager'ı bellek içi veritabanına yönlendirir"""
+    saved = (MongoDBManager._instance, MongoDBManager._db, MongoDBManager._collections)
+    db = FakeDatabase()
+    MongoDBManager._instance = object.__new__(MongoDBManager)
+    MongoDBManager._db = db
+    MongoDBManager._collections = {}
+    try:
+        yield db
+    finally:
+        # Bekleyen audit kayıtları gerçek veritabanına değil taklide yazılsın
+        drain_write_behind_queues()
+        MongoDBManager._instance, MongoDBManager._db, MongoDBManager._collections = saved
+
+
+if not HAS_PLUGIN:
+    class SimpleBenchmark:
+        """pytest-benchmark'ın `benchmark(...)` ve `benchmark.pedantic(...)` alt kümesi"""
+
+        def __init__(self, name: str, group: str = None):
+            self.name = name
+            self.group = group
+            self.timings = []
+            self.extra_info = {}
+
+        def __call__(self, func, *args, **kwargs):
+            result = func(*args, **kwargs)  # ısınma
+            deadline = time.perf_counter() + MAX_TIME
+            while len(self.timings) < MIN_ROUNDS or time.perf_counter() < deadline:
+                start = time.perf_counter()
+                result = func(*args, **kwargs)
+                self.timings.append(time.perf_counter() - start)
+            return result
+
+        def pedantic(self, target, args=(), kwargs=None, setup=None, rounds=1, iterations=1, warmup_rounds=0):
+            kwargs = kwargs or {}
+            result = None
+            for round_index in range(warmup_rounds + rounds):
+                call_args, call_kwargs = args, kwargs
+                if setup is not None:
+                    prepared = setup()
+                    if prepared is not None:
+                        call_args, call_kwargs = prepared
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    result = target(*call_args, **call_kwargs)
+                elapsed = (time.perf_counter() - start) / iterations
+                if round_index >= warmup_rounds:
+                    self.timings.append(elapsed)
+            return result
+
+        def stats(self) -> dict:
+            return {
+                "name": self.name,
+                "group": self.group,
+                "rounds": len(self.timings),
+                "min": min(self.timings),
+                "mean": statistics.fmean(self.timings),
+                "median": statistics.median(self.timings),
+                "stddev": statistics.pstdev(self.timings),
+                "extra_info": self.extra_info,
+            }
+
+    @pytest.fixture
+    def benchmark(request):
+        marker = request.node.get_closest_marker("benchmark")
+        bench = SimpleBenchmark(request.node.nodeid, marker.kwargs.get("group") if marker else None)
+        yield bench
+        if bench.timings:
+            _results.append(bench.stats())
+
+    def pytest_configure(config):
+        config.addinivalue_line("markers", "benchmark(group=None): benchmark grubu")
+
+    def pytest_sessionfinish(session, exitstatus):
+        if not _results:
+            return
+        os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
+        with open(RESULTS_PATH, "w", encoding="utf-8") as f:
+            json.dump({
+                "datetime": datetime.utcnow().isoformat(),
+                "machine_info": {"python": platform.python_version(), "platform": platform.platform()},
+                "benchmarks": _results,
+            }, f, indent=2)
+
+    def pytest_terminal_summary(terminalreporter):
+        if not _results:
+            return
+        baseline = {}
+        if BASELINE_PATH and os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH, encoding="utf-8") as f:
+                baseline = {b["name"]: b for b in json.load(f).get("benchmarks", [])}
+
+        terminalreporter.write_sep("-", f"benchmark sonuçları ({RESULTS_PATH})")
+        for result in _results:
+            line = f"{result['median'] * 1e6:12.1f} µs  {result['name']}"
+            previous = baseline.get(result["name"])
+            if previous:
+                line += f"  ({result['median'] / previous['median']:.2f}x baseline)"
+            terminalreporter.write_line(line)
@@ -0,0 +1,266 @@
+"""
+Sıcak yolların mikro benchmark'ları.
+
+Her benchmark SIZES içindeki şarkı sayıları için parametrelenir ve
+MongoDB/sağlayıcılar yerine bellek içi taklitler kullanılır; ölçülen
+süre yalnızca uygulama kodunun maliyetidir. Çalıştırmak için Backend
+dizininde: python -m pytest benchmarks -q
+"""
+import os
+import copy
+import random
+import string
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import data_store
+import workflow
+from data_store import MongoDBManager, cache_tracks, save_user_tracks
+from tests.fakes import FakeSpotify, fake_tag_provider
+from genre_clustering import cluster_tracks
+from genre_finder import GenreFinder, SharedGenreCache, get_genre_breakdown
+from utils import RateLimiter, chunk_list, validate_track_ids
+
+SIZES = [int(s) for s in os.getenv("BENCHMARK_SIZES", "100,1000,5000").split(",")]
+GENRES = [f"genre {i}" for i in range(40)]
+
+
+# --- Veri Üreticileri ---
+def make_track_ids(count: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits
+    return ["".join(rng.choices(alphabet, k=22)) for _ in range(count)]
+
+
+def make_tracks(count: int, seed: int = 42) -> list:
+    return [
+        {
+            "id": tid,
+            "name": f"Song {i}",
+            "artist": f"Artist {i % 300}",
+            "added_at": "2024-01-01T00:00:00Z",
+            "preview_url": None
+        }
+        for i, tid in enumerate(make_track_ids(count, seed))
+    ]
+
+
+def make_genre_map(track_ids: list) -> dict:
+    genre_map = {}
+    for i, tid in enumerate(track_ids):
+        genre_map.setdefault(GENRES[i % len(GENRES)], []).append(tid)
+    return genre_map
+
+
+def make_cache_rows(track_ids: list) -> list:
+    return [
+        {
+            "id": tid,
+            "genres": ["rock", "indie"],
+            "primary_genre": "rock",
+            "confidence": 3.5,
+            "sources": {"spotify": ["rock"], "lastfm": ["indie"], "musicbrainz": []}
+        }
+        for tid in track_ids
+    ]
+
+
+@pytest.fixture
+def stub_finder(fake_mongo):
+    """Ağ ve kimlik doğrulama olmadan çalışan GenreFinder"""
+    finder = object.__new__(GenreFinder)
+    finder.sp = FakeSpotify()
+    finder.mongo = MongoDBManager()
+    finder.rate_limiter = RateLimiter(calls=10 ** 9, period=1)
+    finder.shared_cache = None
+    finder._get_lastfm_genres = fake_tag_provider
+    finder._get_musicbrainz_genres = fake_tag_provider
+    return finder
+
+
+@pytest.fixture
+def stored_analysis(fake_mongo, request):
+    """Verilen boyutta kaydedilmiş bir analiz ve temiz index önbelleği"""
+    tracks = make_tracks(request.param)
+    track_ids = [t["id"] for t in tracks]
+    analysis_id = data_store.save_analysis({
+        "user_id": "bench-user",
+        "genres": make_genre_map(track_ids),
+        "tracks": tracks
+    })
+    workflow.analysis_index_cache.clear()
+    yield analysis_id, track_ids
+    workflow.analysis_index_cache.clear()
+
+
+# --- Tür Analizi ---
+@pytest.mark.benchmark(group="genre_weights")
+def test_calculate_genre_weights(benchmark, stub_finder):
+    sources = {
+        "spotify": ["rock", "indie rock", "alternative"],
+        "lastfm": ["indie", "rock", "britpop"],
+        "musicbrainz": ["rock", "alternative"]
+    }
+    scores = benchmark(stub_finder._calculate_genre_weights, sources)
+    assert max(scores, key=scores.get) == "rock"
+
+
+@pytest.mark.benchmark(group="process_tracks")
+@pytest.mark.parametrize("size", SIZES)
+def test_process_tracks(benchmark, stub_finder, fake_mongo, size):
+    track_ids = make_track_ids(size)
+
+    def setup():
+        # Her turda soğuk önbellekle başla
+        fake_mongo.get_collection("track_cache").clear()
+        fake_mongo.get_collection("artist_genres").clear()
+        return (track_ids,), {}
+
+    genre_map = benchmark.pedantic(stub_finder.process_tracks, setup=setup, rounds=3)
+    assert sum(map(len, genre_map.values())) == size
+
+
+@pytest.mark.benchmark(group="process_tracks_shared")
+@pytest.mark.parametrize("size", SIZES)
+def test_process_tracks_shared_cache(benchmark, stub_finder, fake_mongo, size):
+    """Kütüphaneleri yarı yarıya örtüşen iki kullanıcı aynı anda, ortak önbellekle"""
+    track_ids = make_track_ids(size + size // 2)
+    libraries = (track_ids[:size], track_ids[size // 2:])
+
+    def run(shared_cache):
+        finders = []
+        for _ in libraries:
+            finder = copy.copy(stub_finder)
+            finder.shared_cache = shared_cache
+            finders.append(finder)
+        with ThreadPoolExecutor(max_workers=len(libraries)) as executor:
+            return list(executor.map(GenreFinder.process_tracks, finders, libraries))
+
+    def setup():
+        fake_mongo.get_collection("track_cache").clear()
+        fake_mongo.get_collection("artist_genres").clear()
+        return (SharedGenreCache(),), {}
+
+    genre_maps = benchmark.pedantic(run, setup=setup, rounds=3)
+    assert [sum(map(len, genre_map.values())) for genre_map in genre_maps] == [size, size]
+
+
+@pytest.mark.benchmark(group="genre_breakdown")
+@pytest.mark.parametrize("size", SIZES)
+def test_get_genre_breakdown(benchmark, size):
+    genre_map = make_genre_map(make_track_ids(size))
+    breakdown = benchmark(get_genre_breakdown, genre_map)
+    assert sum(item["count"] for item in breakdown.values()) == size
+
+
+@pytest.mark.benchmark(group="genre_clustering")
+@pytest.mark.parametrize("size", SIZES)
+def test_cluster_tracks(benchmark, size):
+    # Her şarkı 2-5 tür taşır; türler birlikte görüldükleri gruplardan seçilir
+    rng = random.Random(7)
+    groups = [GENRES[i::8] for i in range(8)]
+    track_genres = {
+        tid: rng.sample(rng.choice(groups), rng.randint(2, 5))
+        for tid in make_track_ids(size)
+    }
+    result = benchmark(cluster_tracks, track_genres, 8)
+    assert sum(cluster["track_count"] for cluster in result["clusters"]) == size
+
+
+# --- Analiz Okuma ---
+@pytest.mark.benchmark(group="filtered_genres")
+@pytest.mark.parametrize("stored_analysis", SIZES, indirect=True)
+def test_get_filtered_genres(benchmark, stored_analysis):
+    analysis_id, track_ids = stored_analysis
+    excluded = track_ids[::10]
+    filtered = benchmark(workflow.get_filtered_genres, analysis_id, excluded)
+    assert sum(map(len, filtered.values())) == len(track_ids) - len(excluded)
+
+
+@pytest.mark.benchmark(group="analysis_details")
+@pytest.mark.parametrize("stored_analysis", SIZES, indirect=True)
+def test_get_analysis_details(benchmark, stored_analysis):
+    analysis_id, track_ids = stored_analysis
+    details = benchmark(workflow.get_analysis_details, analysis_id)
+    assert sum(map(len, details.values())) == len(track_ids)
+
+
+@pytest.mark.benchmark(group="analysis_details_stream")
+@pytest.mark.parametrize("stored_analysis", SIZES, indirect=True)
+def test_stream_analysis_details(benchmark, stored_analysis):
+    analysis_id, track_ids = stored_analysis
+    records = benchmark(lambda: list(workflow.stream_analysis_details(analysis_id)))
+    assert sum(1 for r in records if r["type"] == "track") == len(track_ids)
+    assert records[-1] == {"type": "end", "genres": sum(1 for r in records if r["type"] == "genre"),
+                           "tracks": len(track_ids)}
+
+
+# --- Mongo Yazmaları ---
+@pytest.mark.benchmark(group="cache_tracks")
+@pytest.mark.parametrize("size", SIZES)
+def test_cache_tracks(benchmark, fake_mongo, size):
+    rows = make_cache_rows(make_track_ids(size))
+
+    def setup():
+        fake_mongo.get_collection("track_cache").clear()
+        return ([dict(row) for row in rows],), {}
+
+    written = benchmark.pedantic(cache_tracks, setup=setup, rounds=5)
+    assert written == size
+
+
+@pytest.mark.benchmark(group="save_user_tracks")
+@pytest.mark.parametrize("size", SIZES)
+def test_save_user_tracks_new_user(benchmark, fake_mongo, size):
+    tracks = make_tracks(size)
+
+    def setup():
+        fake_mongo.get_collection("user_tracks").clear()
+        return ("bench-user", [dict(t) for t in tracks]), {}
+
+    assert benchmark.pedantic(save_user_tracks, setup=setup, rounds=5)
+    assert len(fake_mongo.get_collection("user_tracks")._docs) == size
+
+
+@pytest.mark.benchmark(group="save_user_tracks")
+@pytest.mark.parametrize("size", SIZES)
+def test_save_user_tracks_returning_user(benchmark, fake_mongo, size):
+    tracks = make_tracks(size)
+    save_user_tracks("bench-user", [dict(t) for t in tracks])
+    # Dönen kullanıcı: yalnızca %1 yeni şarkı
+    fresh = make_tracks(max(1, size // 100), seed=7)
+    returning = tracks + fresh
+
+    assert benchmark(save_user_tracks, "bench-user", returning)
+    assert len(fake_mongo.get_collection("user_tracks")._docs) == size + len(fresh)
+
+
+# --- Yardımcılar ---
+@pytest.mark.benchmark(group="track_validation")
+@pytest.mark.parametrize("size", SIZES)
+def test_chunk_and_validate(benchmark, size):
+    track_ids = make_track_ids(size) + [None, "", "bad id"]
+
+    def run():
+        return [validate_track_ids(chunk) for chunk in chunk_list(track_ids, 50)]
+
+    chunks = benchmark(run)
+    assert sum(map(len, chunks)) == size
+
+
+@pytest.mark.benchmark(group="rate_limiter")
+@pytest.mark.parametrize("size", SIZES)
+def test_rate_limiter_overhead(benchmark, size):
+    """Pencerede `size` çağrı biriktiğinde tek çağrının limiter maliyeti"""
+    limiter = RateLimiter(calls=10 ** 9, period=3600)
+    wrapped = limiter(lambda: None)
+
+    def setup():
+        now = time.time()
+        limiter.timestamps = [now] * size
+        return (), {}
+
+    benchmark.pedantic(wrapped, setup=setup, rounds=200)
+    assert len(limiter.timestamps) == size + 1
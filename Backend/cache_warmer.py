@@ -0,0 +1,203 @@
+"""
+track_cache ve artist_genres önbelleklerini çevrimdışı ısıtan iş.
+
+user_tracks'te görülen şarkılar kaç kullanıcıda bulunduklarına göre
+sıralanır; önbellekte kaydı olmayan ya da süresi dolmak üzere olan şarkı ve
+sanatçılar sessiz saatlerde, dakika başına bütçe aşılmadan çözülür.
+Böylece canlı analizler çoğunlukla sıcak önbelleğe denk gelir.
+
+Çalıştırma (Backend dizininde):
+    python cache_warmer.py --once
+    python cache_warmer.py            # sessiz saatlerde periyodik
+"""
+import os
+import json
+import time
+import logging
+import argparse
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from spotipy.oauth2 import SpotifyClientCredentials
+
+from data_store import get_popular_user_tracks, get_fresh_artist_ids, get_fresh_cached_genres
+from genre_finder import GenreFinder, ARTIST_BATCH_SIZE, CACHE_TTL_DAYS
+from utils import chunk_list, create_spotify_client
+from logger import configure_logging
+
+# --- Konfigürasyon ---
+logger = logging.getLogger(__name__)
+
+# --- Ayarlar ---
+# Yerel saatle "HH:MM-HH:MM" (gece yarısını aşabilir); boş bırakılırsa her zaman çalışır
+QUIET_HOURS = os.getenv("CACHE_WARMER_QUIET_HOURS", "01:00-07:00")
+# Sağlayıcı bütçesi: dakikada çözülecek en fazla şarkı (toplu sanatçı çağrısı 1 sayılır)
+TRACKS_PER_MINUTE = float(os.getenv("CACHE_WARMER_TRACKS_PER_MINUTE", 30))
+BATCH_SIZE = int(os.getenv("CACHE_WARMER_BATCH_SIZE", 25))
+MAX_TRACKS_PER_RUN = int(os.getenv("CACHE_WARMER_MAX_TRACKS", 2000))
+# Popülerlik sıralamasında taranan en fazla şarkı
+SCAN_LIMIT = int(os.getenv("CACHE_WARMER_SCAN_LIMIT", 20000))
+# Süresinin dolmasına bu kadar gün kalan kayıtlar da yenilenir
+REFRESH_MARGIN_DAYS = int(os.getenv("CACHE_WARMER_REFRESH_DAYS", 3))
+INTERVAL = float(os.getenv("CACHE_WARMER_INTERVAL", 3600))
+
+
+# --- Sessiz Saatler ---
+def parse_quiet_hours(value: str) -> Optional[Tuple[int, int]]:
+    """"01:00-07:00" → gün içindeki dakikalar olarak (başlangıç, bitiş)"""
+    if not value.strip():
+        return None
+    start, _, end = value.partition("-")
+
+    def minutes(text: str) -> int:
+        hour, _, minute = text.strip().partition(":")
+        return int(hour) * 60 + int(minute or 0)
+
+    return minutes(start), minutes(end)
+
+
+def seconds_until_quiet(window: Optional[Tuple[int, int]], now: Optional[datetime] = None) -> float:
+    """Sessiz saatlerin içindeyse 0, değilse başlangıcına kalan süre"""
+    if window is None:
+        return 0.0
+    now = now or datetime.now()
+    start, end = window
+    current = now.hour * 60 + now.minute
+    inside = start <= current < end if start <= end else (current >= start or current < end)
+    if inside:
+        return 0.0
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    target = midnight + timedelta(minutes=start)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+class Budget:
+    """Dakika başına birim bütçesi; harcanan birimler kadar çalışmayı yavaşlatır"""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = time.monotonic()
+
+    def spend(self, units: int) -> None:
+        now = time.monotonic()
+        if self._next > now:
+            time.sleep(self._next - now)
+        self._next = max(self._next, now) + units * self.interval
+
+
+# --- Aday Seçimi ---
+def find_candidates(
+        scan_limit: int = SCAN_LIMIT,
+        margin_days: int = REFRESH_MARGIN_DAYS
+) -> Tuple[List[Dict], List[Tuple[str, int]]]:
+    """Eksik/süresi dolmak üzere olan şarkı ve sanatçıları kullanıcı sayısına göre sıralı döndürür"""
+    popular = get_popular_user_tracks(scan_limit)
+
+    fresh_tracks = get_fresh_cached_genres([doc["_id"] for doc in popular], CACHE_TTL_DAYS - margin_days)
+    stale_tracks = [doc for doc in popular if doc["_id"] not in fresh_tracks]
+
+    artist_users: Dict[str, int] = {}
+    for doc in popular:
+        if doc.get("artist_id"):
+            artist_users[doc["artist_id"]] = artist_users.get(doc["artist_id"], 0) + doc["users"]
+    fresh_artists = get_fresh_artist_ids(list(artist_users), datetime.utcnow() + timedelta(days=margin_days))
+    stale_artists = sorted(
+        ((artist_id, users) for artist_id, users in artist_users.items() if artist_id not in fresh_artists),
+        key=lambda item: (-item[1], item[0])
+    )
+    return stale_tracks, stale_artists
+
+
+# --- Isıtma ---
+def warm_caches(
+        max_tracks: int = MAX_TRACKS_PER_RUN,
+        tracks_per_minute: float = TRACKS_PER_MINUTE,
+        quiet_hours: Optional[Tuple[int, int]] = parse_quiet_hours(QUIET_HOURS),
+        finder: Optional[GenreFinder] = None
+) -> Dict:
+    """Bir ısıtma turu; sessiz saatler biterse kalan adaylar sonraki tura kalır"""
+    start = time.perf_counter()
+    stale_tracks, stale_artists = find_candidates()
+    stale_tracks = stale_tracks[:max_tracks]
+    logger.info(
+        "🔥 Önbellek ısıtma: %d şarkı, %d sanatçı aday",
+        len(stale_tracks), len(stale_artists)
+    )
+
+    # Şarkı/sanatçı uç noktaları kullanıcı yetkisi gerektirmez
+    finder = finder or GenreFinder(create_spotify_client(auth_manager=SpotifyClientCredentials()))
+    budget = Budget(tracks_per_minute)
+    stats = {"artists_warmed": 0, "tracks_warmed": 0, "users_covered": 0, "stopped": "completed"}
+
+    def quiet() -> bool:
+        if seconds_until_quiet(quiet_hours) > 0:
+            stats["stopped"] = "quiet_period_ended"
+            return False
+        return True
+
+    # Önce sanatçılar: şarkı çözümü sanatçı türlerini önbellekten okur
+    for chunk in chunk_list([artist_id for artist_id, _ in stale_artists], ARTIST_BATCH_SIZE):
+        if not quiet():
+            break
+        budget.spend(1)
+        stats["artists_warmed"] += finder.refresh_artists(chunk)
+
+    for batch in chunk_list(stale_tracks, BATCH_SIZE):
+        if stats["stopped"] != "completed" or not quiet():
+            break
+        budget.spend(len(batch))
+        finder.process_tracks([doc["_id"] for doc in batch], CACHE_TTL_DAYS - REFRESH_MARGIN_DAYS)
+        stats["tracks_warmed"] += len(batch)
+        stats["users_covered"] += sum(doc["users"] for doc in batch)
+
+    report = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "candidates": {"tracks": len(stale_tracks), "artists": len(stale_artists)},
+        **stats,
+        "elapsed_s": round(time.perf_counter() - start, 2)
+    }
+    logger.info(
+        "✅ Önbellek ısıtma bitti (%s): %d şarkı, %d sanatçı, %.1fs",
+        report["stopped"], report["tracks_warmed"], report["artists_warmed"], report["elapsed_s"]
+    )
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tür önbelleklerini user_tracks'e göre ısıt")
+    parser.add_argument("--once", action="store_true", help="Tek tur çalış ve çık")
+    parser.add_argument("--ignore-quiet-hours", action="store_true", help="Sessiz saatleri bekleme")
+    parser.add_argument("--max-tracks", type=int, default=MAX_TRACKS_PER_RUN)
+    parser.add_argument("--tracks-per-minute", type=float, default=TRACKS_PER_MINUTE)
+    parser.add_argument("--output", help="Son turun raporunun yazılacağı JSON dosyası")
+    args = parser.parse_args()
+
+    configure_logging()
+    quiet_hours = None if args.ignore_quiet_hours else parse_quiet_hours(QUIET_HOURS)
+    while True:
+        wait = seconds_until_quiet(quiet_hours)
+        if wait:
+            logger.info("⏰ Sessiz saatlere %.0f dakika var", wait / 60)
+            time.sleep(wait)
+
+        try:
+            report = warm_caches(args.max_tracks, args.tracks_per_minute, quiet_hours)
+        except Exception as e:
+            logger.error("Önbellek ısıtma başarısız: %s", e, exc_info=True)
+            if args.once:
+                raise
+        else:
+            print(json.dumps(report, indent=2))
+            if args.output:
+                with open(args.output, "w", encoding="utf-8") as f:
+                    json.dump(report, f, indent=2)
+
+        if args.once:
+            return
+        time.sleep(INTERVAL)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,37 @@
 # data_store.py
 import os
+import json
+import base64
+import hashlib
 import logging
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Any
-from pymongo import MongoClient, errors, UpdateOne, InsertOne, IndexModel
+from typing import List, Dict, Iterator, Optional, Any, Tuple
+from pymongo import MongoClient, errors, UpdateOne, InsertOne, IndexModel, ReadPreference
+from pymongo.write_concern import WriteConcern
 from pymongo.collection import Collection
 from pymongo.database import Database
 from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
 from dotenv import load_dotenv
 import atexit
-from threading import Lock
+import queue
+import time
+from threading import Lock, Thread, Event
 from bson import ObjectId, errors as bson_errors
-from utils import chunk_list, validate_track_ids
+from utils import chunk_list, validate_track_ids, summarize_genre_map, GENRE_SUMMARY_VERSION
+from metrics import CallbackGauge, MongoCommandMetrics, retry_hook
+from retry_budget import wait_with_budget, stop_on_budget
 
 # --- Konfigürasyonlar ---
+# .env tek noktadan burada yüklenir; diğer modüller data_store'u ortam
+# değişkenlerini okumadan önce import eder.
 load_dotenv()
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # --- Sabitler ---
 MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = "spotify_analytics"
+DB_NAME = os.getenv("MONGO_DB", "spotify_analytics")
+MAX_HISTORY_PAGE_SIZE = 100
+USER_TRACKS_BATCH_SIZE = int(os.getenv("USER_TRACKS_BATCH_SIZE", 1000))
 COLLECTIONS = [
     "track_cache",
     "analyses",
@@ -32,42 +43,157 @@ COLLECTIONS = [
     "audit_logs"
 ]
 
+# --- Bağlantı Havuzu ---
+MONGO_POOL_CONFIG = {
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", 50)),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", 0)),
+    "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 60000)),
+    "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 10000)),
+}
+# Örn. "zstd,snappy,zlib"; zstd ve snappy ek paket gerektirir
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")
+
+# --- Koleksiyon Profilleri (write concern / read preference) ---
+MONGO_PROFILES = {
+    # Kaybı kabul edilemeyen veriler
+    "durable": {
+        "write_concern": WriteConcern(w="majority", j=True),
+        "read_preference": ReadPreference.PRIMARY
+    },
+    # Kullanıcı verisi, tek düğüm onayı yeterli
+    "standard": {
+        "write_concern": WriteConcern(w=1),
+        "read_preference": ReadPreference.PRIMARY_PREFERRED
+    },
+    # Yeniden üretilebilen önbellek verisi
+    "cache": {
+        "write_concern": WriteConcern(w=1, j=False),
+        "read_preference": ReadPreference.SECONDARY_PREFERRED
+    },
+    # Onay beklenmeyen kayıtlar; varsayılan olarak kullanılmaz, MONGO_COLLECTION_PROFILES ile
+    # seçilir (yazma hataları görünmez, write-behind sayaçları iyimser olur)
+    "fire_and_forget": {
+        "write_concern": WriteConcern(w=0),
+        "read_preference": ReadPreference.SECONDARY_PREFERRED
+    },
+}
+COLLECTION_PROFILES = {
+    "analyses": "durable",
+    "auth_tokens": "durable",
+    "user_tracks": "standard",
+    "playlists": "standard",
+    "playlist_records": "standard",
+    "track_cache": "cache",
+    "artist_genres": "cache",
+    # Denetim kaydı: kayıplar write-behind "failed" sayacında görünsün diye onaylı yazılır
+    "audit_logs": "standard",
+}
+# Örn. MONGO_COLLECTION_PROFILES="audit_logs=fire_and_forget,track_cache=durable"
+for _override in filter(None, os.getenv("MONGO_COLLECTION_PROFILES", "").split(",")):
+    _name, _, _profile = _override.partition("=")
+    if _name.strip() in COLLECTION_PROFILES and _profile.strip() in MONGO_PROFILES:
+        COLLECTION_PROFILES[_name.strip()] = _profile.strip()
+    else:
+        logger.warning(f"Geçersiz koleksiyon profili atlandı: {_override}")
+
+# "background": uygulama açılışında arka planda, "sync": açılışta bloklayarak,
+# "off": yalnızca migrate_schema.py ile
+SCHEMA_BOOTSTRAP_MODE = os.getenv("MONGO_SCHEMA_BOOTSTRAP", "background").lower()
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", 100))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", 2.0))
+WRITE_BEHIND_MAX_SIZE = int(os.getenv("WRITE_BEHIND_MAX_SIZE", 10000))
+# Akış uç noktalarında cursor başına alınan doküman sayısı
+STREAM_BATCH_SIZE = int(os.getenv("DETAILS_STREAM_BATCH_SIZE", 500))
+
 # --- Yeniden Deneme Konfigürasyonu ---
 MONGO_RETRY_CONFIG = {
-    'wait': wait_exponential(multiplier=1, min=2, max=30),
-    'stop': stop_after_attempt(5),
+    'wait': wait_with_budget(wait_exponential(multiplier=1, min=2, max=30)),
+    'stop': stop_after_attempt(5) | stop_on_budget(),
     'retry': retry_if_exception_type(errors.PyMongoError),
-    'before_sleep': lambda _: logger.warning("MongoDB operasyonu yeniden deneniyor...")
+    'before_sleep': retry_hook("mongo", lambda _: logger.warning("MongoDB operasyonu yeniden deneniyor..."))
 }
 
 # --- MongoDB Manager (Thread-Safe Singleton) ---
 class MongoDBManager:
     _instance = None
     _lock = Lock()
+    _schema_lock = Lock()
     _client: MongoClient = None
     _db: Database = None
+    _collections: Dict[str, Collection] = {}
+    _schema_ready = False
 
     def __new__(cls):
+        # Hızlı yol: başlatıldıktan sonra kilit alınmaz
+        instance = cls._instance
+        if instance is not None:
+            return instance
+
         with cls._lock:
             if cls._instance is None:
-                cls._instance = super().__new__(cls)
+                instance = super().__new__(cls)
                 cls._connect()
-                cls._ensure_indexes()
-                cls._ensure_collections()
+                cls._instance = instance
         return cls._instance
 
+    @classmethod
+    def ensure_schema(cls) -> bool:
+        """Koleksiyon ve indexleri bir kez oluşturur (migration adımı); başarısızsa sonraki çağrı yeniden dener"""
+        if cls._schema_ready:
+            return True
+        cls()
+        with cls._schema_lock:
+            if cls._schema_ready:
+                return True
+            indexes_ready = cls._ensure_indexes()
+            cls._ensure_collections()
+            cls._schema_ready = indexes_ready
+            return indexes_ready
+
+    @classmethod
+    def bootstrap_schema(cls) -> Optional[Thread]:
+        """MONGO_SCHEMA_BOOTSTRAP ayarına göre şema kurulumunu başlatır"""
+        if SCHEMA_BOOTSTRAP_MODE == "sync":
+            cls.ensure_schema()
+            return None
+        if SCHEMA_BOOTSTRAP_MODE == "background":
+            thread = Thread(target=cls._bootstrap_safely, name="mongo-schema-bootstrap", daemon=True)
+            thread.start()
+            return thread
+        return None
+
+    @classmethod
+    def ping(cls) -> None:
+        """Mevcut bağlantı havuzuyla ping atar; istemci yoksa önce bağlanır"""
+        if cls._client is None:
+            cls()
+        cls._client.admin.command('ping')
+
+    @classmethod
+    def _bootstrap_safely(cls) -> None:
+        try:
+            cls.ensure_schema()
+        except Exception as e:
+            logger.error(f"Şema kurulumu başarısız: {str(e)}")
+
     @classmethod
     @retry(**MONGO_RETRY_CONFIG)
     def _connect(cls):
         """MongoDB bağlantısını kurar ve veritabanını seçer"""
         try:
+            options = dict(MONGO_POOL_CONFIG)
+            if MONGO_COMPRESSORS:
+                options["compressors"] = MONGO_COMPRESSORS
+
             cls._client = MongoClient(
                 MONGO_URI,
                 serverSelectionTimeoutMS=5000,
                 socketTimeoutMS=10000,
                 connectTimeoutMS=10000,
                 retryWrites=True,
-                appname="SpotifyAnalytics"
+                appname="SpotifyAnalytics",
+                event_listeners=[MongoCommandMetrics()],
+                **options
             )
             cls._db = cls._client[DB_NAME]
             cls._client.admin.command('ping')
@@ -86,7 +212,7 @@ class MongoDBManager:
                 logger.info(f"✓ {col} koleksiyonu oluşturuldu")
 
     @classmethod
-    def _ensure_indexes(cls):
+    def _ensure_indexes(cls) -> bool:
         try:
             cls._db.track_cache.create_indexes([
                 IndexModel([("primary_genre", 1), ("last_updated", -1)]),
@@ -103,6 +229,11 @@ class MongoDBManager:
             else:
                 logger.info("✓ 'created_at_1' indexi zaten var, atlandı.")
 
+            cls._db.analyses.create_index(
+                [("user_id", 1), ("created_at", -1), ("_id", -1)],
+                name="user_history_index"
+            )
+
             cls._db.auth_tokens.create_index(
                 "expires_at",
                 expireAfterSeconds=604800
@@ -113,30 +244,185 @@ class MongoDBManager:
                 unique=True
             )
 
+            # save_user_tracks'in fark sorgusu yalnızca bu indexten karşılanır
+            cls._db.user_tracks.create_index(
+                [("user_id", 1), ("track_id", 1), ("content_hash", 1)],
+                name="user_track_hash_index"
+            )
+
             cls._db.playlist_records.create_index(
                 [("user_id", 1), ("genre", 1)],
                 name="user_genre_index"
             )
 
             logger.info("✓ MongoDB indexleri güncellendi")
+            return True
         except Exception as e:
             logger.error(f"Index oluşturma hatası: {str(e)}")
+            return False
 
     @classmethod
     def get_collection(cls, collection_name: str) -> Collection:
+        """Koleksiyonu profiline göre write concern / read preference ile döndürür"""
+        collection = cls._collections.get(collection_name)
+        if collection is not None:
+            return collection
+
         if collection_name not in COLLECTIONS:
             raise ValueError(f"Geçersiz koleksiyon: {collection_name}")
-        return cls._db[collection_name]
+
+        profile = MONGO_PROFILES[COLLECTION_PROFILES.get(collection_name, "standard")]
+        collection = cls._db.get_collection(
+            collection_name,
+            write_concern=profile["write_concern"],
+            read_preference=profile["read_preference"]
+        )
+        cls._collections[collection_name] = collection
+        return collection
 
     @classmethod
     def close(cls):
         if cls._client:
+            cls._collections = {}
             cls._client.close()
             logger.info("✓ MongoDB bağlantısı kapatıldı")
 
 
+# --- Write-Behind Kuyruğu (Kritik Olmayan Yazmalar) ---
+class WriteBehindQueue:
+    """Kritik olmayan kayıtları biriktirip arka planda insert_many ile yazar"""
+
+    def __init__(
+            self,
+            collection_name: str,
+            batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+            flush_interval: float = WRITE_BEHIND_FLUSH_INTERVAL,
+            max_size: int = WRITE_BEHIND_MAX_SIZE
+    ):
+        self.collection_name = collection_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=max_size)
+        self._lock = Lock()
+        self._stopping = Event()
+        self._thread: Optional[Thread] = None
+        self._counters = {"enqueued": 0, "flushed": 0, "dropped": 0, "failed": 0}
+
+    def put(self, document: Dict) -> bool:
+        """Kaydı kuyruğa ekler; kuyruk doluysa kaydı düşürür"""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(document)
+        except queue.Full:
+            self._count("dropped")
+            logger.warning(f"{self.collection_name} kuyruğu dolu, kayıt düşürüldü")
+            return False
+        self._count("enqueued")
+        return True
+
+    def flush(self) -> int:
+        """Kuyruktaki tüm kayıtları çağıran thread üzerinde yazar"""
+        written = 0
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return written
+            written += self._write(batch)
+
+    def close(self, timeout: float = 5.0) -> int:
+        """Arka plan thread'ini durdurur ve kalan kayıtları boşaltır"""
+        self._stopping.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout)
+        return self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counters, "depth": self._queue.qsize()}
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[key] += amount
+
+    def _ensure_worker(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._stopping.is_set() or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._thread = Thread(
+                target=self._run,
+                name=f"write-behind-{self.collection_name}",
+                daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            batch = self._collect_batch()
+            if batch:
+                self._write(batch)
+
+    def _collect_batch(self) -> List[Dict]:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and not self._stopping.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Dict]) -> int:
+        try:
+            collection = MongoDBManager().get_collection(self.collection_name)
+            collection.insert_many(batch, ordered=False)
+            self._count("flushed", len(batch))
+            return len(batch)
+        except errors.PyMongoError as e:
+            self._count("failed", len(batch))
+            logger.error(f"{self.collection_name} toplu yazma hatası ({len(batch)} kayıt): {str(e)}")
+            return 0
+
+
+audit_log_queue = WriteBehindQueue("audit_logs")
+playlist_record_queue = WriteBehindQueue("playlist_records")
+
+
+def drain_write_behind_queues() -> None:
+    """Kapanışta bekleyen tüm write-behind kayıtlarını yazar"""
+    for write_queue in (audit_log_queue, playlist_record_queue):
+        written = write_queue.close()
+        if written:
+            logger.info(f"✓ {write_queue.collection_name}: kapanışta {written} kayıt yazıldı")
+
+
+def get_write_behind_stats() -> Dict[str, Dict[str, int]]:
+    return {
+        write_queue.collection_name: write_queue.stats()
+        for write_queue in (audit_log_queue, playlist_record_queue)
+    }
+
+
+WRITE_BEHIND_DEPTH = CallbackGauge(
+    "write_behind_queue_depth",
+    "Write-behind kuyruğunda bekleyen kayıt sayısı",
+    ("queue",),
+    lambda: {(name,): stats["depth"] for name, stats in get_write_behind_stats().items()}
+)
+
+
 # --- Bağlantı Temizleme ---
 atexit.register(MongoDBManager.close)
+atexit.register(drain_write_behind_queues)
 
 # --- Çekirdek Fonksiyonlar ---
 @retry(**MONGO_RETRY_CONFIG)
@@ -159,42 +445,84 @@ def cache_tracks(features: List[Dict]) -> int:
             result = collection.bulk_write(batch, ordered=False)
             total_updated += (result.upserted_count + result.modified_count)
 
-        logger.info(f"✓ {total_updated} track önbelleğe alındı")
+        logger.info("✓ %d track önbelleğe alındı", total_updated)
         return total_updated
     except errors.BulkWriteError as e:
         logger.error(f"Önbellek güncelleme hatası: {str(e.details)}")
         return 0
 
 @retry(**MONGO_RETRY_CONFIG)
-def get_cached_tracks(track_ids: List[str]) -> List[Dict]:
+def get_cached_tracks(track_ids: List[str], fields: Optional[List[str]] = None) -> List[Dict]:
     try:
         validated_ids = validate_track_ids(track_ids)
         collection = MongoDBManager().get_collection("track_cache")
-        return list(collection.find({'_id': {'$in': validated_ids}}))
+        projection = {field: 1 for field in fields} if fields else None
+        return list(collection.find({'_id': {'$in': validated_ids}}, projection))
     except errors.PyMongoError as e:
         logger.error(f"Önbellek okuma hatası: {str(e)}")
         return []
 
+@retry(**MONGO_RETRY_CONFIG)
+def get_fresh_cached_genres(
+        track_ids: List[str],
+        max_age_days: int,
+        chunk_size: int = 1000
+) -> Dict[str, Optional[str]]:
+    """Süresi dolmamış önbellek kayıtlarından track → primary_genre eşlemesi döndürür.
+
+    Tür bulunamamış kayıtlar için değer None olur.
+    """
+    try:
+        collection = MongoDBManager().get_collection("track_cache")
+        cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+        cached = {}
+        for chunk in chunk_list(track_ids, chunk_size):
+            cursor = collection.find(
+                {'_id': {'$in': chunk}, 'last_updated': {'$gte': cutoff}},
+                {'primary_genre': 1, 'genres': 1}
+            )
+            for doc in cursor:
+                cached[doc['_id']] = (doc.get('primary_genre') or 'unknown') if doc.get('genres') else None
+        return cached
+    except errors.PyMongoError as e:
+        logger.error(f"Önbellek okuma hatası: {str(e)}")
+        return {}
+
 @retry(**MONGO_RETRY_CONFIG)
 def save_analysis(data: Dict) -> Optional[str]:
     try:
         collection = MongoDBManager().get_collection("analyses")
-        audit_collection = MongoDBManager().get_collection("audit_logs")
         data['created_at'] = datetime.utcnow()
-
-        with MongoDBManager()._client.start_session() as session:
-            with session.start_transaction():
-                result = collection.insert_one(data, session=session)
-                audit_collection.insert_one({
-                    "action": "analysis_created",
-                    "analysis_id": result.inserted_id,
-                    "timestamp": datetime.utcnow()
-                }, session=session)
-                return str(result.inserted_id)
+        data['summary'] = summarize_genre_map(data.get('genres') or {})
+        data['track_count'] = len(data.get('tracks') or [])
+
+        result = collection.insert_one(data)
+        audit_log_queue.put({
+            "action": "analysis_created",
+            "analysis_id": result.inserted_id,
+            "timestamp": datetime.utcnow()
+        })
+        return str(result.inserted_id)
     except errors.PyMongoError as e:
         logger.error(f"Analiz kaydetme hatası: {str(e)}")
         return None
 
+@retry(**MONGO_RETRY_CONFIG)
+def save_analysis_trace(analysis_id: Optional[str], trace: Dict) -> bool:
+    """Kapanmış trace'i analize yazar; trace kök span bittikten sonra tamamlandığı için ayrı kaydedilir"""
+    if not analysis_id:
+        return False
+    try:
+        collection = MongoDBManager().get_collection("analyses")
+        result = collection.update_one({'_id': ObjectId(analysis_id)}, {'$set': {'trace': trace}})
+        return result.matched_count == 1
+    except (bson_errors.InvalidId, TypeError, ValueError) as e:
+        logger.error(f"Geçersiz analiz ID: {str(e)}")
+        return False
+    except errors.PyMongoError as e:
+        logger.error(f"Analiz trace kaydetme hatası: {str(e)}")
+        return False
+
 @retry(**MONGO_RETRY_CONFIG)
 def load_analysis(analysis_id: str) -> Optional[Dict]:
     try:
@@ -210,25 +538,156 @@ def load_analysis(analysis_id: str) -> Optional[Dict]:
         return None
 
 @retry(**MONGO_RETRY_CONFIG)
-def save_user_tracks(user_id: str, tracks: List[Dict]) -> bool:
+def analysis_exists(analysis_id: str) -> bool:
+    """Yalnızca _id index'iyle varlık kontrolü; koşullu GET'lerde 304'ten önce kullanılır"""
     try:
-        validated_tracks = [
-            {**t, 'track_id': t['id']}
-            for t in tracks
-            if validate_track_ids([t['id']])
-        ]
+        collection = MongoDBManager().get_collection("analyses")
+        return collection.find_one({'_id': ObjectId(analysis_id)}, {'_id': 1}) is not None
+    except (bson_errors.InvalidId, TypeError, ValueError):
+        return False
+    except errors.PyMongoError as e:
+        logger.error(f"Analiz varlık kontrolü hatası: {str(e)}")
+        return False
+
+@retry(**MONGO_RETRY_CONFIG)
+def load_analysis_genres(analysis_id: str) -> Optional[Dict[str, List[str]]]:
+    """Yalnızca tür → şarkı id eşlemesini okur; şarkı listesi yüklenmez"""
+    try:
+        collection = MongoDBManager().get_collection("analyses")
+        doc = collection.find_one({'_id': ObjectId(analysis_id)}, {'genres': 1})
+        return doc.get('genres') if doc else None
+    except (bson_errors.InvalidId, TypeError, ValueError) as e:
+        logger.error(f"Geçersiz analiz ID: {str(e)}")
+        return None
+    except errors.PyMongoError as e:
+        logger.error(f"Analiz türleri yükleme hatası: {str(e)}")
+        return None
+
+def iter_analysis_tracks(
+        analysis_id: str,
+        batch_size: int = STREAM_BATCH_SIZE,
+        fields: Tuple[str, ...] = ("id", "name", "artist", "preview_url")
+) -> Iterator[Dict]:
+    """Analizdeki şarkıları $unwind ile tek tek akıtır; bellekte en fazla bir cursor partisi tutulur.
+
+    Akış başladıktan sonra yeniden denenemeyeceği için retry uygulanmaz.
+    """
+    collection = MongoDBManager().get_collection("analyses")
+    pipeline = [
+        {'$match': {'_id': ObjectId(analysis_id)}},
+        {'$project': {'_id': 0, 'tracks': 1}},
+        {'$unwind': '$tracks'},
+        {'$project': {field: f'$tracks.{field}' for field in fields}}
+    ]
+    yield from collection.aggregate(pipeline, batchSize=batch_size)
+
+def iter_cached_track_ids(track_ids: List[str], chunk_size: int = STREAM_BATCH_SIZE) -> Iterator[str]:
+    """track_cache'te kaydı olan şarkı id'lerini parça parça ($in başına chunk_size) döndürür"""
+    collection = MongoDBManager().get_collection("track_cache")
+    for chunk in chunk_list(track_ids, chunk_size):
+        for doc in collection.find({'_id': {'$in': chunk}}, {'_id': 1}).batch_size(chunk_size):
+            yield doc['_id']
+
+@retry(**MONGO_RETRY_CONFIG)
+def load_analysis_summary(analysis_id: str) -> Optional[Dict]:
+    """Kayıtlı tür özetini döndürür, eski analizler için hesaplayıp geri yazar"""
+    try:
+        collection = MongoDBManager().get_collection("analyses")
+        obj_id = ObjectId(analysis_id)
+        doc = collection.find_one({'_id': obj_id}, {'summary': 1})
+        if not doc:
+            return None
+
+        summary = doc.get('summary')
+        if summary and summary.get('version') == GENRE_SUMMARY_VERSION:
+            return summary
+
+        doc = collection.find_one({'_id': obj_id}, {'genres': 1})
+        if not doc or 'genres' not in doc:
+            return None
+
+        summary = summarize_genre_map(doc['genres'])
+        collection.update_one({'_id': obj_id}, {'$set': {'summary': summary}})
+        return summary
+    except (bson_errors.InvalidId, TypeError, ValueError) as e:
+        logger.error(f"Geçersiz analiz ID: {str(e)}")
+        return None
+    except errors.PyMongoError as e:
+        logger.error(f"Analiz özeti yükleme hatası: {str(e)}")
+        return None
+
+@retry(**MONGO_RETRY_CONFIG)
+def backfill_analysis_summaries(batch_size: int = 500) -> int:
+    """Özeti olmayan veya eski sürümdeki analizlere tür özeti ekler"""
+    collection = MongoDBManager().get_collection("analyses")
+    cursor = collection.find(
+        {'genres': {'$exists': True}, 'summary.version': {'$ne': GENRE_SUMMARY_VERSION}},
+        {'genres': 1}
+    ).batch_size(batch_size)
+
+    updated = 0
+    operations = []
+    for doc in cursor:
+        operations.append(UpdateOne(
+            {'_id': doc['_id']},
+            {'$set': {'summary': summarize_genre_map(doc.get('genres') or {})}}
+        ))
+        if len(operations) >= batch_size:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+
+    if operations:
+        updated += collection.bulk_write(operations, ordered=False).modified_count
+
+    logger.info(f"✓ {updated} analiz için tür özeti oluşturuldu")
+    return updated
+
+def track_fingerprint(track: Dict) -> str:
+    """Şarkı verisinin değişip değişmediğini anlamak için kısa özet üretir"""
+    payload = {k: v for k, v in track.items() if k not in ('_id', 'last_updated', 'content_hash')}
+    raw = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
 
+@retry(**MONGO_RETRY_CONFIG)
+def save_user_tracks(user_id: str, tracks: List[Dict]) -> bool:
+    """Yalnızca yeni veya değişmiş şarkıları yazar"""
+    try:
+        valid_ids = set(validate_track_ids([t.get('id') for t in tracks]))
         collection = MongoDBManager().get_collection("user_tracks")
-        operations = [
-            UpdateOne(
-                {'user_id': user_id, 'track_id': t['track_id']},
-                {'$set': {**t, 'last_updated': datetime.utcnow()}},
+
+        # user_track_hash_index ile karşılanan (covered) sorgu
+        existing = {
+            doc['track_id']: doc.get('content_hash')
+            for doc in collection.find(
+                {'user_id': user_id},
+                {'_id': 0, 'track_id': 1, 'content_hash': 1}
+            )
+        }
+
+        # Aynı id birden fazla geçerse son kayıt yazılır (önceki bulk_write sırasıyla aynı sonuç)
+        latest = {t.get('id'): t for t in tracks if t.get('id') in valid_ids}
+
+        now = datetime.utcnow()
+        operations = []
+        unchanged = 0
+        for tid, t in latest.items():
+            fingerprint = track_fingerprint(t)
+            if existing.get(tid) == fingerprint:
+                unchanged += 1
+                continue
+            operations.append(UpdateOne(
+                {'user_id': user_id, 'track_id': tid},
+                {'$set': {**t, 'track_id': tid, 'content_hash': fingerprint, 'last_updated': now}},
                 upsert=True
-            ) for t in validated_tracks
-        ]
+            ))
+
+        for batch in chunk_list(operations, USER_TRACKS_BATCH_SIZE):
+            collection.bulk_write(batch, ordered=False)
 
-        collection.bulk_write(operations, ordered=False)
-        logger.info(f"✓ {len(validated_tracks)} kullanıcı şarkısı güncellendi")
+        logger.info(
+            "✓ %d kullanıcı şarkısı yazıldı, %d değişmemiş şarkı atlandı",
+            len(operations), unchanged
+        )
         return True
     except errors.PyMongoError as e:
         logger.error(f"Kullanıcı verisi kaydetme hatası: {str(e)}")
@@ -247,21 +706,45 @@ def load_user_tracks(user_id: str) -> List[Dict]:
         return []
 
 @retry(**MONGO_RETRY_CONFIG)
-def save_playlist_records(playlist_data: Dict) -> bool:
+def get_popular_user_tracks(limit: int) -> List[Dict]:
+    """user_tracks'teki şarkıları kaç kullanıcıda bulunduklarına göre sıralar.
+
+    Her öğe: {"_id": track_id, "users": kullanıcı sayısı, "artist_id": ...}
+    """
+    pipeline = [
+        {"$group": {"_id": "$track_id", "users": {"$sum": 1}, "artist_id": {"$max": "$artist_id"}}},
+        {"$sort": {"users": -1, "_id": 1}},
+        {"$limit": limit}
+    ]
     try:
-        collection = MongoDBManager().get_collection("playlist_records")
-        playlist_data['created_at'] = datetime.utcnow()
-
-        required_fields = ["user_id", "genre", "track_ids"]
-        if not all(field in playlist_data for field in required_fields):
-            raise ValueError("Eksik zorunlu alanlar")
+        collection = MongoDBManager().get_collection("user_tracks")
+        return list(collection.aggregate(pipeline, allowDiskUse=True))
+    except errors.PyMongoError as e:
+        logger.error(f"Popüler şarkı sorgusu hatası: {str(e)}")
+        return []
 
-        result = collection.insert_one(playlist_data)
-        logger.info(f"✓ Playlist kaydı oluşturuldu: {result.inserted_id}")
-        return result.acknowledged
+@retry(**MONGO_RETRY_CONFIG)
+def get_fresh_artist_ids(artist_ids: List[str], valid_until: datetime, chunk_size: int = 1000) -> set:
+    """artist_genres'te valid_until anından sonra da geçerli olacak sanatçıları döndürür"""
+    try:
+        collection = MongoDBManager().get_collection("artist_genres")
+        fresh = set()
+        for chunk in chunk_list(artist_ids, chunk_size):
+            cursor = collection.find({'_id': {'$in': chunk}, 'expires_at': {'$gte': valid_until}}, {'_id': 1})
+            fresh.update(doc['_id'] for doc in cursor)
+        return fresh
     except errors.PyMongoError as e:
-        logger.error(f"Playlist kaydetme hatası: {str(e)}")
-        return False
+        logger.error(f"Sanatçı önbelleği okuma hatası: {str(e)}")
+        return set()
+
+def save_playlist_records(playlist_data: Dict) -> bool:
+    """Playlist kaydını write-behind kuyruğuna ekler"""
+    required_fields = ["user_id", "genre", "track_ids"]
+    if not all(field in playlist_data for field in required_fields):
+        raise ValueError("Eksik zorunlu alanlar")
+
+    playlist_data['created_at'] = datetime.utcnow()
+    return playlist_record_queue.put(playlist_data)
 
 @retry(**MONGO_RETRY_CONFIG)
 def check_mongo_connection() -> bool:
@@ -273,16 +756,70 @@ def check_mongo_connection() -> bool:
         return False
 
 # --- Yeni Fonksiyon: Kullanıcı Analiz Geçmişi ---
+def encode_history_cursor(created_at: datetime, analysis_id: ObjectId) -> str:
+    """Keyset sayfalama için (created_at, _id) imlecini kodlar"""
+    raw = f"{created_at.isoformat()}|{analysis_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_history_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Keyset imlecini çözer"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, analysis_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), ObjectId(analysis_id)
+    except (ValueError, UnicodeDecodeError, bson_errors.InvalidId) as e:
+        raise ValueError(f"Geçersiz sayfalama imleci: {cursor}") from e
+
 @retry(**MONGO_RETRY_CONFIG)
-def get_user_analyses(user_id: str, limit: int = 20) -> List[Dict]:
-    """Kullanıcının geçmiş analiz kayıtlarını getirir"""
+def get_user_analyses(
+        user_id: str,
+        limit: int = 20,
+        cursor: Optional[str] = None
+) -> Tuple[List[Dict], Optional[str]]:
+    """Kullanıcının geçmiş analiz kayıtlarını sayfa sayfa getirir"""
+    limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+    match: Dict[str, Any] = {"user_id": user_id}
+    if cursor:
+        created_at, last_id = decode_history_cursor(cursor)
+        match["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": last_id}}
+        ]
+
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"created_at": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        {"$project": {
+            "_id": 1,
+            "created_at": 1,
+            "track_count": {"$ifNull": ["$track_count", {"$size": {"$ifNull": ["$tracks", []]}}]},
+            "genre_count": {"$ifNull": [
+                "$summary.genre_count",
+                {"$size": {"$objectToArray": {"$ifNull": ["$genres", {}]}}}
+            ]}
+        }}
+    ]
+
     try:
         collection = MongoDBManager().get_collection("analyses")
-        cursor = collection.find(
-            {"user_id": user_id},
-            {"_id": 1, "created_at": 1, "tracks": 1, "genres": 1, "playlist_id": 1}
-        ).sort("created_at", -1).limit(limit)
-        return list(cursor)
+        docs = list(collection.aggregate(pipeline))
     except errors.PyMongoError as e:
         logger.error(f"Kullanıcı analiz geçmişi hatası: {str(e)}")
-        return []
+        return [], None
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_history_cursor(last["created_at"], last["_id"])
+
+    return [
+        {
+            "analysis_id": str(doc["_id"]),
+            "created_at": doc.get("created_at"),
+            "track_count": doc.get("track_count", 0),
+            "genre_count": doc.get("genre_count", 0)
+        }
+        for doc in docs
+    ], next_cursor
@@ -0,0 +1,164 @@
+"""
+Tür birlikte görülme (co-occurrence) matrisiyle playlist kümeleri.
+
+process_tracks her şarkıyı yalnızca primary_genre'a atar; burada
+track_cache'teki tüm tür listeleri kullanılır. Türler aynı şarkılarda
+birlikte görülme sıklıklarına göre k kümeye ayrılır ve her şarkı, türlerinin
+(puan sırasına göre ağırlıklı) en çok oy verdiği kümeye atanır. Ağır işlerin hepsi
+NumPy dizileri üzerinde yapılır; 50k şarkılık kütüphaneler etkileşimli
+sürede kümelenir.
+"""
+import os
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# --- Ayarlar ---
+DEFAULT_CLUSTER_COUNT = int(os.getenv("GENRE_CLUSTER_COUNT", 8))
+MAX_CLUSTER_COUNT = 50
+# Kümelemeye alınan en sık türler; nadir türler şarkı atamasında yok sayılır
+MAX_GENRES = int(os.getenv("GENRE_CLUSTER_MAX_GENRES", 500))
+# Şarkı başına dikkate alınan tür sayısı; listeler puana göre azalan sırada verilir (genre_finder.rank_genres)
+MAX_GENRES_PER_TRACK = 8
+KMEANS_ITERATIONS = 25
+CLUSTER_NAME_GENRES = 3
+CLUSTER_TOP_GENRES = 10
+
+
+# --- Matris Kurulumu ---
+def encode_genres(
+        genre_lists: Sequence[Sequence[str]],
+        max_genres: int = MAX_GENRES,
+        per_track: int = MAX_GENRES_PER_TRACK
+) -> Tuple[np.ndarray, List[str]]:
+    """Tür listelerini (şarkı × sıra) indeks matrisine çevirir; boş hücreler -1"""
+    flat: List[str] = []
+    lengths = np.zeros(len(genre_lists), dtype=np.int64)
+    for i, genres in enumerate(genre_lists):
+        genres = genres[:per_track]
+        flat.extend(genres)
+        lengths[i] = len(genres)
+
+    vocabulary = [genre for genre, _ in Counter(flat).most_common(max_genres)]
+    index = {genre: i for i, genre in enumerate(vocabulary)}
+    codes = np.fromiter((index.get(genre, -1) for genre in flat), dtype=np.int64, count=len(flat))
+
+    rows = np.repeat(np.arange(len(genre_lists)), lengths)
+    starts = np.cumsum(lengths) - lengths
+    positions = np.arange(len(flat)) - np.repeat(starts, lengths)
+
+    matrix = np.full((len(genre_lists), max(per_track, 1)), -1, dtype=np.int64)
+    matrix[rows, positions] = codes
+    return matrix, vocabulary
+
+
+def cooccurrence_matrix(matrix: np.ndarray, genre_count: int) -> np.ndarray:
+    """Tür × tür birlikte görülme sayıları; köşegen türün şarkı sayısıdır"""
+    counts = np.zeros(genre_count * genre_count, dtype=np.int64)
+    columns = matrix.shape[1]
+    for i in range(columns):
+        a = matrix[:, i]
+        for j in range(i, columns):
+            b = matrix[:, j]
+            mask = (a >= 0) & (b >= 0)
+            if not mask.any():
+                continue
+            counts += np.bincount(a[mask] * genre_count + b[mask], minlength=genre_count * genre_count)
+    counts = counts.reshape(genre_count, genre_count)
+    # Üst üçgen sayıldı; simetrik hale getir (köşegen bir kez)
+    return counts + counts.T - np.diag(np.diag(counts))
+
+
+# --- Kümeleme ---
+def cluster_genres(cooccurrence: np.ndarray, k: int, iterations: int = KMEANS_ITERATIONS) -> np.ndarray:
+    """Türleri birlikte görülme profillerine göre k kümeye ayırır (küresel k-means)"""
+    frequency = np.diag(cooccurrence).astype(np.float64)
+    norm = np.sqrt(np.outer(frequency, frequency))
+    similarity = np.divide(cooccurrence, norm, out=np.zeros_like(norm), where=norm > 0)
+
+    lengths = np.linalg.norm(similarity, axis=1, keepdims=True)
+    profiles = np.divide(similarity, lengths, out=np.zeros_like(similarity), where=lengths > 0)
+
+    # Deterministik başlangıç: en sık tür, sonra sıklığa göre ağırlıklı en uzak türler
+    centers = [int(np.argmax(frequency))]
+    closest = profiles @ profiles[centers[0]]
+    for _ in range(1, k):
+        candidate = int(np.argmax(frequency * (1.0 - closest)))
+        centers.append(candidate)
+        closest = np.maximum(closest, profiles @ profiles[candidate])
+    center_vectors = profiles[centers]
+
+    labels = np.full(len(frequency), -1)
+    for _ in range(iterations):
+        new_labels = np.argmax(profiles @ center_vectors.T, axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+
+        membership = np.zeros((len(frequency), k))
+        membership[np.arange(len(frequency)), labels] = frequency
+        updated = membership.T @ profiles
+        updated_lengths = np.linalg.norm(updated, axis=1, keepdims=True)
+        # Boş kalan küme önceki merkezini korur
+        center_vectors = np.where(updated_lengths > 0, updated / np.maximum(updated_lengths, 1e-12), center_vectors)
+    return labels
+
+
+def assign_tracks(matrix: np.ndarray, genre_labels: np.ndarray, k: int) -> np.ndarray:
+    """Her şarkıyı türlerinin sıra ağırlıklı oylarıyla bir kümeye atar; türü yoksa -1"""
+    rows, positions = np.nonzero(matrix >= 0)
+    clusters = genre_labels[matrix[rows, positions]]
+    # Listeler puana göre sıralı; üst sıradaki türler daha çok oy verir (1 - sıra / 10)
+    weights = 1.0 - positions / 10.0
+
+    scores = np.bincount(rows * k + clusters, weights=weights, minlength=len(matrix) * k).reshape(len(matrix), k)
+    assigned = np.argmax(scores, axis=1)
+    assigned[scores.max(axis=1) <= 0] = -1
+    return assigned
+
+
+# --- Genel Arayüz ---
+def cluster_tracks(track_genres: Dict[str, List[str]], k: int = DEFAULT_CLUSTER_COUNT) -> Dict:
+    """Şarkı → tür listesi eşlemesinden k playlist kümesi üretir"""
+    track_ids = list(track_genres)
+    matrix, vocabulary = encode_genres([track_genres[tid] or [] for tid in track_ids])
+    if not vocabulary:
+        return {"k": 0, "clusters": [], "unassigned": track_ids, "track_count": len(track_ids), "genre_count": 0}
+
+    k = max(1, min(k, len(vocabulary), MAX_CLUSTER_COUNT))
+    cooccurrence = cooccurrence_matrix(matrix, len(vocabulary))
+    genre_labels = cluster_genres(cooccurrence, k)
+    assigned = assign_tracks(matrix, genre_labels, k)
+
+    frequency = np.diag(cooccurrence)
+    order = np.argsort(-frequency, kind="stable")
+    ids = np.array(track_ids, dtype=object)
+
+    clusters = []
+    for cluster in range(k):
+        genres = [vocabulary[g] for g in order if genre_labels[g] == cluster]
+        members = ids[assigned == cluster].tolist()
+        if not members:
+            continue
+        clusters.append({
+            "name": " / ".join(genres[:CLUSTER_NAME_GENRES]),
+            "genres": genres[:CLUSTER_TOP_GENRES],
+            "genre_count": len(genres),
+            "track_count": len(members),
+            "track_ids": members
+        })
+    clusters.sort(key=lambda item: -item["track_count"])
+
+    return {
+        "k": k,
+        "clusters": clusters,
+        "unassigned": ids[assigned < 0].tolist(),
+        "track_count": len(track_ids),
+        "genre_count": len(vocabulary)
+    }
+
+
+def clusters_to_genre_map(result: Dict) -> Dict[str, List[str]]:
+    """Kümeleri playlist oluşturmanın beklediği {ad: [track_id]} biçimine çevirir"""
+    return {cluster["name"]: cluster["track_ids"] for cluster in result["clusters"]}
@@ -1,54 +1,156 @@
 import os
+import sys
 import logging
 import requests
 import spotipy
-from typing import Dict, List, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
 from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
-from dotenv import load_dotenv
+from spotipy.oauth2 import SpotifyClientCredentials
 from pymongo import UpdateOne
-from data_store import MongoDBManager, cache_tracks
-from utils import chunk_list, validate_track_ids, RateLimiter
+from data_store import MongoDBManager, cache_tracks, get_fresh_cached_genres
+from utils import (
+    chunk_list,
+    validate_track_ids,
+    RateLimiter,
+    summarize_genre_map,
+    create_spotify_client,
+    smart_request_with_retry
+)
+from metrics import instrument_session, record_cache, retry_hook
+from retry_budget import wait_with_budget, stop_on_budget
+from logger import SampledLog
+import tracing
+import progress
 
 # --- Konfigürasyon ---
-load_dotenv()
 logger = logging.getLogger(__name__)
+# Şarkı başına tekrarlanan hata/uyarılar örneklenir
+provider_log = SampledLog(logger)
+track_log = SampledLog(logger)
 
 # --- Sabitler ---
 LASTFM_API_KEY = os.getenv("LASTFM_API_KEY")
 MUSICBRAINZ_USER_AGENT = "Music Data Fetcher (seyyidberatkaraca@gmail.com)"
+LASTFM_API_URL = os.getenv("LASTFM_API_URL", "http://ws.audioscrobbler.com/2.0/")
+MUSICBRAINZ_API_URL = os.getenv("MUSICBRAINZ_API_URL", "https://musicbrainz.org/ws/2/recording/")
 MAX_WORKERS = int(os.getenv("GENRE_FINDER_MAX_WORKERS", 5))
 REQUEST_TIMEOUT = float(os.getenv("GENRE_FINDER_TIMEOUT", 15))
 CACHE_TTL_DAYS = int(os.getenv("GENRE_CACHE_TTL", 30))
+# Aynı anda kuyrukta bekleyen en fazla iş sayısı (geri basınç penceresi)
+SUBMIT_WINDOW = int(os.getenv("GENRE_FINDER_WINDOW", MAX_WORKERS * 4))
+# Sonuçlar bu boyuta ulaştıkça track_cache'e yazılır
+CACHE_FLUSH_SIZE = int(os.getenv("GENRE_FINDER_FLUSH_SIZE", 100))
+# Spotify'ın tek artists çağrısında kabul ettiği en fazla id
+ARTIST_BATCH_SIZE = 50
 
 # --- Retry Ayarları ---
 SPOTIFY_RETRY_CONFIG = {
-    'wait': wait_exponential(multiplier=1, min=1, max=5),
-    'stop': stop_after_attempt(5),
+    'wait': wait_with_budget(wait_exponential(multiplier=1, min=1, max=5)),
+    'stop': stop_after_attempt(5) | stop_on_budget(),
     'retry': retry_if_exception_type((spotipy.SpotifyException, requests.RequestException)),
-    'before_sleep': lambda _: logger.warning("Spotify API hatası, yeniden deneniyor...")
+    'before_sleep': retry_hook("spotify", lambda _: logger.warning("Spotify API hatası, yeniden deneniyor..."))
 }
 EXTERNAL_API_RETRY_CONFIG = {
-    'wait': wait_exponential(multiplier=1, min=1, max=5),
-    'stop': stop_after_attempt(3),
+    'wait': wait_with_budget(wait_exponential(multiplier=1, min=1, max=5)),
+    'stop': stop_after_attempt(3) | stop_on_budget(),
     'retry': retry_if_exception_type(requests.RequestException),
-    'before_sleep': lambda _: logger.warning("Harici API hatası, yeniden deneniyor...")
+    'before_sleep': retry_hook("external_api", lambda _: logger.warning("Harici API hatası, yeniden deneniyor..."))
 }
 
+# --- HTTP Oturumları ---
+# Bağlantılar yeniden kullanılır; yanıtlar sağlayıcı metriklerine işlenir
+LASTFM_SESSION = instrument_session(requests.Session(), "lastfm")
+MUSICBRAINZ_SESSION = instrument_session(requests.Session(), "musicbrainz")
+
+# --- Tür Puanlama ---
+SOURCE_WEIGHTS = {'spotify': 2.0, 'lastfm': 1.5, 'musicbrainz': 1.2}
+
+
+def calculate_genre_weights(sources: Dict) -> Dict[str, float]:
+    """Kaynak ağırlığı × kaynak içi sıra ağırlığı (1 - sıra / 10) toplamı"""
+    genre_scores = {}
+    for source, genres in sources.items():
+        for idx, genre in enumerate(genres if isinstance(genres, list) else []):
+            score = SOURCE_WEIGHTS.get(source, 1.0) * (1 - idx / 10)
+            genre_scores[genre] = genre_scores.get(genre, 0) + score
+    return genre_scores
+
+
+def rank_genres(sources: Dict) -> List[str]:
+    """Kaynaklardaki türleri puana göre azalan sırada döndürür; eşitlikte kaynak sırası korunur"""
+    genre_scores = calculate_genre_weights(sources)
+    return sorted(genre_scores, key=genre_scores.get, reverse=True)
+
+
+class SharedGenreCache:
+    """Birden fazla GenreFinder arasında paylaşılan bellek içi çözüm önbelleği.
+
+    Toplu işlerde kullanıcı kütüphaneleri örtüştüğünde her şarkı ve sanatçı
+    yalnızca bir kez çözülür: çözümü süren bir anahtarı isteyen diğer
+    thread'ler aynı Future'ı bekler. Hatalı sonuçlar saklanmaz, sonraki
+    istekte yeniden denenir. Ömrü bir çalıştırma ile sınırlıdır.
+    """
 
-class GenreFinder:
     def __init__(self):
-        self.sp = spotipy.Spotify(auth_manager=self._get_auth_manager())
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Future] = {}
+        self._counters: Dict[str, int] = {}
+
+    def resolve(self, kind: str, key: str, resolver: Callable[[str], Dict]) -> Tuple[Dict, bool]:
+        """(sonuç, bu çağrıda mı çözüldü) döndürür"""
+        with self._lock:
+            future = self._entries.get((kind, key))
+            owner = future is None
+            if owner:
+                future = self._entries[(kind, key)] = Future()
+            self._count_locked(f"{kind}.{'resolved' if owner else 'shared'}")
+
+        if not owner:
+            return future.result(), False
+
+        try:
+            result = resolver(key)
+        except BaseException as e:
+            self._discard(kind, key)
+            future.set_exception(e)
+            raise
+        if "error" in result:
+            self._discard(kind, key)
+        future.set_result(result)
+        return result, True
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._count_locked(name, amount)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    def _count_locked(self, name: str, amount: int = 1) -> None:
+        self._counters[name] = self._counters.get(name, 0) + amount
+
+    def _discard(self, kind: str, key: str) -> None:
+        with self._lock:
+            self._entries.pop((kind, key), None)
+
+
+class GenreFinder:
+    def __init__(self, sp: Optional[spotipy.Spotify] = None, shared_cache: Optional[SharedGenreCache] = None):
+        # İstek sahibinin client'ı verilirse ayrı bir OAuth akışı başlatılmaz
+        self.sp = sp or create_spotify_client(auth_manager=self._get_auth_manager())
         self.mongo = MongoDBManager()
         self.rate_limiter = RateLimiter(calls=5, period=1)
+        self.shared_cache = shared_cache
 
     def _get_auth_manager(self):
-        return spotipy.oauth2.SpotifyOAuth(
+        # Şarkı/sanatçı uç noktaları kullanıcı yetkisi gerektirmez; paylaşılan OAuth önbelleği kullanılmaz
+        return SpotifyClientCredentials(
             client_id=os.getenv("SPOTIPY_CLIENT_ID"),
-            client_secret=os.getenv("SPOTIPY_CLIENT_SECRET"),
-            redirect_uri=os.getenv("SPOTIPY_REDIRECT_URI"),
-            scope="user-library-read"
+            client_secret=os.getenv("SPOTIPY_CLIENT_SECRET")
         )
 
     @retry(**SPOTIFY_RETRY_CONFIG)
@@ -56,7 +158,9 @@ class GenreFinder:
         collection = self.mongo.get_collection("artist_genres")
         cached = collection.find_one({"_id": artist_id})
         if cached and cached.get("expires_at", datetime.utcnow()) > datetime.utcnow():
+            record_cache("artist_genres", 1, 0)
             return cached
+        record_cache("artist_genres", 0, 1)
 
         artist = self.sp.artist(artist_id)
         genres = artist.get('genres', [])
@@ -79,8 +183,8 @@ class GenreFinder:
                 "track": track,
                 "format": "json"
             }
-            response = requests.get(
-                "http://ws.audioscrobbler.com/2.0/",
+            response = LASTFM_SESSION.get(
+                LASTFM_API_URL,
                 params=params,
                 timeout=REQUEST_TIMEOUT,
                 headers={"User-Agent": MUSICBRAINZ_USER_AGENT}
@@ -88,15 +192,15 @@ class GenreFinder:
             response.raise_for_status()
             return [tag['name'].lower() for tag in response.json().get('track', {}).get('toptags', {}).get('tag', [])][:5]
         except Exception as e:
-            logger.warning(f"Last.fm verisi alınamadı: {e}")
+            provider_log.warning("Last.fm verisi alınamadı: %s", e)
             return []
 
     @retry(**EXTERNAL_API_RETRY_CONFIG)
     @RateLimiter(calls=2, period=5)
     def _get_musicbrainz_genres(self, artist: str, track: str) -> List[str]:
         try:
-            response = requests.get(
-                "https://musicbrainz.org/ws/2/recording/",
+            response = MUSICBRAINZ_SESSION.get(
+                MUSICBRAINZ_API_URL,
                 params={
                     "query": f'artist:"{artist}" AND recording:"{track}"',
                     "fmt": "json",
@@ -111,21 +215,16 @@ class GenreFinder:
                 return []
             return [tag['name'].lower() for tag in data[0].get('tags', [])][:3]
         except Exception as e:
-            logger.warning(f"MusicBrainz verisi alınamadı: {e}")
+            provider_log.warning("MusicBrainz verisi alınamadı: %s", e)
             return []
 
     def _calculate_genre_weights(self, sources: Dict) -> Dict[str, float]:
-        weights = {'spotify': 2.0, 'lastfm': 1.5, 'musicbrainz': 1.2}
-        genre_scores = {}
-        for source, genres in sources.items():
-            for idx, genre in enumerate(genres if isinstance(genres, list) else []):
-                score = weights.get(source, 1.0) * (1 - idx / 10)
-                genre_scores[genre] = genre_scores.get(genre, 0) + score
-        return genre_scores
+        return calculate_genre_weights(sources)
 
     def _get_track_genres(self, track_id: str) -> Dict:
         try:
-            track = self.sp.track(track_id)
+            with tracing.stage("spotify.track"):
+                track = smart_request_with_retry(self.sp.track, track_id)
             if not track:
                 raise ValueError("track verisi alınamadı")
 
@@ -134,9 +233,12 @@ class GenreFinder:
             artist_name = main_artist.get("name", "unknown")
             track_name = track.get("name", "unknown")
 
-            spotify_genres = self._get_spotify_artist_details(main_artist["id"]).get("genres", [])
-            lastfm_genres = self._get_lastfm_genres(artist_name, track_name)
-            musicbrainz_genres = self._get_musicbrainz_genres(artist_name, track_name)
+            with tracing.stage("spotify.artist"):
+                spotify_genres = self._get_artist(main_artist["id"]).get("genres", [])
+            with tracing.stage("lastfm"):
+                lastfm_genres = self._get_lastfm_genres(artist_name, track_name)
+            with tracing.stage("musicbrainz"):
+                musicbrainz_genres = self._get_musicbrainz_genres(artist_name, track_name)
 
             sources = {
                 "spotify": spotify_genres if isinstance(spotify_genres, list) else [],
@@ -145,7 +247,8 @@ class GenreFinder:
             }
 
             genre_scores = self._calculate_genre_weights(sources)
-            genres_list = list(genre_scores.keys())
+            # track_cache'teki tür listesi puana göre azalan sıradadır (kümeleme bu sırayı kullanır)
+            genres_list = sorted(genre_scores, key=genre_scores.get, reverse=True)
 
             if not genres_list:
                 return {
@@ -169,42 +272,129 @@ class GenreFinder:
             }
 
         except Exception as e:
-            logger.error(f"Tür analiz hatası ({track_id}): {str(e)}")
+            track_log.error("Tür analiz hatası (%s): %s", track_id, e)
             return {"track_id": track_id, "error": str(e)}
 
-    def process_tracks(self, track_ids: List[str]) -> Dict[str, List[str]]:
+    def _get_artist(self, artist_id: str) -> Dict:
+        if self.shared_cache is None:
+            return self._get_spotify_artist_details(artist_id)
+        return self.shared_cache.resolve("artist", artist_id, self._get_spotify_artist_details)[0]
+
+    def _resolve_track(self, track_id: str) -> Tuple[Dict, bool]:
+        """(sonuç, yeni mi) döndürür; paylaşılan önbellekten gelen sonuçlar yeniden yazılmaz"""
+        if self.shared_cache is None:
+            return self._get_track_genres(track_id), True
+        return self.shared_cache.resolve("track", track_id, self._get_track_genres)
+
+    @retry(**SPOTIFY_RETRY_CONFIG)
+    def _get_spotify_artists(self, artist_ids: List[str]) -> List[Dict]:
+        return self.sp.artists(artist_ids).get("artists") or []
+
+    def refresh_artists(self, artist_ids: List[str], batch_size: int = ARTIST_BATCH_SIZE) -> int:
+        """Sanatçı türlerini toplu artists çağrısıyla yeniler (önbellek ısıtma için)"""
+        collection = self.mongo.get_collection("artist_genres")
+        refreshed = 0
+        for chunk in chunk_list([aid for aid in artist_ids if aid], batch_size):
+            artists = self._get_spotify_artists(chunk)
+            expires_at = datetime.utcnow() + timedelta(days=CACHE_TTL_DAYS)
+            operations = [
+                UpdateOne(
+                    {"_id": artist["id"]},
+                    {"$set": {
+                        "genres": artist.get("genres") if isinstance(artist.get("genres"), list) else [],
+                        "expires_at": expires_at
+                    }},
+                    upsert=True
+                )
+                for artist in artists if artist
+            ]
+            if operations:
+                collection.bulk_write(operations, ordered=False)
+                refreshed += len(operations)
+        return refreshed
+
+    def process_tracks(self, track_ids: List[str], max_age_days: int = CACHE_TTL_DAYS) -> Dict[str, List[str]]:
+        """Şarkıların türlerini çözer; max_age_days'ten eski önbellek kayıtları yeniden çözülür"""
         validated_ids = validate_track_ids(track_ids)
         genre_map = {}
-        cache_batch = []
 
+        # Önceki (yarıda kalmış olsa bile) çalışmaların sonuçlarını yeniden kullan
+        with tracing.span("cache_lookup", track_count=len(validated_ids)):
+            cached = get_fresh_cached_genres(validated_ids, max_age_days)
+        for tid, primary in cached.items():
+            if primary:
+                genre_map.setdefault(sys.intern(primary), []).append(tid)
+        pending_ids = [tid for tid in validated_ids if tid not in cached]
+        pending = iter(pending_ids)
+        record_cache("track_cache", len(cached), len(pending_ids))
+        if self.shared_cache is not None:
+            self.shared_cache.count("track.stored", len(cached))
+        tracing.set_attribute("cache_hits", len(cached))
+        logger.info("♻️ %d/%d şarkı önbellekten alındı", len(cached), len(validated_ids))
+        resolved = 0
+        progress.update("genre_resolution", total=len(validated_ids), cache_hits=len(cached), resolved=0)
+
+        cache_batch = []
         with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            futures = {executor.submit(self._get_track_genres, tid): tid for tid in validated_ids}
-
-            for future in as_completed(futures):
-                tid = futures[future]
-                try:
-                    result = future.result()
-                    genres = result.get("genres", [])
-                    primary = result.get("primary_genre", "unknown") or "unknown"
-
-                    if isinstance(genres, list) and genres:
-                        genre_map.setdefault(primary, []).append(tid)
-
-                    cache_batch.append({
-                        "id": tid,
-                        "genres": genres,
-                        "primary_genre": primary,
-                        "confidence": result.get("confidence", 0.0),
-                        "sources": result.get("sources", {}),
-                        "last_updated": datetime.utcnow()
-                    })
-                except Exception as e:
-                    logger.error(f"İşlem hatası ({tid}): {str(e)}")
+            in_flight = {}
+
+            def submit_next() -> bool:
+                for tid in pending:
+                    in_flight[tracing.submit_in_context(executor, self._resolve_track, tid)] = tid
+                    return True
+                return False
+
+            while len(in_flight) < SUBMIT_WINDOW and submit_next():
+                pass
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    tid = in_flight.pop(future)
+                    submit_next()
+                    resolved += 1
+                    if resolved % progress.UPDATE_EVERY == 0:
+                        progress.update(
+                            "genre_resolution",
+                            total=len(validated_ids), cache_hits=len(cached), resolved=resolved
+                        )
+                    try:
+                        result, fresh = future.result()
+                        if "error" in result:
+                            continue
+
+                        genres = result.get("genres", [])
+                        primary = sys.intern(result.get("primary_genre", "unknown") or "unknown")
+
+                        if isinstance(genres, list) and genres:
+                            genre_map.setdefault(primary, []).append(tid)
+
+                        if not fresh:
+                            continue
+                        cache_batch.append({
+                            "id": tid,
+                            "genres": genres,
+                            "primary_genre": primary,
+                            "confidence": result.get("confidence", 0.0),
+                            "sources": result.get("sources", {}),
+                            "last_updated": datetime.utcnow()
+                        })
+                    except Exception as e:
+                        track_log.error("İşlem hatası (%s): %s", tid, e)
+
+                    if len(cache_batch) >= CACHE_FLUSH_SIZE:
+                        with tracing.stage("cache_write"):
+                            cache_tracks(cache_batch)
+                        cache_batch = []
 
         if cache_batch:
-            for chunk in chunk_list(cache_batch, 500):
-                cache_tracks(chunk)
+            with tracing.stage("cache_write"):
+                cache_tracks(cache_batch)
 
+        progress.update(
+            "genre_resolution",
+            total=len(validated_ids), cache_hits=len(cached), resolved=resolved, genres=len(genre_map)
+        )
         return genre_map
 
     def get_genre_analysis(self, playlist_id: str) -> Dict:
@@ -227,10 +417,4 @@ class GenreAnalysisError(Exception):
 
 
 def get_genre_breakdown(genre_map: Dict) -> Dict:
-    return {
-        genre: {
-            "count": len(tracks),
-            "percentage": round(len(tracks) / sum(len(v) for v in genre_map.values()) * 100, 2)
-        }
-        for genre, tracks in genre_map.items()
-    }
+    return summarize_genre_map(genre_map)["breakdown"]
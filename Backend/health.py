@@ -0,0 +1,213 @@
+"""
+Bağımlılıklar için arka plan sağlık kontrolleri.
+
+MongoDB ve her sağlayıcı kendi thread'inde periyodik olarak yoklanır; gecikme
+histogramı, son başarı zamanı ve ardışık hata sayısı bellekte tutulur.
+/health, /health/live ve /health/ready yalnızca bu önbelleklenmiş durumu
+okur; yük dengeleyici kontrolleri Mongo'ya sorgu ya da Spotify'a istek
+göndermez.
+
+Sağlayıcı kontrolleri kimlik doğrulamasız bir HEAD isteğidir: 5xx dışındaki
+her yanıt (401/404/405 dahil) erişilebilir sayılır ve kota harcanmaz.
+"""
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pymongo
+import requests
+
+from data_store import MongoDBManager
+from genre_finder import LASTFM_API_URL, MUSICBRAINZ_API_URL
+from metrics import Histogram, CallbackGauge
+
+# --- Konfigürasyon ---
+logger = logging.getLogger(__name__)
+
+# --- Ayarlar ---
+PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", 15))
+PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", 3))
+# Son kontrol bu kadar saniyeden eskiyse durum bayat sayılır (varsayılan 3 × aralık)
+STALE_AFTER = float(os.getenv("HEALTH_STALE_AFTER", PROBE_INTERVAL * 3))
+# Hazır olmak için ayakta olması gereken bağımlılıklar; diğerleri yalnızca "degraded" yapar
+CRITICAL_DEPENDENCIES = tuple(
+    name.strip() for name in os.getenv("HEALTH_CRITICAL_DEPENDENCIES", "mongo").split(",") if name.strip()
+)
+SPOTIFY_PROBE_URL = (os.getenv("SPOTIFY_API_BASE") or "https://api.spotify.com/v1/").rstrip("/") + "/"
+MAX_ERROR_LENGTH = 200
+PROBE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+PROBE_DURATION = Histogram(
+    "dependency_probe_duration_seconds",
+    "Arka plan sağlık kontrollerinin süresi",
+    ("dependency", "status"),
+    buckets=PROBE_BUCKETS
+)
+
+
+# --- Kontroller ---
+def check_mongo() -> None:
+    """Havuzdaki bağlantı üzerinden ping; bağlantı kurulduktan sonra yeniden deneme yapılmaz"""
+    # Sunucu seçimi dahil tüm işlemi PROBE_TIMEOUT ile sınırlar
+    with pymongo.timeout(PROBE_TIMEOUT):
+        MongoDBManager.ping()
+
+
+def http_check(url: str, timeout: float = PROBE_TIMEOUT) -> Callable[[], None]:
+    """Sunucu hatası (5xx) ya da bağlantı hatasında istisna fırlatan HEAD kontrolü"""
+    session = requests.Session()
+
+    def check() -> None:
+        response = session.head(url, timeout=timeout, allow_redirects=False)
+        if response.status_code >= 500:
+            raise RuntimeError(f"HTTP {response.status_code}")
+    return check
+
+
+class Probe:
+    """Tek bir bağımlılığın periyodik kontrolü ve son durumu"""
+
+    def __init__(self, name: str, check: Callable[[], None], interval: float = PROBE_INTERVAL):
+        self.name = name
+        self.check = check
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._state: Dict = {
+            "status": "unknown",
+            "latency_ms": None,
+            "checked_at": None,
+            "last_success": None,
+            "last_error": None,
+            "consecutive_failures": 0
+        }
+
+    def run_once(self) -> bool:
+        start = time.perf_counter()
+        try:
+            self.check()
+            error = None
+        except Exception as e:
+            error = (str(e) or type(e).__name__)[:MAX_ERROR_LENGTH]
+        elapsed = time.perf_counter() - start
+        now = time.time()
+        PROBE_DURATION.observe(elapsed, self.name, "up" if error is None else "down")
+
+        with self._lock:
+            previous = self._state["status"]
+            current = "up" if error is None else "down"
+            self._state["latency_ms"] = round(elapsed * 1000, 2)
+            self._state["checked_at"] = now
+            if error is None:
+                self._state.update(status="up", last_success=now, consecutive_failures=0)
+            else:
+                self._state.update(status="down", last_error=error)
+                self._state["consecutive_failures"] += 1
+
+        if previous != current:
+            log = logger.info if error is None else logger.warning
+            log("Sağlık durumu değişti: %s %s → %s%s", self.name, previous, current, f" ({error})" if error else "")
+        return error is None
+
+    def snapshot(self, now: Optional[float] = None) -> Dict:
+        now = now or time.time()
+        with self._lock:
+            state = dict(self._state)
+        checked_at = state["checked_at"]
+        if checked_at is not None and now - checked_at > STALE_AFTER:
+            state["status"] = "stale"
+        for key in ("checked_at", "last_success"):
+            if state[key] is not None:
+                state[key] = datetime.utcfromtimestamp(state[key]).isoformat()
+        return state
+
+    def last_success(self) -> Optional[float]:
+        with self._lock:
+            return self._state["last_success"]
+
+    def is_up(self) -> bool:
+        return self.snapshot()["status"] == "up"
+
+
+class HealthMonitor:
+    """Her kontrolü kendi daemon thread'inde çalıştırır; durum sorguları kilit dışında beklemez"""
+
+    def __init__(self, probes: List[Probe], critical: Tuple[str, ...] = CRITICAL_DEPENDENCIES):
+        self.probes = {probe.name: probe for probe in probes}
+        self.critical = tuple(name for name in critical if name in self.probes)
+        self.started_at = time.time()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stopping.clear()
+        for probe in self.probes.values():
+            thread = threading.Thread(target=self._run, args=(probe,), name=f"health-{probe.name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 1.0) -> None:
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self, probe: Probe) -> None:
+        while not self._stopping.is_set():
+            probe.run_once()
+            self._stopping.wait(probe.interval)
+
+    # --- Durum ---
+    def dependencies(self) -> Dict[str, Dict]:
+        now = time.time()
+        return {name: probe.snapshot(now) for name, probe in self.probes.items()}
+
+    def is_alive(self) -> bool:
+        return all(thread.is_alive() for thread in self._threads)
+
+    def readiness(self) -> Tuple[bool, Dict[str, Dict]]:
+        dependencies = self.dependencies()
+        ready = all(dependencies[name]["status"] == "up" for name in self.critical)
+        return ready, dependencies
+
+    def status(self) -> str:
+        ready, dependencies = self.readiness()
+        if not ready:
+            return "down"
+        return "ok" if all(dep["status"] == "up" for dep in dependencies.values()) else "degraded"
+
+    def uptime(self) -> float:
+        return round(time.time() - self.started_at, 1)
+
+
+def default_probes() -> List[Probe]:
+    return [
+        Probe("mongo", check_mongo),
+        Probe("spotify", http_check(SPOTIFY_PROBE_URL)),
+        Probe("lastfm", http_check(LASTFM_API_URL)),
+        Probe("musicbrainz", http_check(MUSICBRAINZ_API_URL))
+    ]
+
+
+monitor = HealthMonitor(default_probes())
+
+DEPENDENCY_UP = CallbackGauge(
+    "dependency_up",
+    "Son arka plan kontrolüne göre bağımlılık ayakta mı (1/0)",
+    ("dependency",),
+    lambda: {(name,): float(probe.is_up()) for name, probe in monitor.probes.items()}
+)
+DEPENDENCY_LAST_SUCCESS = CallbackGauge(
+    "dependency_last_success_timestamp_seconds",
+    "Bağımlılığın son başarılı kontrolünün Unix zamanı",
+    ("dependency",),
+    lambda: {
+        (name,): probe.last_success()
+        for name, probe in monitor.probes.items()
+        if probe.last_success() is not None
+    }
+)
@@ -0,0 +1,310 @@
+"""
+Spotify, Last.fm ve MusicBrainz için yerel sahte sağlayıcı sunucusu.
+
+Backend'in kullandığı uç noktaları deterministik verilerle taklit eder;
+gecikme, 429 (Retry-After) ve hata oranları sağlayıcı bazında ayarlanır.
+
+Çalıştırma (Backend dizininde):
+    python loadtest/fake_providers.py --port 9090 --latency-ms 80 --rate-429 0.02
+
+Backend'i yönlendirmek için:
+    SPOTIFY_API_BASE=http://127.0.0.1:9090/v1/
+    LASTFM_API_URL=http://127.0.0.1:9090/2.0/
+    MUSICBRAINZ_API_URL=http://127.0.0.1:9090/ws/2/recording/
+
+Çalışırken ayarlar POST /_control ile değiştirilebilir, sayaçlar
+GET /_stats ile okunur.
+"""
+import os
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import argparse
+from collections import Counter
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request, Body, HTTPException
+from fastapi.responses import JSONResponse
+
+# --- Sabitler ---
+PROVIDERS = ("spotify", "lastfm", "musicbrainz")
+GENRES = [
+    "rock", "pop", "indie", "hip hop", "jazz", "electronic", "metal", "folk",
+    "soul", "r&b", "punk", "blues", "classical", "country", "reggae", "house"
+]
+LIBRARY_SIZE = int(os.getenv("FAKE_LIBRARY_SIZE", 200))
+ARTIST_COUNT = int(os.getenv("FAKE_ARTIST_COUNT", 150))
+
+
+@dataclass
+class ProviderConfig:
+    latency_ms: float = float(os.getenv("FAKE_LATENCY_MS", 50))
+    jitter_ms: float = float(os.getenv("FAKE_JITTER_MS", 20))
+    rate_429: float = float(os.getenv("FAKE_429_RATE", 0.0))
+    retry_after: int = int(os.getenv("FAKE_RETRY_AFTER", 1))
+    error_rate: float = float(os.getenv("FAKE_ERROR_RATE", 0.0))
+
+
+CONFIG: Dict[str, ProviderConfig] = {name: ProviderConfig() for name in PROVIDERS}
+STATS: Counter = Counter()
+# Oluşturulan playlist'ler: id → {owner, name, tracks, followers}
+PLAYLISTS: Dict[str, Dict] = {}
+
+app = FastAPI(title="Fake Music Providers")
+
+
+# --- Deterministik Veri ---
+def _digest(*parts: str) -> str:
+    return hashlib.blake2b("|".join(parts).encode(), digest_size=16).hexdigest()
+
+
+def track_id_for(user_id: str, index: int) -> str:
+    return _digest("track", user_id, str(index))[:22]
+
+
+def artist_index(key: str) -> int:
+    return int(_digest("artist", key)[:8], 16) % ARTIST_COUNT
+
+
+def artist_id_for(index: int) -> str:
+    return _digest("artist-id", str(index))[:22]
+
+
+def genres_for(key: str, count: int) -> List[str]:
+    start = int(_digest("genres", key)[:8], 16)
+    return [GENRES[(start + i * 3) % len(GENRES)] for i in range(count)]
+
+
+def track_object(track_id: str) -> Dict:
+    index = artist_index(track_id)
+    return {
+        "id": track_id,
+        "name": f"Track {track_id[:8]}",
+        "type": "track",
+        "uri": f"spotify:track:{track_id}",
+        "preview_url": None,
+        "artists": [{"id": artist_id_for(index), "name": f"Artist {index}", "type": "artist"}]
+    }
+
+
+def user_for(request: Request) -> str:
+    """Bearer token'dan kullanıcıyı çıkarır; harness token'ı `fake-<user_id>` olarak yazar"""
+    token = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if not token:
+        raise HTTPException(status_code=401, detail="No token provided")
+    return token.removeprefix("fake-")
+
+
+# --- Hata ve Gecikme Enjeksiyonu ---
+def provider_for(path: str) -> Optional[str]:
+    if path.startswith("/v1/"):
+        return "spotify"
+    if path.startswith("/2.0"):
+        return "lastfm"
+    if path.startswith("/ws/2/"):
+        return "musicbrainz"
+    return None
+
+
+@app.middleware("http")
+async def inject_faults(request: Request, call_next):
+    provider = provider_for(request.url.path)
+    if provider is None:
+        return await call_next(request)
+
+    config = CONFIG[provider]
+    STATS[f"{provider}.requests"] += 1
+    delay = max(0.0, config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms))
+    await asyncio.sleep(delay / 1000)
+
+    roll = random.random()
+    if roll < config.rate_429:
+        STATS[f"{provider}.429"] += 1
+        return JSONResponse(
+            {"error": {"status": 429, "message": "API rate limit exceeded"}},
+            status_code=429,
+            headers={"Retry-After": str(config.retry_after)}
+        )
+    if roll < config.rate_429 + config.error_rate:
+        STATS[f"{provider}.errors"] += 1
+        return JSONResponse(
+            {"error": {"status": 503, "message": "Service unavailable"}},
+            status_code=503
+        )
+    return await call_next(request)
+
+
+# --- Spotify ---
+@app.get("/v1/me")
+@app.get("/v1/me/")
+async def me(request: Request):
+    user_id = user_for(request)
+    return {"id": user_id, "display_name": f"Load User {user_id}", "images": [], "type": "user"}
+
+
+@app.get("/v1/me/tracks")
+async def saved_tracks(request: Request, limit: int = 20, offset: int = 0):
+    user_id = user_for(request)
+    end = min(offset + limit, LIBRARY_SIZE)
+    items = [
+        {"added_at": "2024-01-01T00:00:00Z", "track": track_object(track_id_for(user_id, i))}
+        for i in range(offset, end)
+    ]
+    return {
+        "items": items,
+        "limit": limit,
+        "offset": offset,
+        "total": LIBRARY_SIZE,
+        "next": None if end >= LIBRARY_SIZE else f"/v1/me/tracks?offset={end}&limit={limit}"
+    }
+
+
+@app.get("/v1/tracks/{track_id}")
+async def track(track_id: str):
+    return track_object(track_id)
+
+
+def artist_object(artist_id: str) -> Dict:
+    return {
+        "id": artist_id,
+        "name": f"Artist {artist_id[:6]}",
+        "type": "artist",
+        "genres": genres_for(artist_id, 3)
+    }
+
+
+@app.get("/v1/artists/{artist_id}")
+async def artist(artist_id: str):
+    return artist_object(artist_id)
+
+
+@app.get("/v1/artists")
+async def artists(ids: str = ""):
+    return {"artists": [artist_object(artist_id) for artist_id in ids.split(",") if artist_id]}
+
+
+@app.post("/v1/users/{user_id}/playlists", status_code=201)
+async def create_playlist(user_id: str, payload: Dict = Body(default={})):
+    playlist_id = uuid.uuid4().hex[:22]
+    PLAYLISTS[playlist_id] = {"owner": user_id, "name": payload.get("name"), "tracks": [], "followers": {user_id}}
+    STATS["spotify.playlists_created"] += 1
+    return {
+        "id": playlist_id,
+        "name": payload.get("name"),
+        "public": payload.get("public", True),
+        "owner": {"id": user_id},
+        "external_urls": {"spotify": f"https://open.spotify.com/playlist/{playlist_id}"}
+    }
+
+
+def _playlist_or_404(playlist_id: str) -> Dict:
+    playlist = PLAYLISTS.get(playlist_id)
+    if playlist is None:
+        raise HTTPException(status_code=404, detail="Playlist not found")
+    return playlist
+
+
+@app.get("/v1/playlists/{playlist_id}")
+async def get_playlist(playlist_id: str):
+    playlist = _playlist_or_404(playlist_id)
+    return {
+        "id": playlist_id,
+        "name": playlist["name"],
+        "owner": {"id": playlist["owner"]},
+        "tracks": {"total": len(playlist["tracks"])}
+    }
+
+
+@app.post("/v1/playlists/{playlist_id}/tracks", status_code=201)
+async def add_tracks(playlist_id: str, payload: Any = Body(default=None)):
+    playlist = _playlist_or_404(playlist_id)
+    # spotipy URI listesini doğrudan gövde olarak gönderir
+    uris = payload.get("uris", []) if isinstance(payload, dict) else payload or []
+    playlist["tracks"].extend(uris)
+    return {"snapshot_id": uuid.uuid4().hex}
+
+
+@app.put("/v1/playlists/{playlist_id}/followers")
+async def follow_playlist(playlist_id: str, request: Request):
+    _playlist_or_404(playlist_id)["followers"].add(user_for(request))
+    return JSONResponse(None, status_code=200)
+
+
+@app.delete("/v1/playlists/{playlist_id}/followers")
+async def unfollow_playlist(playlist_id: str, request: Request):
+    _playlist_or_404(playlist_id)["followers"].discard(user_for(request))
+    return JSONResponse(None, status_code=200)
+
+
+# --- Last.fm ---
+@app.get("/2.0/")
+async def lastfm(method: str, artist: str = "", track: str = ""):
+    if method != "track.getInfo":
+        return JSONResponse({"error": 3, "message": "Invalid Method"}, status_code=400)
+    tags = [{"name": genre, "url": ""} for genre in genres_for(f"{artist}|{track}", 4)]
+    return {"track": {"name": track, "artist": {"name": artist}, "toptags": {"tag": tags}}}
+
+
+# --- MusicBrainz ---
+@app.get("/ws/2/recording/")
+async def musicbrainz(query: str = ""):
+    tags = [{"name": genre, "count": 1} for genre in genres_for(query, 2)]
+    return {"count": 1, "offset": 0, "recordings": [{"id": _digest("mb", query)[:36], "tags": tags}]}
+
+
+# --- Kontrol ---
+@app.post("/_control")
+async def control(payload: Dict = Body(...)):
+    """Ayarları değiştirir: {"provider": "spotify"|"all", "latency_ms": 100, ...}"""
+    targets = PROVIDERS if payload.get("provider", "all") == "all" else (payload["provider"],)
+    for name in targets:
+        for key, value in payload.items():
+            if key != "provider" and hasattr(CONFIG[name], key):
+                setattr(CONFIG[name], key, type(getattr(CONFIG[name], key))(value))
+    return {name: asdict(config) for name, config in CONFIG.items()}
+
+
+@app.get("/_stats")
+async def stats():
+    return {
+        "config": {name: asdict(config) for name, config in CONFIG.items()},
+        "counters": dict(STATS),
+        "playlists": len(PLAYLISTS),
+        "timestamp": time.time()
+    }
+
+
+@app.post("/_reset")
+async def reset():
+    STATS.clear()
+    PLAYLISTS.clear()
+    return {"status": "ok"}
+
+
+# --- Başlatıcı ---
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sahte Spotify/Last.fm/MusicBrainz sunucusu")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9090)
+    parser.add_argument("--latency-ms", type=float)
+    parser.add_argument("--jitter-ms", type=float)
+    parser.add_argument("--rate-429", type=float)
+    parser.add_argument("--retry-after", type=int)
+    parser.add_argument("--error-rate", type=float)
+    args = parser.parse_args()
+
+    for config in CONFIG.values():
+        for key in ("latency_ms", "jitter_ms", "rate_429", "retry_after", "error_rate"):
+            value = getattr(args, key)
+            if value is not None:
+                setattr(config, key, value)
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
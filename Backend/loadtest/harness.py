@@ -0,0 +1,231 @@
+"""
+FastAPI uygulamasını N eşzamanlı sanal kullanıcıyla yükleyen harness.
+
+Her kullanıcı için auth_tokens koleksiyonuna `fake-<user_id>` token'ı
+yazılır (sahte sağlayıcı sunucusu kullanıcıyı bu token'dan tanır), ardından
+her kullanıcı kendi thread'inde senaryoyu çalıştırır. Sonunda uç nokta
+başına istek sayısı, hata sayısı, throughput ve p50/p95/p99 gecikmeleri
+raporlanır.
+
+Çalıştırma (Backend dizininde, uygulama sahte sağlayıcılara yönlendirilmiş olarak):
+    python loadtest/harness.py --users 20 --iterations 3 --output loadtest/results.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TOKEN_COLLECTION = "auth_tokens"
+TOKEN_LIFETIME = 7 * 24 * 3600
+
+
+# --- Ölçüm ---
+class LatencyRecorder:
+    """Uç nokta başına gecikme ve durum kodu kayıtları (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.failures: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint: str, elapsed: float, status: int, failed: bool) -> None:
+        with self._lock:
+            self.samples[endpoint].append(elapsed)
+            self.statuses[endpoint][status] += 1
+            if failed:
+                self.failures[endpoint] += 1
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Sıralı listeden en yakın sıra (nearest-rank) yüzdeliği"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def build_report(recorder: LatencyRecorder, elapsed: float, users: int) -> Dict:
+    endpoints = {}
+    for endpoint, samples in sorted(recorder.samples.items()):
+        ordered = sorted(samples)
+        endpoints[endpoint] = {
+            "requests": len(ordered),
+            "failures": recorder.failures.get(endpoint, 0),
+            "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(ordered, 50) * 1000, 1),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 1),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 1),
+            "max_ms": round(ordered[-1] * 1000, 1),
+            "statuses": dict(recorder.statuses[endpoint])
+        }
+    total = sum(item["requests"] for item in endpoints.values())
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "users": users,
+        "elapsed_s": round(elapsed, 2),
+        "total_requests": total,
+        "total_failures": sum(item["failures"] for item in endpoints.values()),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "endpoints": endpoints
+    }
+
+
+def print_report(report: Dict) -> None:
+    print(
+        f"\n{report['users']} kullanıcı, {report['elapsed_s']}s, "
+        f"{report['total_requests']} istek ({report['throughput_rps']} rps), "
+        f"{report['total_failures']} hata\n"
+    )
+    print(f"{'uç nokta':<36}{'istek':>7}{'hata':>6}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for endpoint, item in report["endpoints"].items():
+        print(
+            f"{endpoint:<36}{item['requests']:>7}{item['failures']:>6}{item['throughput_rps']:>8}"
+            f"{item['p50_ms']:>9}{item['p95_ms']:>9}{item['p99_ms']:>9}{item['max_ms']:>9}"
+        )
+
+
+# --- Kullanıcı Hazırlığı ---
+def seed_users(count: int, prefix: str) -> List[str]:
+    """Sahte sağlayıcının tanıyacağı token'ları auth_tokens'a yazar"""
+    from pymongo import ReplaceOne
+    from data_store import MongoDBManager
+
+    now = int(time.time())
+    user_ids = [f"{prefix}{i:04d}" for i in range(count)]
+    operations = [
+        ReplaceOne(
+            {"_id": user_id},
+            {
+                "_id": user_id,
+                "access_token": f"fake-{user_id}",
+                "refresh_token": f"fake-refresh-{user_id}",
+                "token_type": "Bearer",
+                "scope": "user-library-read playlist-modify-private playlist-modify-public",
+                "expires_in": TOKEN_LIFETIME,
+                "expires_at": now + TOKEN_LIFETIME
+            },
+            upsert=True
+        )
+        for user_id in user_ids
+    ]
+    MongoDBManager().get_collection(TOKEN_COLLECTION).bulk_write(operations, ordered=False)
+    return user_ids
+
+
+# --- Senaryo ---
+class VirtualUser:
+    def __init__(self, base_url: str, user_id: str, recorder: LatencyRecorder, timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.user_id = user_id
+        self.recorder = recorder
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.cookies.set("spotify_user_id", user_id)
+
+    def call(self, method: str, endpoint: str, path: str, **kwargs) -> Optional[Dict]:
+        start = time.perf_counter()
+        status, body = 0, None
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+            status = response.status_code
+            if response.content:
+                body = response.json()
+        except (requests.RequestException, ValueError):
+            pass
+        elapsed = time.perf_counter() - start
+
+        # Uygulama hataları çoğu uç noktada 200 + {"status": "error"} olarak döner
+        failed = status == 0 or status >= 400 or (isinstance(body, dict) and body.get("status") == "error")
+        self.recorder.record(endpoint, elapsed, status, failed)
+        return None if failed else body
+
+    def run(self, iterations: int, think_time: float, with_playlists: bool) -> None:
+        for _ in range(iterations):
+            self.call("GET", "GET /user/profile", "/user/profile")
+
+            body = self.call("POST", "POST /analyze-liked", "/analyze-liked")
+            analysis_id = (body or {}).get("data", {}).get("analysis_id")
+            if analysis_id:
+                self.call("GET", "GET /analysis/{id}", f"/analysis/{analysis_id}")
+                self.call("GET", "GET /analysis/{id}/breakdown", f"/analysis/{analysis_id}/breakdown")
+                self.call("GET", "GET /analysis/{id}/details", f"/analysis/{analysis_id}/details")
+                self.call("GET", "GET /analysis/{id}/filtered", f"/analysis/{analysis_id}/filtered")
+                if with_playlists:
+                    self.call(
+                        "POST", "POST /playlists", "/playlists",
+                        json={"analysis_id": analysis_id, "confirmation": True}
+                    )
+
+            self.call("GET", "GET /user/analyses", "/user/analyses", params={"limit": 20})
+            if think_time:
+                time.sleep(random.uniform(0, think_time))
+
+
+def run_load(
+        base_url: str,
+        user_ids: List[str],
+        iterations: int,
+        think_time: float = 0.0,
+        with_playlists: bool = False,
+        timeout: float = 120.0
+) -> Dict:
+    recorder = LatencyRecorder()
+    users = [VirtualUser(base_url, user_id, recorder, timeout) for user_id in user_ids]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(users)) as executor:
+        futures = [executor.submit(user.run, iterations, think_time, with_playlists) for user in users]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - start
+
+    return build_report(recorder, elapsed, len(users))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Spotify Analyzer yük testi")
+    parser.add_argument("--base-url", default=os.getenv("LOADTEST_BASE_URL", "http://127.0.0.1:8080"))
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=1)
+    parser.add_argument("--think-time", type=float, default=0.0, help="İterasyonlar arası en fazla bekleme (s)")
+    parser.add_argument("--user-prefix", default="loadtest-user-")
+    parser.add_argument("--skip-seed", action="store_true", help="auth_tokens'a token yazma")
+    parser.add_argument("--with-playlists", action="store_true", help="Senaryoya playlist oluşturmayı ekle")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="Raporun yazılacağı JSON dosyası")
+    args = parser.parse_args()
+
+    if args.skip_seed:
+        user_ids = [f"{args.user_prefix}{i:04d}" for i in range(args.users)]
+    else:
+        user_ids = seed_users(args.users, args.user_prefix)
+
+    report = run_load(
+        args.base_url,
+        user_ids,
+        args.iterations,
+        think_time=args.think_time,
+        with_playlists=args.with_playlists,
+        timeout=args.timeout
+    )
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,165 @@
+import atexit
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Tuple
+
+# --- Ayarlar ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# urllib3, spotipy ve pymongo gibi kütüphanelerin seviyesi
+LOG_LIBRARY_LEVEL = os.getenv("LOG_LIBRARY_LEVEL", "WARNING").upper()
+LOG_FILE = os.getenv("LOG_FILE", "logs/application.log")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+# Öğe başına (şarkı/sayfa/tür) loglarda çağrı noktası başına saniyedeki en fazla kayıt; 0 = sınırsız
+LOG_ITEM_RATE = float(os.getenv("LOG_ITEM_RATE", 5))
+# Öğe başına loglarda yalnızca her N. kayıt yazılır
+LOG_ITEM_EVERY = max(1, int(os.getenv("LOG_ITEM_EVERY", 1)))
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LIBRARY_LOGGERS = ("urllib3", "spotipy", "pymongo", "httpx", "asyncio")
+
+_configured = False
+_listener = None
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Kaydı yalnızca kuyruğa bırakır; biçimlendirme ve yazma listener thread'inde yapılır.
+
+    Kuyruk doluysa kayıt düşürülür ve sayılır, istek thread'i beklemez.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Yalnızca mesaj birleştirilir (argümanlar sonradan değişebilir);
+        # zaman damgası ve biçim listener'da uygulanır
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
 
 def configure_logging():
-    """Log konfigürasyonunu yapar"""
+    """Log konfigürasyonunu yapar (birden fazla çağrıda yalnızca ilki etkili)"""
+    global _configured, _listener
+    if _configured:
+        return
+    _configured = True
+
     # Log klasörü oluştur
-    if not os.path.exists('logs'):
-        os.makedirs('logs')
-
-    # Temel konfigürasyon
-    logging.basicConfig(
-        level=logging.DEBUG,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            RotatingFileHandler(
-                'logs/application.log',
-                maxBytes=1024*1024*5,  # 5 MB
-                backupCount=5
-            ),
-            logging.StreamHandler()
-        ]
+    log_dir = os.path.dirname(LOG_FILE)
+    if log_dir and not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = RotatingFileHandler(
+        LOG_FILE,
+        maxBytes=1024*1024*5,  # 5 MB
+        backupCount=5
     )
-    logging.info("Logging sistemi başlatıldı")
\ No newline at end of file
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    # Uygulama thread'leri yalnızca kuyruğa yazar; disk ve konsol G/Ç'si listener'da
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.handlers[:] = [NonBlockingQueueHandler(log_queue)]
+    for name in LIBRARY_LOGGERS:
+        logging.getLogger(name).setLevel(LOG_LIBRARY_LEVEL)
+
+    _listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+    logging.info("Logging sistemi başlatıldı (seviye: %s)", LOG_LEVEL)
+
+
+def stop_logging() -> None:
+    """Kuyruktaki kayıtları yazıp listener thread'ini durdurur"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class SampledLog:
+    """Öğe başına tekrarlanan log çağrıları için örnekleyici.
+
+    Sayaçlar çağrı noktası başına (seviye + mesaj biçimi) tutulur: her N.
+    kayıt ve saniyede en fazla `rate` kayıt yazılır; atlananların sayısı aynı
+    çağrı noktasının bir sonraki kaydına eklenir. ERROR ve üstü hiç
+    örneklenmez. Seviye kapalıysa mesaj hiç biçimlendirilmez.
+    """
+
+    __slots__ = ("logger", "rate", "every", "_lock", "_sites")
+
+    def __init__(self, logger: logging.Logger, rate: float = LOG_ITEM_RATE, every: int = LOG_ITEM_EVERY):
+        self.logger = logger
+        self.rate = rate
+        self.every = max(1, every)
+        self._lock = threading.Lock()
+        # (seviye, mesaj) → [görülen, atlanan, pencere başlangıcı, penceredeki kayıt]
+        self._sites: Dict[Tuple[int, str], list] = {}
+
+    def _admit(self, level: int, msg: str) -> int:
+        """Kayıt yazılacaksa o ana kadar atlanan sayıyı, yazılmayacaksa -1 döndürür"""
+        with self._lock:
+            site = self._sites.get((level, msg))
+            if site is None:
+                site = self._sites[(level, msg)] = [0, 0, 0.0, 0]
+            site[0] += 1
+            if site[0] % self.every:
+                site[1] += 1
+                return -1
+            if self.rate:
+                now = time.monotonic()
+                if now - site[2] >= 1.0:
+                    site[2] = now
+                    site[3] = 0
+                if site[3] >= self.rate:
+                    site[1] += 1
+                    return -1
+                site[3] += 1
+            suppressed, site[1] = site[1], 0
+            return suppressed
+
+    def log(self, level: int, msg: str, *args) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        if level >= logging.ERROR:
+            self.logger.log(level, msg, *args)
+            return
+        suppressed = self._admit(level, msg)
+        if suppressed < 0:
+            return
+        if suppressed:
+            self.logger.log(level, msg + " (+%d benzer kayıt atlandı)", *args, suppressed)
+        else:
+            self.logger.log(level, msg, *args)
+
+    def debug(self, msg: str, *args) -> None:
+        self.log(logging.DEBUG, msg, *args)
+
+    def info(self, msg: str, *args) -> None:
+        self.log(logging.INFO, msg, *args)
+
+    def warning(self, msg: str, *args) -> None:
+        self.log(logging.WARNING, msg, *args)
+
+    def error(self, msg: str, *args) -> None:
+        self.log(logging.ERROR, msg, *args)
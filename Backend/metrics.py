@@ -0,0 +1,334 @@
+"""
+Prometheus metin formatında dışa aktarılan hafif metrikler.
+
+Harici bağımlılık yoktur; sayaçlar ve histogramlar kilitli sözlüklerde
+tutulur ve yalnızca /metrics okunduğunda metne çevrilir. Sıcak yollardaki
+maliyet bir kilit ve birkaç sözlük işlemidir.
+"""
+import time
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+
+import tracing
+
+# --- Sabitler ---
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+
+# --- Metrik Tipleri ---
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _label_text(self, values: Tuple, extra: str = "") -> str:
+        pairs = [
+            f'{name}="{_escape(str(value))}"'
+            for name, value in zip(self.labelnames, values)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{self._label_text(labels)} {_number(value)}" for labels, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Tuple[str, ...] = (),
+            buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # etiketler → [bucket sayıları..., +Inf sayısı, toplam]
+        self._values: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def time(self, *labels) -> "_Timer":
+        return _Timer(self, labels)
+
+    def count(self, *labels) -> int:
+        state = self._values.get(labels)
+        return sum(state[:-1]) if state else 0
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(labels, list(state)) for labels, state in self._values.items()]
+
+        lines = []
+        for labels, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{self._label_text(labels, bucket_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(labels)} {_number(state[-1])}")
+            lines.append(f"{self.name}_count{self._label_text(labels)} {cumulative}")
+        return lines
+
+
+class CallbackGauge(_Metric):
+    """Değeri okuma anında bir fonksiyondan alınan gauge"""
+
+    kind = "gauge"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Tuple[str, ...],
+            callback: Callable[[], Dict[Tuple, float]]
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def samples(self) -> Iterable[str]:
+        try:
+            values = self.callback()
+        except Exception:
+            return []
+        return [f"{self.name}{self._label_text(labels)} {_number(value)}" for labels, value in values.items()]
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Tuple):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metrik zaten kayıtlı: {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def unregister(self, name: str) -> None:
+        self._metrics.pop(name, None)
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+REGISTRY = Registry()
+
+# --- Metrikler ---
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "API isteklerinin süresi",
+    ("method", "route", "status")
+)
+PROVIDER_REQUESTS = Counter(
+    "provider_requests_total",
+    "Dış sağlayıcılara yapılan HTTP istekleri",
+    ("provider", "status")
+)
+PROVIDER_REQUEST_DURATION = Histogram(
+    "provider_request_duration_seconds",
+    "Dış sağlayıcı yanıt süresi (başlıklar alınana kadar)",
+    ("provider",)
+)
+PROVIDER_RATE_LIMITED = Counter(
+    "provider_rate_limited_total",
+    "Sağlayıcıların döndürdüğü 429 yanıtları (HTTP katmanındaki tekrarlar dahil)",
+    ("provider",)
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Önbellek sorguları",
+    ("cache", "result")
+)
+RATE_LIMITER_WAIT = Counter(
+    "rate_limiter_wait_seconds_total",
+    "RateLimiter'ın bekletmede geçirdiği toplam süre",
+    ("limiter",)
+)
+RATE_LIMITER_WAITS = Counter(
+    "rate_limiter_waits_total",
+    "RateLimiter'ın çağrıyı beklettiği durum sayısı",
+    ("limiter",)
+)
+RETRIES = Counter(
+    "retries_total",
+    "Tenacity yeniden deneme sayısı",
+    ("operation",)
+)
+RETRY_BUDGET_REFUSED = Counter(
+    "retry_budget_refused_total",
+    "İstek bütçesi bittiği ya da son tarih aşılacağı için yapılmayan yeniden denemeler",
+    ("reason",)
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "mongo_command_duration_seconds",
+    "MongoDB komut süreleri",
+    ("command", "status"),
+    buckets=MONGO_BUCKETS
+)
+
+
+# --- Yardımcılar ---
+def record_cache(cache: str, hits: int, misses: int) -> None:
+    if hits:
+        CACHE_REQUESTS.inc(cache, "hit", amount=hits)
+    if misses:
+        CACHE_REQUESTS.inc(cache, "miss", amount=misses)
+
+
+def retry_hook(operation: str, callback: Optional[Callable] = None) -> Callable:
+    """Tenacity before_sleep hook'u: yeniden denemeyi sayar, varsa asıl hook'u çağırır"""
+    def before_sleep(retry_state) -> None:
+        RETRIES.inc(operation)
+        if callback is not None:
+            callback(retry_state)
+    return before_sleep
+
+
+def provider_response_hook(provider: str) -> Callable:
+    """requests oturumları için yanıt hook'u; süre, durum ve 429'ları kaydeder"""
+    def hook(response, *_, **__):
+        PROVIDER_REQUESTS.inc(provider, str(response.status_code))
+        PROVIDER_REQUEST_DURATION.observe(response.elapsed.total_seconds(), provider)
+
+        # urllib3'ün Retry-After ile kendi içinde tekrar ettiği 429'lar
+        rate_limited = int(response.status_code == 429)
+        retries = getattr(response.raw, "retries", None)
+        for attempt in getattr(retries, "history", ()) or ():
+            if attempt.status == 429:
+                rate_limited += 1
+        if rate_limited:
+            PROVIDER_RATE_LIMITED.inc(provider, amount=rate_limited)
+
+        tracing.record_call(
+            provider,
+            response.request.path_url.split("?", 1)[0],
+            response.status_code,
+            response.elapsed.total_seconds(),
+            rate_limited
+        )
+    return hook
+
+
+def instrument_session(session, provider: str):
+    """requests.Session'a sağlayıcı metriklerini ekler"""
+    session.hooks.setdefault("response", []).append(provider_response_hook(provider))
+    return session
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo komut olaylarından süre histogramı üretir"""
+
+    def started(self, event) -> None:
+        pass
+
+    def succeeded(self, event) -> None:
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, event.command_name, "ok")
+
+    def failed(self, event) -> None:
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, event.command_name, "failed")
+
+
+class MetricsMiddleware:
+    """İstek süresini route şablonuna göre ölçen ASGI middleware'i"""
+
+    def __init__(self, app, excluded_paths: Tuple[str, ...] = ("/metrics",)):
+        self.app = app
+        self.excluded_paths = excluded_paths
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Ham path yerine route şablonu: etiket sayısı sınırlı kalır
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status_code)
+            )
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,9 @@
+# MongoDB koleksiyon ve indexlerini oluşturur (deploy sırasında bir kez çalıştırılır)
+import sys
+
+from data_store import MongoDBManager
+
+if not MongoDBManager.ensure_schema():
+    print("[!] MongoDB indexleri oluşturulamadı, ayrıntılar logda")
+    sys.exit(1)
+print("[*] MongoDB şeması hazır")
@@ -0,0 +1,134 @@
+import sys
+from typing import Dict, Iterable, List, Optional
+
+
+class TrackRecord:
+    """Bellekte şarkı başına dict yerine kullanılan kompakt kayıt.
+
+    Sanatçı adları intern edilir; aynı sanatçının şarkıları tek string
+    nesnesini paylaşır. Dict'e yalnızca API/Mongo sınırında çevrilir.
+    """
+
+    __slots__ = ("id", "name", "artist", "added_at", "preview_url", "artist_id")
+
+    def __init__(
+            self,
+            id: str,
+            name: Optional[str] = None,
+            artist: Optional[str] = None,
+            added_at: Optional[str] = None,
+            preview_url: Optional[str] = None,
+            artist_id: Optional[str] = None
+    ):
+        self.id = id
+        self.name = name
+        self.artist = sys.intern(artist) if artist else artist
+        self.added_at = added_at
+        self.preview_url = preview_url
+        # Önbellek ısıtıcısı sanatçıları user_tracks'ten bulabilsin diye saklanır
+        self.artist_id = sys.intern(artist_id) if artist_id else artist_id
+
+    @classmethod
+    def from_saved_item(cls, item: Dict) -> "TrackRecord":
+        """Spotify saved-tracks yanıtındaki bir öğeden kayıt oluşturur"""
+        track = item["track"]
+        return cls(
+            id=track["id"],
+            name=track["name"],
+            artist=track["artists"][0]["name"],
+            added_at=item.get("added_at"),
+            preview_url=track.get("preview_url"),
+            artist_id=track["artists"][0].get("id")
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "TrackRecord":
+        """Mongo'dan gelen şarkı dokümanından kayıt oluşturur"""
+        return cls(
+            id=data.get("id") or data.get("_id"),
+            name=data.get("name"),
+            artist=data.get("artist"),
+            added_at=data.get("added_at"),
+            preview_url=data.get("preview_url"),
+            artist_id=data.get("artist_id")
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "artist": self.artist,
+            "added_at": self.added_at,
+            "preview_url": self.preview_url,
+            "artist_id": self.artist_id
+        }
+
+    def __repr__(self) -> str:
+        return f"TrackRecord(id={self.id!r}, name={self.name!r}, artist={self.artist!r})"
+
+
+def tracks_to_dicts(tracks: Iterable[TrackRecord]) -> List[Dict]:
+    return [t.to_dict() for t in tracks]
+
+
+class AnalysisIndex:
+    """Bir analiz için önceden hesaplanmış arama yapıları.
+
+    Analizler kaydedildikten sonra değişmediği için bir kez kurulur ve
+    filtreleme, seçim ve detay fonksiyonları tarafından paylaşılır.
+    """
+
+    __slots__ = ("genres", "track_genres", "tracks")
+
+    def __init__(self, genre_map: Dict[str, List[str]], tracks: Iterable[Dict] = ()):
+        # Tür başına değişmez şarkı dizileri
+        self.genres: Dict[str, tuple] = {
+            sys.intern(genre): tuple(track_ids) for genre, track_ids in genre_map.items()
+        }
+        # Ters index: şarkı → türler
+        self.track_genres: Dict[str, tuple] = {}
+        for genre, track_ids in self.genres.items():
+            for tid in track_ids:
+                self.track_genres[tid] = self.track_genres.get(tid, ()) + (genre,)
+        self.tracks: Dict[str, TrackRecord] = {}
+        for data in tracks:
+            record = TrackRecord.from_dict(data)
+            if record.id:
+                self.tracks[record.id] = record
+
+    @classmethod
+    def from_analysis(cls, analysis: Dict) -> "AnalysisIndex":
+        return cls(analysis.get("genres") or {}, analysis.get("tracks") or [])
+
+    def genre_of(self, track_id: str) -> Optional[str]:
+        genres = self.track_genres.get(track_id)
+        return genres[0] if genres else None
+
+    def filter(self, excluded_ids: Iterable[str] = (), drop_empty: bool = False) -> Dict[str, List[str]]:
+        """Hariç tutulan şarkıları çıkarır; yalnızca etkilenen türler taranır"""
+        excluded = excluded_ids if isinstance(excluded_ids, (set, frozenset)) else set(excluded_ids)
+        affected = {
+            genre for tid in excluded if tid in self.track_genres
+            for genre in self.track_genres[tid]
+        }
+
+        result = {}
+        for genre, track_ids in self.genres.items():
+            kept = [tid for tid in track_ids if tid not in excluded] if genre in affected else list(track_ids)
+            if kept or not drop_empty:
+                result[genre] = kept
+        return result
+
+    def select(
+            self,
+            selected_tracks: Dict[str, List[str]],
+            excluded_ids: Iterable[str] = ()
+    ) -> Dict[str, List[str]]:
+        """Kullanıcının tür bazlı seçimini hariç tutulanlardan arındırır"""
+        excluded = excluded_ids if isinstance(excluded_ids, (set, frozenset)) else set(excluded_ids)
+        if not excluded:
+            return {genre: list(track_ids) for genre, track_ids in selected_tracks.items()}
+        return {
+            genre: [tid for tid in track_ids if tid not in excluded]
+            for genre, track_ids in selected_tracks.items()
+        }
@@ -3,12 +3,11 @@ import asyncio
 import logging
 import time
 import spotipy
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
 from spotipy.exceptions import SpotifyException
 from pymongo import UpdateOne
-from dotenv import load_dotenv
 
 from data_store import MongoDBManager, save_playlist_records
 from utils import (
@@ -17,13 +16,15 @@ from utils import (
     validate_track_ids,
     RateLimiter
 )
-from spotify_auth import auth_manager
-from logger import configure_logging
+from metrics import retry_hook
+from retry_budget import wait_with_budget, stop_on_budget
+from logger import SampledLog
+import progress
 
 # --- Konfigürasyon ---
-load_dotenv()
-configure_logging()
 logger = logging.getLogger(__name__)
+# Tür/playlist başına tekrarlanan loglar örneklenir
+genre_log = SampledLog(logger)
 
 # --- Sabitler ---
 MAX_RETRIES = int(os.getenv("PLAYLIST_MAX_RETRIES", 5))
@@ -34,17 +35,18 @@ CACHE_TTL_DAYS = int(os.getenv("PLAYLIST_CACHE_TTL", 30))
 
 # --- Retry Ayarları ---
 SPOTIFY_RETRY_CONFIG = {
-    'wait': wait_exponential(multiplier=1, min=2, max=30),
-    'stop': stop_after_attempt(MAX_RETRIES),
+    'wait': wait_with_budget(wait_exponential(multiplier=1, min=2, max=30)),
+    'stop': stop_after_attempt(MAX_RETRIES) | stop_on_budget(),
     'retry': retry_if_exception_type(SpotifyException),
-    'before_sleep': lambda _: logger.warning("Spotify API hatası, yeniden deneniyor...")
+    'before_sleep': retry_hook("spotify", lambda _: logger.warning("Spotify API hatası, yeniden deneniyor..."))
 }
 
 
 class PlaylistCreator:
-    def __init__(self):
-        self.sp = auth_manager.get_valid_client()
-        self.user_id = self._get_current_user_id()
+    def __init__(self, sp: spotipy.Spotify, user_id: Optional[str] = None):
+        # İsteğin kendi client'ı kullanılır; kullanıcı kimliği biliniyorsa me() çağrısı atlanır
+        self.sp = sp
+        self.user_id = user_id or self._get_current_user_id()
         self.mongo = MongoDBManager()
         self.collection = self.mongo.get_collection("playlists")
         self.rate_limiter = RateLimiter(calls=3, period=10)
@@ -71,7 +73,7 @@ class PlaylistCreator:
                 try:
                     # Verify that the playlist still exists on Spotify
                     smart_request_with_retry(self.sp.playlist, cached["_id"])
-                    logger.info(f"🎧 Playlist önbellekten alındı: {name}")
+                    genre_log.info("🎧 Playlist önbellekten alındı: %s", name)
                     cached.setdefault("id", cached.get("_id"))
                     try:
                         smart_request_with_retry(
@@ -151,7 +153,7 @@ class PlaylistCreator:
         except SpotifyException as e:
             if e.http_status == 429:
                 retry_after = int(e.headers.get("Retry-After", 30))
-                logger.warning(f"⚠️ Rate limit! {retry_after}s bekleniyor...")
+                logger.warning("⚠️ Rate limit! %ds bekleniyor...", retry_after)
                 time.sleep(retry_after)
                 return self._add_tracks_safe(playlist_id, track_ids)
             raise
@@ -165,16 +167,18 @@ class PlaylistCreator:
             raise PermissionError("Playlist oluşturmak için kullanıcı onayı gereklidir.")
 
         results = {}
+        created = 0
+        progress.stage("playlist_creation", total=len(genre_map))
 
         try:
             for genre, track_ids in genre_map.items():
                 if not track_ids or not isinstance(track_ids, list):
-                    logger.warning(f"{genre} türü için geçersiz veya boş track listesi.")
+                    genre_log.warning("%s türü için geçersiz veya boş track listesi.", genre)
                     continue
 
                 filtered_ids = [tid for tid in track_ids if isinstance(tid, str) and tid.strip()]
                 if not filtered_ids:
-                    logger.warning(f"{genre} türü için geçerli şarkı ID'si bulunamadı.")
+                    genre_log.warning("%s türü için geçerli şarkı ID'si bulunamadı.", genre)
                     continue
 
                 try:
@@ -188,9 +192,9 @@ class PlaylistCreator:
                     success, count = await asyncio.to_thread(self._add_tracks_safe, playlist["id"], filtered_ids)
 
                     if count == 0:
-                        logger.warning(f"{genre} türü için şarkılar eklenemedi, playlist boş olabilir.")
+                        genre_log.warning("%s türü için şarkılar eklenemedi, playlist boş olabilir.", genre)
                     else:
-                        logger.info(f"{genre} türü playlistine {count} şarkı eklendi")
+                        genre_log.info("%s türü playlistine %d şarkı eklendi", genre, count)
 
                     results[genre] = {
                         "playlist_id": playlist["id"],
@@ -198,19 +202,27 @@ class PlaylistCreator:
                         "snapshot_id": playlist.get("snapshot_id", "unknown"),
                         "url": playlist.get("external_urls", {}).get("spotify") or playlist.get("url", "#")
                     }
+                    created += 1
+                    progress.update(
+                        "playlist_creation",
+                        total=len(genre_map), created=created, failed=len(results) - created, tracks_added=count
+                    )
 
-                    # MongoDB kayıt
-                    asyncio.create_task(asyncio.to_thread(save_playlist_records, {
+                    # MongoDB kayıt (write-behind kuyruğu, istek yolunu bekletmez)
+                    save_playlist_records({
                         "genre": genre,
                         "type": "auto_generated",
                         "user_id": self.user_id,
                         "track_ids": filtered_ids,
                         "created_at": datetime.utcnow()
-                    }))
+                    })
 
                 except Exception as e:
-                    logger.error(f"{genre} türü işlenemedi: {str(e)}")
+                    genre_log.error("%s türü işlenemedi: %s", genre, e)
                     results[genre] = {"error": str(e)}
+                    progress.update(
+                        "playlist_creation", total=len(genre_map), created=created, failed=len(results) - created
+                    )
 
             return results
 
@@ -260,8 +272,14 @@ class PlaylistCleanupError(Exception):
 
 # --- Test ---
 if __name__ == "__main__":
+    import sys
+    from logger import configure_logging
+    from spotify_auth import auth_manager
+    configure_logging()
     try:
-        creator = PlaylistCreator()
+        # Kullanım: python playlist_creator.py <spotify_user_id>
+        user_id = sys.argv[1]
+        creator = PlaylistCreator(auth_manager.get_valid_client(user_id), user_id)
         test_genres = {
             "rock": ["11dFghVXANMlKmJXsNCbNl", "3dRfiJ2650SZu6GbydcHNb"],
             "pop": ["4PTG3Z6ehGkBFwjybzWkR8", "6FED8aeieEnUWwQqAO9zT1"]
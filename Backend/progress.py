@@ -0,0 +1,160 @@
+"""
+Analiz ve playlist oluşturma ilerlemesi için süreç içi yayın/abonelik.
+
+Yayın kanalı kullanıcı kimliğidir ve iş akışının girişinde bind() ile
+contextvar'a yazılır; alt katmanlar (get_user_tracks, process_tracks,
+create_genre_playlists) yalnızca stage()/update() çağırır. Kanala abone
+yoksa bu çağrılar bir sözlük aramasından ibarettir: olay oluşturulmaz,
+kilit alınmaz.
+
+Aboneler GET /progress/stream (SSE) ile bağlanır. Olaylar worker
+thread'lerinden aboneye ait event loop'a call_soon_threadsafe ile aktarılır;
+yavaş bir abonenin kuyruğu dolarsa yeni olaylar o abone için düşürülür.
+"""
+import os
+import json
+import time
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, Iterator, Optional, Set
+
+# --- Ayarlar ---
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("PROGRESS_QUEUE_SIZE", 256))
+HEARTBEAT_SECONDS = float(os.getenv("PROGRESS_HEARTBEAT_SECONDS", 15))
+# Şarkı başına sayaçlar bu kadar şarkıda bir yayınlanır
+UPDATE_EVERY = int(os.getenv("PROGRESS_UPDATE_EVERY", 25))
+
+_channel: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("progress_channel", default=None)
+
+
+class Subscription:
+    """Tek bir SSE bağlantısının olay kuyruğu; yalnızca kendi event loop'unda okunur"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self.dropped = 0
+
+    def push(self, event: Dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+
+class ProgressBroker:
+    """Kanal → abone kümesi; yayın abone yoksa kilitsiz olarak hemen döner"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._sequence = 0
+
+    def has_subscribers(self, channel: Optional[str]) -> bool:
+        return channel is not None and channel in self._subscribers
+
+    def subscribe(self, channel: str) -> Subscription:
+        """Çağıran event loop'a bağlı yeni bir abonelik açar"""
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, channel: str, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[channel]
+
+    def publish(self, channel: str, event_type: str, data: Dict) -> None:
+        subscribers = self._subscribers.get(channel)
+        if not subscribers:
+            return
+        with self._lock:
+            self._sequence += 1
+            event = {"seq": self._sequence, "type": event_type, "ts": round(time.time(), 3), **data}
+            targets = tuple(subscribers)
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, event)
+            except RuntimeError:
+                # Aboneye ait loop kapanmış; bağlantı zaten sonlanıyor
+                pass
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+broker = ProgressBroker()
+
+
+# --- Yayıncı Tarafı ---
+@contextmanager
+def bind(channel: Optional[str], operation: str) -> Iterator[None]:
+    """Bu bağlamdaki ilerleme olaylarını kanala yönlendirir; başlangıç/bitiş olaylarını yayınlar"""
+    token = _channel.set(channel)
+    _emit("started", {"operation": operation})
+    try:
+        yield
+    except BaseException as e:
+        failed(operation, str(e))
+        raise
+    finally:
+        _channel.reset(token)
+
+
+def enabled() -> bool:
+    """Geçerli kanalın abonesi var mı; pahalı sayaç hesaplarından önce kontrol edilir"""
+    return broker.has_subscribers(_channel.get())
+
+
+def stage(name: str, **counters) -> None:
+    """Aşama geçişi (ör. track_loading → genre_resolution)"""
+    _emit("stage", {"stage": name, "counters": counters})
+
+
+def update(name: str, **counters) -> None:
+    """Aşama içi sayaç güncellemesi (sayfa, çözülen şarkı, oluşturulan playlist...)"""
+    _emit("progress", {"stage": name, "counters": counters})
+
+
+def completed(operation: str, **data) -> None:
+    _emit("completed", {"operation": operation, **data})
+
+
+def failed(operation: str, error: str) -> None:
+    _emit("failed", {"operation": operation, "error": error})
+
+
+def _emit(event_type: str, data: Dict) -> None:
+    channel = _channel.get()
+    if broker.has_subscribers(channel):
+        broker.publish(channel, event_type, data)
+
+
+# --- SSE ---
+def format_event(event: Dict) -> str:
+    return f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+async def event_stream(channel: str, heartbeat: float = HEARTBEAT_SECONDS) -> AsyncIterator[str]:
+    """Kanalın olaylarını SSE metni olarak üretir; bağlantı kapanınca abonelik bırakılır"""
+    subscription = broker.subscribe(channel)
+    try:
+        yield "retry: 3000\n: connected\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                # Ara sunucuların boşta bağlantıyı kapatmaması için yorum satırı
+                yield ": keepalive\n\n"
+                continue
+            yield format_event(event)
+    finally:
+        broker.unsubscribe(channel, subscription)
@@ -0,0 +1,217 @@
+import os
+import json
+import gzip
+import hashlib
+import logging
+from datetime import datetime, date
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from bson import ObjectId
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - opsiyonel bağımlılık
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - opsiyonel bağımlılık
+    brotli = None
+
+# --- Sabitler ---
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+# Analiz yanıtlarının biçimi değiştiğinde artırılmalı, eski ETag'ler geçersizleşir
+ANALYSIS_CACHE_VERSION = 1
+ANALYSIS_CACHE_CONTROL = os.getenv("ANALYSIS_CACHE_CONTROL", "private, max-age=86400")
+# track_cache gibi değişebilen verilerden türetilen yanıtlar her kullanımda yeniden doğrulanır
+DERIVED_CACHE_CONTROL = os.getenv("DERIVED_CACHE_CONTROL", "private, no-cache")
+# NDJSON akışlarında tek seferde gönderilen satır sayısı
+NDJSON_CHUNK_RECORDS = int(os.getenv("NDJSON_CHUNK_RECORDS", 200))
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+logger = logging.getLogger(__name__)
+
+
+# --- JSON Serileştirme ---
+def json_default(obj: Any) -> Any:
+    """JSON'un doğrudan desteklemediği tipleri dönüştürür"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"JSON'a çevrilemeyen tip: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """İçeriği mümkünse orjson ile, değilse standart json ile serileştirir"""
+    if orjson is not None:
+        return orjson.dumps(content, default=json_default)
+    return json.dumps(
+        content,
+        default=json_default,
+        ensure_ascii=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """jsonable_encoder adımını atlayan, ObjectId/datetime destekli JSON yanıtı"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def ndjson_chunks(records: Iterable[Dict], chunk_records: int = NDJSON_CHUNK_RECORDS) -> Iterator[bytes]:
+    """Kayıtları satır satır JSON'a çevirip chunk_records satırlık parçalar halinde üretir.
+
+    Başlıklar gönderildikten sonra durum kodu değiştirilemeyeceği için akış
+    sırasındaki hata son satırda {"type": "error"} kaydı olarak bildirilir.
+    """
+    buffer = []
+    try:
+        for record in records:
+            buffer.append(dumps(record))
+            if len(buffer) >= chunk_records:
+                yield b"\n".join(buffer) + b"\n"
+                buffer = []
+    except Exception as e:
+        logger.error(f"NDJSON akış hatası: {str(e)}")
+        buffer.append(dumps({"type": "error", "error": str(e)}))
+    if buffer:
+        yield b"\n".join(buffer) + b"\n"
+
+
+# --- Koşullu GET ---
+def analysis_etag(analysis_id: str, variant: str) -> str:
+    """Değişmeyen analizler için id ve sürümden ETag üretir.
+
+    CompressionMiddleware aynı yanıtı düz, gzip ve br olarak farklı baytlarla
+    gönderdiği için ETag'ler zayıftır (W/): içerik aynı, temsil farklı.
+    """
+    return f'W/"{analysis_id}-{variant}-v{ANALYSIS_CACHE_VERSION}"'
+
+
+def content_etag(data: Any) -> str:
+    """Okunan verinin özetinden zayıf ETag üretir; veri değişince ETag de değişir"""
+    return f'W/"{hashlib.blake2b(dumps(data), digest_size=16).hexdigest()}"'
+
+
+def cache_headers(etag: str, cache_control: str = ANALYSIS_CACHE_CONTROL) -> dict:
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # If-None-Match zayıf karşılaştırma kullanır
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+def not_modified(
+        request: Request,
+        etag: str,
+        cache_control: str = ANALYSIS_CACHE_CONTROL,
+        exists: Optional[Callable[[], bool]] = None
+) -> Optional[Response]:
+    """If-None-Match eşleşirse 304 döndürür; exists verilmişse önce kaynağın hâlâ var olduğu doğrulanır"""
+    if etag_matches(request, etag) and (exists is None or exists()):
+        return Response(status_code=304, headers=cache_headers(etag, cache_control))
+    return None
+
+
+# --- Sıkıştırma ---
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Accept-Encoding başlığından desteklenen en iyi kodlamayı seçer"""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(token.strip())
+
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """Belirli boyutun üzerindeki tek parça yanıtları br/gzip ile sıkıştırır.
+
+    Akış halindeki (more_body) yanıtlar olduğu gibi geçirilir, böylece
+    uzun süreli bağlantılar tamponlanmaz.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+
+            if (
+                message.get("more_body", False)
+                or "content-encoding" in headers
+                or len(body) < self.minimum_size
+                or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
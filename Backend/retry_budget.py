@@ -0,0 +1,153 @@
+"""
+İstek başına yeniden deneme bütçesi ve son tarih (deadline).
+
+Bütçe contextvar'da tutulur ve iç içe tenacity katmanlarının hepsi aynı
+bütçeden harcar: her yeniden deneme bir hak tüketir, beklemesi son tarihi
+aşacak yeniden deneme planlanmaz. 429 yanıtlarında bekleme Retry-After'dan
+tek kez alınır ve üstel beklemenin yerine geçer. Bütçe yoksa (CLI ve arka
+plan işleri) yalnızca katmanın kendi deneme sınırı geçerlidir.
+
+Kullanım (retry konfigürasyonlarında):
+    'wait': wait_with_budget(wait_exponential(multiplier=1, min=2, max=30)),
+    'stop': stop_after_attempt(5) | stop_on_budget(),
+"""
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from tenacity.stop import stop_base
+from tenacity.wait import wait_base
+
+from metrics import RETRY_BUDGET_REFUSED
+import tracing
+
+# --- Ayarlar ---
+REQUEST_RETRY_BUDGET = int(os.getenv("REQUEST_RETRY_BUDGET", 20))
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE_SECONDS", 120))
+# Sağlayıcı daha uzun Retry-After dönerse bu süreye kırpılır
+MAX_RETRY_AFTER = float(os.getenv("MAX_RETRY_AFTER", 60))
+
+_current_budget: contextvars.ContextVar[Optional["RetryBudget"]] = contextvars.ContextVar(
+    "retry_budget", default=None
+)
+
+
+class RetryBudget:
+    """Tüm katmanlar için ortak yeniden deneme hakkı ve son tarih (thread-safe)"""
+
+    def __init__(self, attempts: int = REQUEST_RETRY_BUDGET, deadline: float = REQUEST_DEADLINE):
+        self.attempts = attempts
+        self.deadline = time.monotonic() + deadline
+        self.spent = 0
+        self.refused = 0
+        self._lock = threading.Lock()
+
+    def time_left(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def acquire(self, delay: float) -> bool:
+        """Bir yeniden deneme hakkı ayırır; hak bittiyse veya bekleme son tarihi aşıyorsa False"""
+        with self._lock:
+            if self.spent < self.attempts and delay <= self.time_left():
+                self.spent += 1
+                return True
+            self.refused += 1
+        reason = "attempts" if self.spent >= self.attempts else "deadline"
+        RETRY_BUDGET_REFUSED.inc(reason)
+        tracing.set_attribute("retry_budget_refused", reason)
+        return False
+
+    def to_dict(self) -> Dict:
+        return {
+            "attempts": self.attempts,
+            "spent": self.spent,
+            "refused": self.refused,
+            "time_left_s": round(max(self.time_left(), 0.0), 2)
+        }
+
+
+# --- Bağlam ---
+@contextmanager
+def request_budget(
+        attempts: int = REQUEST_RETRY_BUDGET,
+        deadline: float = REQUEST_DEADLINE
+) -> Iterator[RetryBudget]:
+    """Yeni bir bütçe açar; zaten aktif bir bütçe varsa onu kullanır (iç katmanlar genişletemez)"""
+    existing = _current_budget.get()
+    if existing is not None:
+        yield existing
+        return
+
+    budget = RetryBudget(attempts, deadline)
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+def current_budget() -> Optional[RetryBudget]:
+    return _current_budget.get()
+
+
+def retry_after(exception: Optional[BaseException]) -> Optional[float]:
+    """429 hatalarındaki Retry-After süresini (saniye) döndürür"""
+    if exception is None:
+        return None
+    response = getattr(exception, "response", None)
+    status = getattr(exception, "http_status", None) or getattr(response, "status_code", None)
+    if status != 429:
+        return None
+
+    headers = getattr(exception, "headers", None) or getattr(response, "headers", None) or {}
+    try:
+        return min(max(float(headers.get("Retry-After")), 0.0), MAX_RETRY_AFTER)
+    except (TypeError, ValueError):
+        return None
+
+
+# --- Tenacity Stratejileri ---
+class wait_with_budget(wait_base):
+    """429'da Retry-After kadar, diğer hatalarda sarılan strateji kadar bekler"""
+
+    def __init__(self, fallback: wait_base):
+        self.fallback = fallback
+
+    def __call__(self, retry_state) -> float:
+        outcome = retry_state.outcome
+        delay = retry_after(outcome.exception()) if outcome is not None and outcome.failed else None
+        return delay if delay is not None else self.fallback(retry_state)
+
+
+class stop_on_budget(stop_base):
+    """Aktif bütçeden hak alamayan yeniden denemeyi durdurur.
+
+    stop_after_attempt(...) | stop_on_budget() şeklinde kullanılmalı;
+    katmanın kendi sınırına ulaşıldığında bütçeden hak harcanmaz.
+    """
+
+    def __call__(self, retry_state) -> bool:
+        budget = _current_budget.get()
+        if budget is None:
+            return False
+        return not budget.acquire(retry_state.upcoming_sleep)
+
+
+# --- ASGI ---
+class RetryBudgetMiddleware:
+    """Her HTTP isteği için ayrı bir yeniden deneme bütçesi açar"""
+
+    def __init__(self, app, attempts: int = REQUEST_RETRY_BUDGET, deadline: float = REQUEST_DEADLINE):
+        self.app = app
+        self.attempts = attempts
+        self.deadline = deadline
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with request_budget(self.attempts, self.deadline):
+            await self.app(scope, receive, send)
@@ -5,21 +5,16 @@ from typing import Optional, Dict
 from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
-from pymongo import MongoClient
+from spotipy.cache_handler import CacheHandler
 from pymongo.errors import PyMongoError
-from dotenv import load_dotenv
 
 from data_store import MongoDBManager
-
-# --- .env Yüklemesi ---
-load_dotenv()
+from utils import create_spotify_client
+from metrics import retry_hook
+from retry_budget import wait_with_budget, stop_on_budget
 
 # --- Logging Setup ---
 logger = logging.getLogger(__name__)
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 
 if not os.getenv("SPOTIPY_CLIENT_ID") or not os.getenv("SPOTIPY_CLIENT_SECRET"):
     logger.error("Spotify client bilgileri eksik. .env dosyasını kontrol edin.")
@@ -28,62 +23,80 @@ if not os.getenv("SPOTIPY_CLIENT_ID") or not os.getenv("SPOTIPY_CLIENT_SECRET"):
 SCOPES = "playlist-modify-private playlist-modify-public user-library-read user-top-read"
 TOKEN_COLLECTION = "auth_tokens"
 TOKEN_EXPIRY_BUFFER = 300  # 5 minutes
+USER_COOKIE = "spotify_user_id"
 
 # --- Retry Configuration ---
 RETRY_CONFIG = {
-    'wait': wait_exponential(multiplier=1, min=2, max=30),
-    'stop': stop_after_attempt(5),
+    'wait': wait_with_budget(wait_exponential(multiplier=1, min=2, max=30)),
+    'stop': stop_after_attempt(5) | stop_on_budget(),
     'retry': retry_if_exception_type((PyMongoError, spotipy.SpotifyException)),
-    'before_sleep': lambda _: logger.warning("Auth hatası, yeniden deneniyor...")
+    'before_sleep': retry_hook("auth", lambda _: logger.warning("Auth hatası, yeniden deneniyor..."))
 }
 
 
+class AuthenticationError(Exception):
+    """Kullanıcı kimliği yok ya da token alınamadı (yeniden denenmez)"""
+
+
+class NoCacheHandler(CacheHandler):
+    """spotipy'nin token önbelleğini kapatır; token'lar yalnızca MongoDB'de kullanıcı başına tutulur.
+
+    cache_path=None verildiğinde spotipy tüm kullanıcılar için ortak ".cache"
+    dosyasına düşer; bu da bir kullanıcının token'ının diğerine dönmesine yol açar.
+    """
+
+    def get_cached_token(self):
+        return None
+
+    def save_token_to_cache(self, token_info):
+        return None
+
+
 class SpotifyAuthManager:
+    """Token'ları kullanıcı başına MongoDB'de tutar; istekler arasında paylaşılan kullanıcı durumu yoktur"""
+
     def __init__(self):
         self.oauth = SpotifyOAuth(
             client_id=os.getenv("SPOTIPY_CLIENT_ID"),
             client_secret=os.getenv("SPOTIPY_CLIENT_SECRET"),
             redirect_uri=os.getenv("SPOTIPY_REDIRECT_URI"),
             scope=SCOPES,
-            cache_path=None  # MongoDB kullanıldığı için devre dışı
+            cache_handler=NoCacheHandler()
         )
-        self.mongo = MongoDBManager()
-        self.current_user: Optional[str] = None
 
-        def set_current_user(self, user_id: str | None) -> None:
-            """Geçerli kullanıcıyı ayarla"""
-            self.current_user = user_id
+    @property
+    def mongo(self) -> MongoDBManager:
+        """MongoDB bağlantısı ilk kullanımda kurulur"""
+        return MongoDBManager()
 
-    @retry(**RETRY_CONFIG)
-    def get_valid_client(self) -> spotipy.Spotify:
-        """Geçerli bir Spotify client instance'ı döndürür"""
-        token_info = self._load_token()
+    def get_valid_client(self, user_id: str) -> spotipy.Spotify:
+        """Kullanıcının token'ıyla (gerekirse yenileyerek) Spotify client'ı döndürür"""
+        if not user_id:
+            raise AuthenticationError("Kullanıcı kimliği yok, giriş yapılmalı")
+        token_info = self._load_token(user_id)
 
         if not token_info or self._is_token_expired(token_info):
-            token_info = self._refresh_token(token_info)
+            token_info = self._refresh_token(token_info, user_id)
 
         if not token_info:
-            raise spotipy.SpotifyException("Authentication failed", -1)
+            raise AuthenticationError(f"{user_id} için geçerli token bulunamadı")
 
-        return spotipy.Spotify(auth=token_info['access_token'])
+        return create_spotify_client(auth=token_info['access_token'])
 
     @retry(**RETRY_CONFIG)
-    def _load_token(self) -> Optional[Dict]:
+    def _load_token(self, user_id: str) -> Optional[Dict]:
         """Token'ı MongoDB'den yükler"""
-        if not self.current_user:
-            return None
         collection = self.mongo.get_collection(TOKEN_COLLECTION)
-        return collection.find_one({"_id": self.current_user})
+        return collection.find_one({"_id": user_id})
 
     @retry(**RETRY_CONFIG)
-    def _save_token(self, token_info: Dict, user_id: Optional[str] = None) -> None:
+    def _save_token(self, token_info: Dict, user_id: str) -> None:
         """Token'ı MongoDB'ye kaydeder"""
-        collection = self.mongo.get_collection(TOKEN_COLLECTION)
-        uid = user_id or self.current_user
-        if not uid:
+        if not user_id:
             raise ValueError("User ID bilinmiyor")
-        token_info['_id'] = uid
-        collection.replace_one({"_id": uid}, token_info, upsert=True)
+        collection = self.mongo.get_collection(TOKEN_COLLECTION)
+        token_info['_id'] = user_id
+        collection.replace_one({"_id": user_id}, token_info, upsert=True)
         logger.info("Token MongoDB'ye kaydedildi")
 
     def _is_token_expired(self, token_info: Dict) -> bool:
@@ -91,13 +104,13 @@ class SpotifyAuthManager:
         return datetime.now().timestamp() > token_info['expires_at'] - TOKEN_EXPIRY_BUFFER
 
     @retry(**RETRY_CONFIG)
-    def _refresh_token(self, old_token: Optional[Dict]) -> Optional[Dict]:
+    def _refresh_token(self, old_token: Optional[Dict], user_id: str) -> Optional[Dict]:
         """Yalnızca refresh_token ile token yeniler"""
         if old_token and 'refresh_token' in old_token:
             try:
                 new_token = self.oauth.refresh_access_token(old_token['refresh_token'])
                 new_token = self._add_metadata(new_token)
-                self._save_token(new_token)
+                self._save_token(new_token, user_id)
                 logger.info("Token başarıyla yenilendi")
                 return new_token
             except Exception as e:
@@ -105,18 +118,23 @@ class SpotifyAuthManager:
                 return None
         return None
 
+    def exchange_code(self, code: str) -> Dict:
+        """OAuth kodunu token'a çevirir; önbellek atlanır, her kod kendi token'ını üretir"""
+        token_info = self.oauth.get_access_token(code, check_cache=False)
+        return self._add_metadata(token_info)
+
     def _add_metadata(self, token_info: Dict) -> Dict:
         """Token'a ek metadata ekler"""
         token_info['expires_at'] = int(token_info['expires_in']) + int(datetime.now().timestamp())
         return token_info
 
-    def clear_tokens(self, user_id: Optional[str] = None) -> bool:
-        """Belirtilen kullanıcının token'ını temizler"""
+    def clear_tokens(self, user_id: Optional[str]) -> bool:
+        """Belirtilen kullanıcının token'ını temizler; kullanıcı yoksa hiçbir şey silinmez"""
+        if not user_id:
+            return False
         try:
             collection = self.mongo.get_collection(TOKEN_COLLECTION)
-            uid = user_id or self.current_user
-            query = {"_id": uid} if uid else {}
-            result = collection.delete_many(query)
+            result = collection.delete_many({"_id": user_id})
             logger.info(f"{result.deleted_count} token silindi")
             return True
         except PyMongoError as e:
@@ -124,5 +142,30 @@ class SpotifyAuthManager:
             return False
 
 
-# Global auth manager instance
+class AuthContext:
+    """Bir isteğin kimliği: kullanıcı ve ilk kullanımda oluşturulan Spotify client'ı.
+
+    Her istek için çerezden yeniden oluşturulur ve çağrılara açıkça aktarılır;
+    bu sayede eşzamanlı kullanıcılar ve birden çok worker güvenle çalışır.
+    """
+
+    __slots__ = ("user_id", "_manager", "_client")
+
+    def __init__(self, user_id: Optional[str], manager: Optional[SpotifyAuthManager] = None):
+        self.user_id = user_id
+        self._manager = manager
+        self._client: Optional[spotipy.Spotify] = None
+
+    @classmethod
+    def from_cookies(cls, cookies: Dict[str, str]) -> "AuthContext":
+        return cls(cookies.get(USER_COOKIE))
+
+    @property
+    def client(self) -> spotipy.Spotify:
+        if self._client is None:
+            self._client = (self._manager or auth_manager).get_valid_client(self.user_id)
+        return self._client
+
+
+# Global auth manager instance (yalnızca OAuth ayarları ve token deposu; kullanıcı durumu tutmaz)
 auth_manager = SpotifyAuthManager()
@@ -0,0 +1,16 @@
+"""
+Birim testleri için ortak kurulum.
+
+Backend modülleri ve bellek içi taklitler (tests/fakes.py) import
+edilebilsin diye yol ve Spotify ortam değişkenleri burada bir kez ayarlanır.
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("SPOTIPY_CLIENT_ID", "test")
+os.environ.setdefault("SPOTIPY_CLIENT_SECRET", "test")
+os.environ.setdefault("SPOTIPY_REDIRECT_URI", "http://127.0.0.1:8080/auth/callback")
@@ -0,0 +1,322 @@
+"""
+Testler ve benchmark'lar için bellek içi MongoDB ve sağlayıcı (Spotify,
+Last.fm, MusicBrainz) taklitleri.
+
+Yalnızca data_store, genre_finder ve workflow'un kullandığı sorgu alt
+kümesini destekler: eşitlik, $in, $gte, $lt, $exists filtreleri, $set
+güncellemeleri ve UpdateOne/InsertOne toplu yazmaları.
+"""
+import copy
+import itertools
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo import InsertOne, UpdateOne
+
+_MISSING = object()
+
+
+def _get_path(doc: Dict, path: str) -> Any:
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit():
+            index = int(part)
+            value = value[index] if index < len(value) else _MISSING
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+
+def _match_condition(value: Any, condition: Any) -> bool:
+    if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+        for op, arg in condition.items():
+            if op == "$in":
+                if value is _MISSING or value not in arg:
+                    return False
+            elif op == "$ne":
+                if value == arg:
+                    return False
+            elif op == "$exists":
+                if (value is not _MISSING) != bool(arg):
+                    return False
+            elif op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is _MISSING or value is None:
+                    return False
+                if op == "$gt" and not value > arg:
+                    return False
+                if op == "$gte" and not value >= arg:
+                    return False
+                if op == "$lt" and not value < arg:
+                    return False
+                if op == "$lte" and not value <= arg:
+                    return False
+            else:
+                raise NotImplementedError(f"Desteklenmeyen operatör: {op}")
+        return True
+    return value is not _MISSING and value == condition
+
+
+def matches(doc: Dict, query: Optional[Dict]) -> bool:
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif not _match_condition(_get_path(doc, key), condition):
+            return False
+    return True
+
+
+def project(doc: Dict, projection: Optional[Dict]) -> Dict:
+    if not projection:
+        return copy.copy(doc)
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    result = {k: doc[k] for k in include if k in doc}
+    if projection.get("_id", 1) and "_id" in doc:
+        result["_id"] = doc["_id"]
+    return result
+
+
+class FakeCursor:
+    def __init__(self, docs: List[Dict]):
+        self._docs = docs
+
+    def sort(self, key, direction: int = 1) -> "FakeCursor":
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for field, order in reversed(keys):
+            self._docs.sort(key=lambda d: (d.get(field) is None, d.get(field)), reverse=order < 0)
+        return self
+
+    def limit(self, count: int) -> "FakeCursor":
+        if count:
+            self._docs = self._docs[:count]
+        return self
+
+    def batch_size(self, _: int) -> "FakeCursor":
+        return self
+
+    def __iter__(self):
+        return iter(self._docs)
+
+
+def _project_stage(doc: Dict, spec: Dict) -> Dict:
+    result = {} if spec.get("_id", 1) == 0 else {"_id": doc.get("_id")}
+    for key, value in spec.items():
+        if key == "_id":
+            continue
+        if isinstance(value, str) and value.startswith("$"):
+            current: Any = doc
+            for part in value[1:].split("."):
+                current = current.get(part, _MISSING) if isinstance(current, dict) else _MISSING
+            if current is not _MISSING:
+                result[key] = current
+        elif value and key in doc:
+            result[key] = doc[key]
+    return result
+
+
+class FakeCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self._docs: Dict[Any, Dict] = {}
+        # Eşitlik sorguları için tembel kurulan alan grubu → değerler → _id index'leri
+        self._lookups: Dict[tuple, Dict[tuple, set]] = {}
+
+    # --- Okuma ---
+    def _lookup(self, fields: tuple) -> Dict[tuple, set]:
+        if fields not in self._lookups:
+            table = {}
+            for _id, doc in self._docs.items():
+                table.setdefault(tuple(doc.get(f, _MISSING) for f in fields), set()).add(_id)
+            self._lookups[fields] = table
+        return self._lookups[fields]
+
+    def _candidates(self, query: Optional[Dict]) -> Iterable[Dict]:
+        id_condition = (query or {}).get("_id", _MISSING)
+        if id_condition is _MISSING:
+            if query and all(
+                not k.startswith("$") and "." not in k and not isinstance(v, (dict, list))
+                for k, v in query.items()
+            ):
+                fields = tuple(sorted(query))
+                ids = self._lookup(fields).get(tuple(query[f] for f in fields), ())
+                return [self._docs[i] for i in ids]
+            return list(self._docs.values())
+        if isinstance(id_condition, dict) and "$in" in id_condition:
+            return [self._docs[i] for i in id_condition["$in"] if i in self._docs]
+        if not isinstance(id_condition, dict):
+            doc = self._docs.get(id_condition)
+            return [doc] if doc else []
+        return list(self._docs.values())
+
+    def find(self, query: Optional[Dict] = None, projection: Optional[Dict] = None, **_) -> FakeCursor:
+        return FakeCursor([
+            project(doc, projection) for doc in self._candidates(query) if matches(doc, query)
+        ])
+
+    def find_one(self, query: Optional[Dict] = None, projection: Optional[Dict] = None, **_) -> Optional[Dict]:
+        for doc in self._candidates(query):
+            if matches(doc, query):
+                return project(doc, projection)
+        return None
+
+    def count_documents(self, query: Optional[Dict] = None) -> int:
+        return sum(1 for doc in self._candidates(query) if matches(doc, query))
+
+    def aggregate(self, pipeline: List[Dict], **_) -> Iterable[Dict]:
+        """Yalnızca $match, $project ve $unwind aşamaları; "$alan.alt" ifadeleri desteklenir"""
+        docs: Iterable[Dict] = self._docs.values()
+        for stage in pipeline:
+            (op, spec), = stage.items()
+            if op == "$match":
+                docs = [doc for doc in self._candidates(spec) if matches(doc, spec)]
+            elif op == "$unwind":
+                field = spec.lstrip("$")
+                docs = [{**doc, field: item} for doc in docs for item in doc.get(field) or []]
+            elif op == "$project":
+                docs = [_project_stage(doc, spec) for doc in docs]
+            else:
+                raise NotImplementedError(op)
+        return iter(list(docs))
+
+    # --- Yazma ---
+    def insert_one(self, document: Dict, **_) -> SimpleNamespace:
+        document.setdefault("_id", ObjectId())
+        stored = self._docs[document["_id"]] = copy.copy(document)
+        for fields, table in self._lookups.items():
+            table.setdefault(tuple(stored.get(f, _MISSING) for f in fields), set()).add(stored["_id"])
+        return SimpleNamespace(inserted_id=document["_id"], acknowledged=True)
+
+    def insert_many(self, documents: List[Dict], **_) -> SimpleNamespace:
+        ids = [self.insert_one(doc).inserted_id for doc in documents]
+        return SimpleNamespace(inserted_ids=ids, acknowledged=True)
+
+    def update_one(self, query: Dict, update: Dict, upsert: bool = False, **_) -> SimpleNamespace:
+        doc = self.find_one(query)
+        if doc is not None:
+            stored = self._docs[doc["_id"]]
+            changed = any(stored.get(k, _MISSING) != v for k, v in update.get("$set", {}).items())
+            if any(
+                k in fields and stored.get(k, _MISSING) != v
+                for k, v in update.get("$set", {}).items() for fields in self._lookups
+            ):
+                self._lookups.clear()
+            stored.update(update.get("$set", {}))
+            return SimpleNamespace(matched_count=1, modified_count=int(changed), upserted_id=None)
+        if not upsert:
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+        new_doc = {k: v for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+        new_doc.update(update.get("$set", {}))
+        inserted = self.insert_one(new_doc).inserted_id
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=inserted)
+
+    def replace_one(self, query: Dict, replacement: Dict, upsert: bool = False, **_) -> SimpleNamespace:
+        doc = self.find_one(query)
+        if doc is None and not upsert:
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+        if doc is not None:
+            del self._docs[doc["_id"]]
+            self._lookups.clear()
+            replacement = {**replacement, "_id": doc["_id"]}
+        inserted = self.insert_one(dict(replacement)).inserted_id
+        return SimpleNamespace(
+            matched_count=int(doc is not None), modified_count=int(doc is not None),
+            upserted_id=None if doc is not None else inserted
+        )
+
+    def bulk_write(self, requests: List, ordered: bool = True, **_) -> SimpleNamespace:
+        upserted = modified = inserted = 0
+        for request in requests:
+            if isinstance(request, UpdateOne):
+                result = self.update_one(request._filter, request._doc, upsert=request._upsert)
+                modified += result.modified_count
+                upserted += int(result.upserted_id is not None)
+            elif isinstance(request, InsertOne):
+                self.insert_one(request._doc)
+                inserted += 1
+            else:
+                raise NotImplementedError(type(request).__name__)
+        return SimpleNamespace(
+            upserted_count=upserted,
+            modified_count=modified,
+            inserted_count=inserted,
+            acknowledged=True
+        )
+
+    def delete_many(self, query: Optional[Dict] = None) -> SimpleNamespace:
+        doomed = [doc["_id"] for doc in self._candidates(query) if matches(doc, query)]
+        for _id in doomed:
+            del self._docs[_id]
+        self._lookups.clear()
+        return SimpleNamespace(deleted_count=len(doomed))
+
+    def clear(self) -> None:
+        self._docs.clear()
+        self._lookups.clear()
+
+    def create_index(self, *_, **__) -> str:
+        return "fake_index"
+
+    def create_indexes(self, *_, **__) -> List[str]:
+        return []
+
+    def index_information(self) -> Dict:
+        return {}
+
+
+class FakeDatabase:
+    def __init__(self):
+        self._collections: Dict[str, FakeCollection] = {}
+
+    def get_collection(self, name: str, **_) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(name)
+        return self._collections[name]
+
+    __getitem__ = get_collection
+
+    def list_collection_names(self) -> List[str]:
+        return list(self._collections)
+
+    def create_collection(self, name: str) -> FakeCollection:
+        return self.get_collection(name)
+
+
+class FakeSpotify:
+    """GenreFinder'ın kullandığı track() ve artist() çağrılarını taklit eder"""
+
+    GENRES = ["rock", "pop", "indie", "hip hop", "jazz", "electronic", "metal", "folk", "soul", "r&b"]
+
+    def __init__(self, artist_count: int = 500):
+        self.artist_count = artist_count
+        self.calls = itertools.count()
+
+    def _artist_index(self, key: str) -> int:
+        return sum(map(ord, key)) % self.artist_count
+
+    def track(self, track_id: str) -> Dict:
+        next(self.calls)
+        artist = self._artist_index(track_id)
+        return {
+            "id": track_id,
+            "name": f"Song {track_id[:6]}",
+            "artists": [{"id": f"artist{artist:018d}", "name": f"Artist {artist}"}]
+        }
+
+    def artist(self, artist_id: str) -> Dict:
+        next(self.calls)
+        index = self._artist_index(artist_id)
+        return {
+            "id": artist_id,
+            "genres": [self.GENRES[(index + i) % len(self.GENRES)] for i in range(3)]
+        }
+
+
+def fake_tag_provider(artist: str, track: str) -> List[str]:
+    """Last.fm / MusicBrainz yerine deterministik etiketler"""
+    index = sum(map(ord, artist + track))
+    return [FakeSpotify.GENRES[(index + i) % len(FakeSpotify.GENRES)] for i in range(2)]
@@ -0,0 +1,153 @@
+"""
+Eşzamanlı kullanıcılar için istek başına kimlik testleri.
+
+Her kullanıcı farklı çerezle, kendi thread'i ve event loop'unda aynı anda
+istek atar; her yanıtın çerezdeki kullanıcının token'ıyla üretildiği
+doğrulanır. Spotify client'ı taklit edilir ve MongoDB bellek içindedir.
+
+Çalıştırma (Backend dizininde):
+    python -m pytest tests -q
+"""
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from fastapi.testclient import TestClient
+
+import spotify_auth
+from data_store import MongoDBManager
+from playlist_creator import PlaylistCreator
+from spotify_auth import AuthContext, SCOPES, USER_COOKIE, TOKEN_COLLECTION, auth_manager
+from tests.fakes import FakeDatabase
+import app as app_module
+
+USER_COUNT = 12
+REQUESTS_PER_USER = 5
+
+
+class FakeUserClient:
+    """Token'ın sahibini döndüren Spotify client taklidi; çağrılar araya girsin diye gecikir"""
+
+    calls = 0
+    _lock = threading.Lock()
+
+    def __init__(self, auth: str = None, **_):
+        self.token = auth
+
+    def me(self):
+        with self._lock:
+            FakeUserClient.calls += 1
+        time.sleep(random.uniform(0.001, 0.01))
+        return {"id": self.token.removeprefix("token-"), "display_name": self.token, "images": []}
+
+
+class FakeTokenSession:
+    """Spotify token uç noktası taklidi: her OAuth kodu kendi kullanıcısının token'ını döndürür"""
+
+    def post(self, url, data=None, **_):
+        code = data["code"]
+        return SimpleNamespace(
+            raise_for_status=lambda: None,
+            json=lambda: {
+                "access_token": f"token-{code}",
+                "refresh_token": f"refresh-{code}",
+                "token_type": "Bearer",
+                "expires_in": 3600,
+                "scope": SCOPES
+            }
+        )
+
+
+@pytest.fixture
+def users(monkeypatch):
+    """Bellek içi auth_tokens'a süresi dolmamış token'lı kullanıcılar ekler"""
+    saved = (MongoDBManager._instance, MongoDBManager._db, MongoDBManager._collections)
+    MongoDBManager._instance = object.__new__(MongoDBManager)
+    MongoDBManager._db = FakeDatabase()
+    MongoDBManager._collections = {}
+    monkeypatch.setattr(spotify_auth, "create_spotify_client", FakeUserClient)
+    monkeypatch.setattr(app_module, "create_spotify_client", FakeUserClient)
+
+    tokens = MongoDBManager().get_collection(TOKEN_COLLECTION)
+    user_ids = [f"user-{i}" for i in range(USER_COUNT)]
+    for user_id in user_ids:
+        tokens.insert_one({
+            "_id": user_id,
+            "access_token": f"token-{user_id}",
+            "refresh_token": f"refresh-{user_id}",
+            "expires_at": int(datetime.now().timestamp()) + 3600
+        })
+    try:
+        yield user_ids
+    finally:
+        MongoDBManager._instance, MongoDBManager._db, MongoDBManager._collections = saved
+
+
+def test_concurrent_users_get_their_own_profile(users):
+    """Her TestClient kendi event loop thread'inde çalışır; istekler gerçekten eşzamanlıdır"""
+    barrier = threading.Barrier(len(users))
+
+    def run_user(user_id):
+        client = TestClient(app_module.app, cookies={USER_COOKIE: user_id})
+        barrier.wait()
+        seen = []
+        for _ in range(REQUESTS_PER_USER):
+            response = client.get("/user/profile")
+            assert response.status_code == 200
+            seen.append(response.json()["data"]["id"])
+        return user_id, seen
+
+    with ThreadPoolExecutor(max_workers=len(users)) as executor:
+        results = list(executor.map(run_user, users))
+
+    for user_id, seen in results:
+        assert seen == [user_id] * REQUESTS_PER_USER
+
+
+def test_auth_context_is_isolated_across_threads(users):
+    def resolve(user_id):
+        time.sleep(random.uniform(0, 0.005))
+        return user_id, AuthContext(user_id).client.me()["id"]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(resolve, users * 4))
+
+    assert all(expected == actual for expected, actual in results)
+
+
+def test_missing_cookie_is_rejected(users):
+    response = TestClient(app_module.app).get("/user/profile")
+    assert response.status_code == 401
+
+
+def test_logout_without_cookie_keeps_other_tokens(users):
+    assert auth_manager.clear_tokens(None) is False
+    assert MongoDBManager().get_collection(TOKEN_COLLECTION).count_documents({}) == len(users)
+
+
+def test_playlist_creator_uses_passed_user(users):
+    FakeUserClient.calls = 0
+    creator = PlaylistCreator(FakeUserClient(auth="token-user-3"), "user-3")
+    assert creator.user_id == "user-3"
+    assert FakeUserClient.calls == 0
+
+
+def test_consecutive_logins_get_their_own_tokens(users, monkeypatch, tmp_path):
+    """İkinci kullanıcının girişi öncekinin önbelleklenmiş token'ına düşmemeli"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(auth_manager.oauth, "_session", FakeTokenSession())
+    client = TestClient(app_module.app, follow_redirects=False)
+
+    for user_id in ("login-a", "login-b"):
+        response = client.get("/auth/callback", params={"code": user_id})
+        assert response.status_code in (302, 307)
+        assert response.cookies[USER_COOKIE] == user_id
+
+    tokens = MongoDBManager().get_collection(TOKEN_COLLECTION)
+    assert tokens.find_one({"_id": "login-b"})["access_token"] == "token-login-b"
+    assert not (tmp_path / ".cache").exists()
@@ -0,0 +1,78 @@
+"""
+İlerleme olaylarının istek sürerken iletildiğinin testi.
+
+Abone ve istek aynı event loop'ta çalışır (gerçek sunucudaki gibi); iş
+akışının bloklayan adımları taklit edilir. Olaylar ancak istek bittikten
+sonra geliyorsa event loop iş akışı tarafından bloklanıyor demektir.
+
+Çalıştırma (Backend dizininde):
+    python -m pytest tests -q
+"""
+import time
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+
+import progress
+import app as app_module
+
+USER_ID = "progress-user"
+STEP_SECONDS = 0.2
+
+
+def slow_tracks(sp, max_tracks=50):
+    progress.update("track_loading", page=1)
+    time.sleep(STEP_SECONDS)
+    return [SimpleNamespace(id=f"t{i}") for i in range(3)]
+
+
+def slow_genres(track_ids, sp=None):
+    progress.stage("genre_resolution", tracks=len(track_ids))
+    time.sleep(STEP_SECONDS)
+    return {"rock": list(track_ids)}
+
+
+def test_stage_events_arrive_before_response(monkeypatch):
+    monkeypatch.setattr(app_module, "get_user_tracks", slow_tracks)
+    monkeypatch.setattr(app_module, "analyze_genres", slow_genres)
+    monkeypatch.setattr(app_module, "tracks_to_dicts", lambda tracks: [{"id": t.id} for t in tracks])
+    monkeypatch.setattr(app_module, "save_analysis", lambda analysis: "analysis-1")
+    monkeypatch.setattr(app_module, "save_user_tracks", lambda user_id, tracks: None)
+    monkeypatch.setattr(app_module, "save_analysis_trace", lambda analysis_id, trace: True)
+    app_module.app.dependency_overrides[app_module.get_auth_context] = (
+        lambda: SimpleNamespace(user_id=USER_ID, client=object())
+    )
+
+    async def scenario():
+        subscription = progress.broker.subscribe(USER_ID)
+        received = []
+
+        async def collect():
+            while True:
+                event = await subscription.queue.get()
+                received.append((time.monotonic(), event["type"]))
+                if event["type"] in ("completed", "failed"):
+                    return
+
+        collector = asyncio.create_task(collect())
+        try:
+            transport = httpx.ASGITransport(app=app_module.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.post("/analyze-liked")
+            responded_at = time.monotonic()
+            await asyncio.wait_for(collector, 1)
+        finally:
+            progress.broker.unsubscribe(USER_ID, subscription)
+        return response, responded_at, received
+
+    try:
+        response, responded_at, received = asyncio.run(scenario())
+    finally:
+        app_module.app.dependency_overrides.clear()
+
+    assert response.json()["status"] == "success"
+    stage_times = [at for at, event_type in received if event_type == "stage"]
+    assert stage_times
+    # İlk aşama olayı, iş akışının bloklayan adımları bitmeden önce gelmiş olmalı
+    assert stage_times[0] < responded_at - STEP_SECONDS
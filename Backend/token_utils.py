@@ -3,15 +3,13 @@ import logging
 from datetime import datetime
 from typing import Optional, Dict
 from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
-from pymongo import MongoClient
 from pymongo.errors import PyMongoError
-from dotenv import load_dotenv
+
+from data_store import MongoDBManager
+from metrics import retry_hook
+from retry_budget import wait_with_budget, stop_on_budget
 
 # --- Logging Setup ---
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 # --- Constants ---
@@ -21,19 +19,18 @@ MAX_RETRIES = 5
 
 # --- Retry Configuration ---
 MONGO_RETRY_CONFIG = {
-    'wait': wait_exponential(multiplier=1, min=2, max=30),
-    'stop': stop_after_attempt(MAX_RETRIES),
+    'wait': wait_with_budget(wait_exponential(multiplier=1, min=2, max=30)),
+    'stop': stop_after_attempt(MAX_RETRIES) | stop_on_budget(),
     'retry': retry_if_exception_type(PyMongoError),
-    'before_sleep': lambda _: logger.warning("MongoDB işlemi yeniden deneniyor...")
+    'before_sleep': retry_hook("mongo", lambda _: logger.warning("MongoDB işlemi yeniden deneniyor..."))
 }
 
 
 class TokenManager:
-    def __init__(self):
-        load_dotenv()
-        self.client = MongoClient(os.getenv("MONGO_URI"))
-        self.db = self.client[os.getenv("MONGO_DB", "spotify_analytics")]
-        self.collection = self.db[TOKEN_COLLECTION]
+    @property
+    def collection(self):
+        """MongoDBManager'ın ortak bağlantı havuzunu kullanır"""
+        return MongoDBManager().get_collection(TOKEN_COLLECTION)
 
     @retry(**MONGO_RETRY_CONFIG)
     def validate_token(self, token_data: Dict) -> bool:
@@ -0,0 +1,219 @@
+"""
+Çalıştırma bazında aşama izleme (span) ve dış çağrı defteri.
+
+Aktif iz contextvar'da tutulur; iz başlatılmamışsa span'ler hiçbir şey
+yapmaz. Thread havuzuna gönderilen işler `submit_in_context` ile çağıranın
+bağlamını taşır. Şarkı başına tekrarlanan kısa işler ayrı span yerine
+`stage` ile bulundukları span'in altında toplanır (sayı ve toplam süre).
+"""
+import re
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+# /v1/tracks/<22 karakter id> → /v1/tracks/{id}
+_ID_SEGMENT = re.compile(r"/[A-Za-z0-9]{22}(?=/|$)")
+
+
+class Span:
+    __slots__ = ("name", "start", "end", "attributes", "children", "aggregates", "error")
+
+    def __init__(self, name: str, attributes: Optional[Dict] = None):
+        self.name = name
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attributes = attributes or {}
+        self.children: List["Span"] = []
+        # tekrarlanan alt işler: ad → [sayı, toplam saniye]
+        self.aggregates: Dict[str, List[float]] = {}
+        self.error: Optional[str] = None
+
+    def to_dict(self, origin: float) -> Dict:
+        end = self.end if self.end is not None else time.perf_counter()
+        data = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 1),
+            "duration_ms": round((end - self.start) * 1000, 1)
+        }
+        if self.end is None:
+            data["open"] = True
+        if self.attributes:
+            data["attributes"] = dict(self.attributes)
+        if self.error:
+            data["error"] = self.error
+        if self.aggregates:
+            data["aggregates"] = {
+                name: {"count": int(count), "total_ms": round(total * 1000, 1)}
+                for name, (count, total) in self.aggregates.items()
+            }
+        if self.children:
+            data["children"] = [child.to_dict(origin) for child in list(self.children)]
+        return data
+
+
+class CallLedger:
+    """Sağlayıcı ve aşama bazında dış çağrı sayıları, hatalar, 429'lar ve süre"""
+
+    def __init__(self):
+        self._entries: Dict[tuple, Dict] = {}
+
+    def record(
+            self,
+            provider: str,
+            stage: str,
+            endpoint: str,
+            status: int,
+            duration: float,
+            rate_limited: int
+    ) -> None:
+        entry = self._entries.setdefault((provider, stage), {
+            "provider": provider,
+            "stage": stage,
+            "calls": 0,
+            "errors": 0,
+            "rate_limited": 0,
+            "total_ms": 0.0,
+            "endpoints": {}
+        })
+        entry["calls"] += 1
+        entry["errors"] += int(status >= 400)
+        entry["rate_limited"] += rate_limited
+        entry["total_ms"] += duration * 1000
+        entry["endpoints"][endpoint] = entry["endpoints"].get(endpoint, 0) + 1
+
+    def to_dict(self) -> Dict:
+        entries = [
+            {**entry, "total_ms": round(entry["total_ms"], 1), "endpoints": dict(entry["endpoints"])}
+            for entry in self._entries.values()
+        ]
+        totals = {}
+        for entry in entries:
+            total = totals.setdefault(entry["provider"], {"calls": 0, "errors": 0, "rate_limited": 0, "total_ms": 0.0})
+            for key in ("calls", "errors", "rate_limited", "total_ms"):
+                total[key] += entry[key]
+        for total in totals.values():
+            total["total_ms"] = round(total["total_ms"], 1)
+        return {"by_provider": totals, "by_stage": entries}
+
+
+class Trace:
+    def __init__(self, name: str, attributes: Optional[Dict] = None):
+        self.trace_id = uuid.uuid4().hex
+        self.root = Span(name, attributes)
+        self.ledger = CallLedger()
+        # Worker thread'leri aynı span'lere yazar
+        self.lock = threading.Lock()
+
+    def to_dict(self) -> Dict:
+        with self.lock:
+            return {
+                "trace_id": self.trace_id,
+                "root": self.root.to_dict(self.root.start),
+                "calls": self.ledger.to_dict()
+            }
+
+    def log_summary(self) -> None:
+        with self.lock:
+            stages = ", ".join(
+                f"{child.name}={((child.end or time.perf_counter()) - child.start) * 1000:.0f}ms"
+                for child in self.root.children
+            )
+            calls = ", ".join(
+                f"{provider}={total['calls']}"
+                for provider, total in self.ledger.to_dict()["by_provider"].items()
+            )
+        logger.info(f"🧭 {self.root.name} izi: {stages or '-'} | çağrılar: {calls or '-'}")
+
+
+# --- İz ve Span'ler ---
+@contextmanager
+def start_trace(name: str, **attributes) -> Iterator[Trace]:
+    trace = Trace(name, attributes)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        trace.root.end = time.perf_counter()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get() or trace.root
+    child = Span(name, attributes)
+    with trace.lock:
+        parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Kısa ve sık tekrarlanan işlerin süresini aktif span altında toplar"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        target = _current_span.get() or trace.root
+        with trace.lock:
+            aggregate = target.aggregates.setdefault(name, [0, 0.0])
+            aggregate[0] += 1
+            aggregate[1] += elapsed
+
+
+def set_attribute(key: str, value) -> None:
+    current = _current_span.get()
+    if current is not None:
+        current.attributes[key] = value
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def record_call(provider: str, path: str, status: int, duration: float, rate_limited: int = 0) -> None:
+    """Dış HTTP çağrısını aktif izin defterine, çağrının yapıldığı aşamayla yazar"""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    current = _current_span.get()
+    stage_name = current.name if current is not None else trace.root.name
+    with trace.lock:
+        trace.ledger.record(provider, stage_name, _ID_SEGMENT.sub("/{id}", path), status, duration, rate_limited)
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """İşi çağıranın contextvar'larıyla (aktif iz/span) thread havuzuna gönderir"""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
@@ -13,38 +13,45 @@ from tenacity import (
     before_sleep_log
 )
 from pymongo.errors import PyMongoError
+from spotipy import Spotify
 from spotipy.exceptions import SpotifyException
+import requests
 from requests.exceptions import RequestException
 
+from metrics import RATE_LIMITER_WAIT, RATE_LIMITER_WAITS, instrument_session, retry_hook
+from retry_budget import wait_with_budget, stop_on_budget
+import tracing
+from logger import SampledLog
+
 # --- Logging Setup ---
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
+rate_limit_log = SampledLog(logger)
 
 # --- Constants ---
 MAX_RETRIES = 5
 MIN_WAIT = 2
 MAX_WAIT = 30
 REQUEST_TIMEOUT = 15
+GENRE_SUMMARY_VERSION = 1
+# Yük testlerinde sahte sağlayıcı sunucusuna yönlendirmek için (ör. http://127.0.0.1:9090/v1/)
+SPOTIFY_API_BASE = os.getenv("SPOTIFY_API_BASE")
 
 # --- Retry Configurations ---
 SPOTIFY_RETRY_CONFIG = {
-    'wait': wait_exponential(multiplier=1, min=MIN_WAIT, max=MAX_WAIT),
-    'stop': stop_after_attempt(MAX_RETRIES),
+    'wait': wait_with_budget(wait_exponential(multiplier=1, min=MIN_WAIT, max=MAX_WAIT)),
+    'stop': stop_after_attempt(MAX_RETRIES) | stop_on_budget(),
     'retry': retry_if_exception_type(
         (SpotifyException, RequestException, PyMongoError)
     ),
-    'before_sleep': before_sleep_log(logger, logging.WARNING),
+    'before_sleep': retry_hook("spotify", before_sleep_log(logger, logging.WARNING)),
     'reraise': True
 }
 
 MONGO_RETRY_CONFIG = {
-    'wait': wait_exponential(multiplier=1, min=1, max=10),
-    'stop': stop_after_attempt(3),
+    'wait': wait_with_budget(wait_exponential(multiplier=1, min=1, max=10)),
+    'stop': stop_after_attempt(3) | stop_on_budget(),
     'retry': retry_if_exception_type(PyMongoError),
-    'before_sleep': before_sleep_log(logger, logging.WARNING)
+    'before_sleep': retry_hook("mongo", before_sleep_log(logger, logging.WARNING))
 }
 
 
@@ -72,12 +79,13 @@ def validate_environment(func: Callable) -> Callable:
 
 
 def timed_execution(func: Callable) -> Callable:
-    """Fonksiyon çalışma süresini ölçen decorator"""
+    """Fonksiyon çalışma süresini ölçen decorator; aktif iz varsa span açar"""
 
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         start_time = time.monotonic()
-        result = func(*args, **kwargs)
+        with tracing.span(func.__name__):
+            result = func(*args, **kwargs)
         duration = time.monotonic() - start_time
         logger.info(
             f"{func.__name__} fonksiyonu {duration:.2f}s sürdü"
@@ -96,17 +104,27 @@ def smart_request_with_retry(
 ) -> Any:
     """
     Akıllı yeniden deneme mekanizmalı API isteği
+
+    429'da Retry-After beklemesi tenacity'nin wait adımında bir kez yapılır;
+    deneme sayısı ve süre aktif istek bütçesiyle sınırlıdır.
     """
-    try:
-        return func(*args, **kwargs)
-    except SpotifyException as e:
-        if e.http_status == 429:
-            retry_after = int(e.headers.get('Retry-After', 10))
-            logger.warning(
-                f"Rate limit aşıldı. {retry_after}s bekleniyor..."
-            )
-            time.sleep(retry_after)
-        raise
+    return func(*args, **kwargs)
+
+
+def create_spotify_client(**kwargs) -> Spotify:
+    """SPOTIFY_API_BASE tanımlıysa o adrese istek atan Spotify client'ı oluşturur.
+
+    spotipy'nin HTTP katmanındaki (urllib3) yeniden denemeleri kapatılır;
+    429/5xx hataları tenacity katmanlarına ve istek bütçesine bırakılır.
+    """
+    # Düz Session'ın adapter'ı durum koduna göre yeniden denemez: 429 yanıtı
+    # Retry-After başlığıyla SpotifyException olur (spotipy'nin kendi
+    # Retry'ı ise başlıksız "Max Retries" hatası üretir)
+    kwargs.setdefault("requests_session", instrument_session(requests.Session(), "spotify"))
+    client = Spotify(retries=0, status_retries=0, **kwargs)
+    if SPOTIFY_API_BASE:
+        client.prefix = SPOTIFY_API_BASE.rstrip("/") + "/"
+    return client
 
 
 @retry(**MONGO_RETRY_CONFIG)
@@ -138,6 +156,35 @@ def validate_track_ids(track_ids: List[str]) -> List[str]:
     ]
 
 
+def summarize_genre_map(genre_map: Dict[str, List[str]]) -> Dict:
+    """Tür dağılımını, sayıları ve toplamları tek geçişte hesaplar"""
+    counts = {}
+    distinct = set()
+    total = 0
+    for genre, track_ids in genre_map.items():
+        count = len(track_ids)
+        counts[genre] = count
+        total += count
+        distinct.update(track_ids)
+
+    breakdown = {
+        genre: {
+            "count": count,
+            "percentage": round(count / total * 100, 2) if total else 0.0
+        }
+        for genre, count in counts.items()
+    }
+
+    return {
+        "version": GENRE_SUMMARY_VERSION,
+        "breakdown": breakdown,
+        "genre_counts": counts,
+        "total_tracks": total,
+        "distinct_tracks": len(distinct),
+        "genre_count": len(counts)
+    }
+
+
 def validate_playlist_id(playlist_id: str) -> bool:
     """Playlist ID formatını kontrol eder"""
     return (
@@ -153,7 +200,7 @@ class ApiResponseFormatter:
         import logging
         logger = logging.getLogger(__name__)
 
-        logger.debug(f"✔️ success() çağrıldı. Veri tipi: {type(data)}")
+        logger.debug("✔️ success() çağrıldı. Veri tipi: %s", type(data))
 
         if asyncio.iscoroutine(data):
             logger.error("❌ UYARI: data bir coroutine! await unutulmuş olabilir.")
@@ -186,6 +233,8 @@ class RateLimiter:
         self.timestamps = []
 
     def __call__(self, func: Callable) -> Callable:
+        limiter_name = func.__qualname__
+
         if asyncio.iscoroutinefunction(func):
             @functools.wraps(func)
             async def async_wrapper(*args, **kwargs):
@@ -197,9 +246,9 @@ class RateLimiter:
 
                 if len(self.timestamps) >= self.calls:
                     sleep_time = self.period - (now - self.timestamps[0])
-                    logger.warning(
-                        f"Rate limit: {sleep_time:.1f}s bekleniyor..."
-                    )
+                    rate_limit_log.warning("Rate limit: %.1fs bekleniyor...", sleep_time)
+                    RATE_LIMITER_WAITS.inc(limiter_name)
+                    RATE_LIMITER_WAIT.inc(limiter_name, amount=sleep_time)
                     await asyncio.sleep(sleep_time)
 
                 self.timestamps.append(time.time())
@@ -217,9 +266,9 @@ class RateLimiter:
 
                 if len(self.timestamps) >= self.calls:
                     sleep_time = self.period - (now - self.timestamps[0])
-                    logger.warning(
-                        f"Rate limit: {sleep_time:.1f}s bekleniyor..."
-                    )
+                    rate_limit_log.warning("Rate limit: %.1fs bekleniyor...", sleep_time)
+                    RATE_LIMITER_WAITS.inc(limiter_name)
+                    RATE_LIMITER_WAIT.inc(limiter_name, amount=sleep_time)
                     time.sleep(sleep_time)
 
                 self.timestamps.append(time.time())
@@ -231,8 +280,8 @@ class RateLimiter:
 # --- Health Checks ---
 @validate_environment
 @timed_execution
-def perform_system_check() -> Dict:
-    """Sistem sağlık kontrolü yapar"""
+def perform_system_check(user_id: Optional[str] = None) -> Dict:
+    """Sistem sağlık kontrolü yapar; Spotify bağlantısı yalnızca user_id verilirse denenir"""
     checks = {
         "spotify_connection": False,
         "mongo_connection": False,
@@ -251,10 +300,11 @@ def perform_system_check() -> Dict:
         checks["mongo_connection"] = check_mongo_connection()
 
         # Spotify connection check
-        from spotify_auth import auth_manager
-        sp = auth_manager.get_valid_client()
-        sp.current_user()
-        checks["spotify_connection"] = True
+        if user_id:
+            from spotify_auth import auth_manager
+            sp = auth_manager.get_valid_client(user_id)
+            sp.current_user()
+            checks["spotify_connection"] = True
 
     except Exception as e:
         logger.error(f"Sistem kontrol hatası: {str(e)}")
@@ -1,9 +1,12 @@
 import os
+import sys
 import asyncio
 import logging
 import time
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
@@ -15,15 +18,24 @@ from pymongo.errors import PyMongoError
 # Dahili Modüller
 from data_store import (
     save_analysis,
+    save_analysis_trace,
     load_analysis,
+    load_analysis_summary,
+    analysis_exists,
     cache_tracks,
     get_cached_tracks,
     save_user_tracks,
     check_mongo_connection,
+    get_user_analyses,
+    load_analysis_genres,
+    iter_analysis_tracks,
+    iter_cached_track_ids,
+    STREAM_BATCH_SIZE,
     MongoDBManager
 )
-from genre_finder import GenreFinder, get_genre_breakdown
+from genre_finder import GenreFinder, SharedGenreCache, rank_genres
 from playlist_creator import PlaylistCreator
+from genre_clustering import cluster_tracks, clusters_to_genre_map, DEFAULT_CLUSTER_COUNT
 from utils import (
     chunk_list,
     validate_track_ids,
@@ -31,25 +43,33 @@ from utils import (
     smart_request_with_retry
 )
 from spotify_auth import auth_manager
-from logger import configure_logging
+from logger import configure_logging, SampledLog
+from models import TrackRecord, AnalysisIndex, tracks_to_dicts
+from metrics import retry_hook
+from retry_budget import wait_with_budget, stop_on_budget
+import tracing
+import progress
 from bson import ObjectId
 
 # --- Konfigürasyon ---
-configure_logging()
 logger = logging.getLogger(__name__)
+page_log = SampledLog(logger)
 
 # --- Ayarlar ---
 MAX_TRACKS = int(os.getenv("MAX_TRACKS", 5000))
 DEFAULT_CHUNK_SIZE = 100
 REQUEST_DELAY = float(os.getenv("SPOTIFY_REQUEST_DELAY", 0.2))
 MAX_WORKERS = int(os.getenv("WORKFLOW_MAX_WORKERS", 5))
+ANALYSIS_INDEX_CACHE_SIZE = int(os.getenv("ANALYSIS_INDEX_CACHE_SIZE", 32))
+# Playlist gruplama biçimleri: birincil tür ya da tür kümeleri (genre_clustering)
+PLAYLIST_GROUPINGS = ("genres", "clusters")
 
 # --- Retry Ayarları ---
 SPOTIFY_RETRY_CONFIG = {
-    'wait': wait_exponential(multiplier=1, min=2, max=30),
-    'stop': stop_after_attempt(5),
+    'wait': wait_with_budget(wait_exponential(multiplier=1, min=2, max=30)),
+    'stop': stop_after_attempt(5) | stop_on_budget(),
     'retry': retry_if_exception_type((SpotifyException, PyMongoError)),
-    'before_sleep': lambda _: logger.warning("İşlem yeniden deneniyor...")
+    'before_sleep': retry_hook("workflow", lambda _: logger.warning("İşlem yeniden deneniyor..."))
 }
 
 
@@ -59,15 +79,82 @@ class WorkflowError(Exception):
         super().__init__(f"{stage.upper()} Hatası: {message}")
 
 
+class AnalysisIndexCache:
+    """Süreç içi LRU analiz index önbelleği.
+
+    Her worker süreci kendi kopyasını tutar; başka bir worker'da silinen
+    analiz burada kalabileceği için girişler her kullanımda ucuz bir _id
+    sorgusuyla doğrulanır. Girişler sahibine göre etiketlenir, kullanıcı
+    geçmişi silinince yalnızca o kullanıcının analizleri çıkarılır.
+    """
+
+    def __init__(self, max_size: int = ANALYSIS_INDEX_CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[Optional[str], AnalysisIndex]]" = OrderedDict()
+
+    def get(self, analysis_id: str) -> Optional[AnalysisIndex]:
+        with self._lock:
+            entry = self._entries.get(analysis_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(analysis_id)
+            return entry[1]
+
+    def put(self, analysis_id: str, user_id: Optional[str], index: AnalysisIndex) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[analysis_id] = (user_id, index)
+            self._entries.move_to_end(analysis_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def evict(self, analysis_id: str) -> None:
+        with self._lock:
+            self._entries.pop(analysis_id, None)
+
+    def evict_user(self, user_id: str) -> int:
+        with self._lock:
+            doomed = [aid for aid, (owner, _) in self._entries.items() if owner == user_id]
+            for aid in doomed:
+                del self._entries[aid]
+            return len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+analysis_index_cache = AnalysisIndexCache()
+
+
+def get_analysis_index(analysis_id: str, stage: str = "index") -> AnalysisIndex:
+    """Analiz index'ini döndürür; önbellekteki giriş analiz hâlâ varsa kullanılır"""
+    index = analysis_index_cache.get(analysis_id)
+    if index is not None:
+        if analysis_exists(analysis_id):
+            return index
+        analysis_index_cache.evict(analysis_id)
+        raise WorkflowError("Analiz veya tür verisi bulunamadı", stage)
+
+    analysis = load_analysis(analysis_id)
+    if not analysis or "genres" not in analysis:
+        raise WorkflowError("Analiz veya tür verisi bulunamadı", stage)
+    index = AnalysisIndex.from_analysis(analysis)
+    analysis_index_cache.put(analysis_id, analysis.get("user_id"), index)
+    return index
+
+
 @retry(**SPOTIFY_RETRY_CONFIG)
-def initialize_services() -> Tuple[spotipy.Spotify, Dict]:
+def initialize_services(user_id: str) -> Tuple[spotipy.Spotify, Dict]:
     logger.info("🔄 Servisler başlatılıyor...")
 
     try:
         if not check_mongo_connection():
             raise WorkflowError("MongoDB bağlantısı başarısız", "initialization")
 
-        sp = auth_manager.get_valid_client()
+        sp = auth_manager.get_valid_client(user_id)
         user = smart_request_with_retry(sp.me)
         logger.info(f"✅ Spotify bağlantısı başarılı: {user['display_name']}")
         return sp, user
@@ -79,11 +166,12 @@ def initialize_services() -> Tuple[spotipy.Spotify, Dict]:
 
 @retry(**SPOTIFY_RETRY_CONFIG)
 @RateLimiter(calls=5, period=10)
-def get_user_tracks(sp: spotipy.Spotify, max_tracks: int = MAX_TRACKS) -> List[Dict]:
-    logger.info(f"🎵 En fazla {max_tracks} şarkı yükleniyor...")
+def get_user_tracks(sp: spotipy.Spotify, max_tracks: int = MAX_TRACKS) -> List[TrackRecord]:
+    logger.info("🎵 En fazla %d şarkı yükleniyor...", max_tracks)
 
     tracks = []
     offset = 0
+    pages = 0
     retry_count = 0
 
     try:
@@ -95,13 +183,8 @@ def get_user_tracks(sp: spotipy.Spotify, max_tracks: int = MAX_TRACKS) -> List[D
             )
 
             batch = [
-                {
-                    "id": item["track"]["id"],
-                    "name": item["track"]["name"],
-                    "artist": item["track"]["artists"][0]["name"],
-                    "added_at": item["added_at"],
-                    "preview_url": item["track"].get("preview_url")
-                } for item in results.get("items", []) if item.get("track")
+                TrackRecord.from_saved_item(item)
+                for item in results.get("items", []) if item.get("track")
             ]
 
             if not batch:
@@ -111,7 +194,9 @@ def get_user_tracks(sp: spotipy.Spotify, max_tracks: int = MAX_TRACKS) -> List[D
 
             tracks.extend(batch)
             offset += len(results.get("items", []))
-            logger.info(f"📥 Yüklenen şarkı: {len(tracks)}/{max_tracks}")
+            pages += 1
+            page_log.info("📥 Yüklenen şarkı: %d/%d", len(tracks), max_tracks)
+            progress.update("track_loading", pages=pages, tracks=min(len(tracks), max_tracks), max_tracks=max_tracks)
             time.sleep(REQUEST_DELAY)
 
         return tracks[:max_tracks]
@@ -121,11 +206,17 @@ def get_user_tracks(sp: spotipy.Spotify, max_tracks: int = MAX_TRACKS) -> List[D
         raise WorkflowError(str(e), "track_loading")
 
 
-def analyze_genres(track_ids: List[str]) -> Dict:
+def analyze_genres(
+        track_ids: List[str],
+        sp: Optional[spotipy.Spotify] = None,
+        shared_cache: Optional[SharedGenreCache] = None
+) -> Dict:
     try:
         logger.info(f"🔍 {len(track_ids)} şarkı için tür analizi başlıyor...")
-        finder = GenreFinder()
-        genre_map = finder.process_tracks(track_ids)
+        progress.stage("genre_resolution", tracks=len(track_ids))
+        with tracing.span("genre_resolution", track_count=len(track_ids)):
+            finder = GenreFinder(sp, shared_cache)
+            genre_map = finder.process_tracks(track_ids)
         logger.info(f"✨ {len(track_ids)} şarkı analiz edildi")
         return genre_map
     except Exception as e:
@@ -135,32 +226,37 @@ def analyze_genres(track_ids: List[str]) -> Dict:
 
 @RateLimiter(calls=3, period=60)
 async def create_playlists(
+        sp: spotipy.Spotify,
         analysis_data: Dict,
         confirmation: bool,
         selected_tracks: Optional[Dict[str, List[str]]] = None,
-        excluded_track_ids: Optional[List[str]] = None
+        excluded_track_ids: Optional[List[str]] = None,
+        user_id: Optional[str] = None,
+        grouping: str = "genres",
+        k: int = DEFAULT_CLUSTER_COUNT
 ) -> Dict:
     try:
         # 1. Gerekli verileri çıkar
-        genres = analysis_data.get("genres", {})
-        if not genres:
+        if not analysis_data.get("genres"):
             raise WorkflowError("Analiz verisi eksik veya hatalı", "playlist_creation")
+        if grouping not in PLAYLIST_GROUPINGS:
+            raise WorkflowError(f"Geçersiz gruplama: {grouping}", "playlist_creation")
+
+        # Çağıran analizi zaten yükledi; index yeniden okumadan bu belgeden kurulur
+        index = AnalysisIndex.from_analysis(analysis_data)
 
         # 2. Filtreleme işlemleri
-        filtered_genres = {}
+        excluded = set(excluded_track_ids or [])
         if selected_tracks:
-            filtered_genres = {
-                genre: [tid for tid in track_ids if tid not in (excluded_track_ids or [])]
-                for genre, track_ids in selected_tracks.items()
-            }
+            filtered_genres = index.select(selected_tracks, excluded)
         else:
-            filtered_genres = {
-                genre: [tid for tid in tids if tid not in (excluded_track_ids or [])]
-                for genre, tids in genres.items()
-            }
+            filtered_genres = index.filter(excluded)
+        if grouping == "clusters":
+            # Kümeleme track_cache okur ve NumPy ile hesaplanır; event loop bloklanmaz
+            filtered_genres = await asyncio.to_thread(group_by_clusters, index, filtered_genres, k)
 
-        # 3. Playlist oluşturucuyu başlat
-        creator = PlaylistCreator()
+        # 3. Playlist oluşturucuyu isteğin kullanıcısıyla başlat
+        creator = PlaylistCreator(sp, user_id)
 
         # 4. Playlist oluştur (await ile)
         results = await creator.create_genre_playlists(filtered_genres, confirmation)
@@ -182,7 +278,11 @@ async def create_playlists(
         raise WorkflowError(str(e), "playlist_creation")
 
 
-async def analyze_and_create_playlists(analysis_id: str) -> Dict:
+async def analyze_and_create_playlists(
+        analysis_id: str,
+        sp: spotipy.Spotify,
+        user_id: Optional[str] = None
+) -> Dict:
     """Tek fonksiyonla tüm süreci yönet"""
     try:
         analysis = load_analysis(analysis_id)
@@ -190,9 +290,9 @@ async def analyze_and_create_playlists(analysis_id: str) -> Dict:
             raise WorkflowError("Analiz bulunamadı", "loading")
 
         track_ids = [track["id"] for track in analysis.get("tracks", [])]
-        genre_map = analyze_genres(track_ids)
+        genre_map = analyze_genres(track_ids, sp)
 
-        creator = PlaylistCreator()
+        creator = PlaylistCreator(sp, user_id)
         results = await creator.create_genre_playlists(genre_map, True)
 
         return {
@@ -208,6 +308,7 @@ async def analyze_and_create_playlists(analysis_id: str) -> Dict:
         raise
 
 async def run_workflow(
+    user_id: str,
     max_tracks: int = 500,
     confirmation: bool = False,
     enable_caching: bool = True
@@ -221,48 +322,64 @@ async def run_workflow(
         "error_stage": None
     }
 
-    try:
-        sp, user = initialize_services()
-        tracks = get_user_tracks(sp, max_tracks)
-        result["stats"]["total_tracks"] = len(tracks)
-
-        if not tracks:
-            raise WorkflowError("Kullanıcının kayıtlı şarkısı bulunamadı", "track_loading")
-
-        genre_map = analyze_genres([t["id"] for t in tracks])
-        result["stats"]["unique_genres"] = len(genre_map)
-
-        creation_result = await create_playlists(genre_map, confirmation)
-        result.update(creation_result)
-
-        analysis_id = save_analysis({
-            "tracks": tracks,
-            "genres": genre_map,
-            "created_at": datetime.utcnow()
-        })
-        save_user_tracks(user["id"], tracks)
-
-        result.update({
-            "status": "completed",
-            "analysis_id": analysis_id,
-            "execution_time": round(time.time() - start_time, 2)
-        })
-
-    except WorkflowError as e:
-        result.update({
-            "status": "failed",
-            "error": str(e),
-            "error_stage": e.stage,
-            "execution_time": round(time.time() - start_time, 2)
-        })
+    with progress.bind(user_id, "run_workflow"), \
+            tracing.start_trace("run_workflow", user_id=user_id, max_tracks=max_tracks) as trace:
+        try:
+            progress.stage("initialization")
+            with tracing.span("initialization"):
+                sp, user = initialize_services(user_id)
+            progress.stage("track_loading", max_tracks=max_tracks)
+            with tracing.span("track_loading"):
+                tracks = get_user_tracks(sp, max_tracks)
+            result["stats"]["total_tracks"] = len(tracks)
+
+            if not tracks:
+                raise WorkflowError("Kullanıcının kayıtlı şarkısı bulunamadı", "track_loading")
+
+            genre_map = analyze_genres([t.id for t in tracks], sp)
+            result["stats"]["unique_genres"] = len(genre_map)
+
+            with tracing.span("playlist_creation"):
+                creation_result = await create_playlists(sp, {"genres": genre_map}, confirmation, user_id=user["id"])
+            result.update(creation_result)
+
+            progress.stage("persistence")
+            with tracing.span("persistence"):
+                track_dicts = tracks_to_dicts(tracks)
+                analysis_id = save_analysis({
+                    "tracks": track_dicts,
+                    "genres": genre_map,
+                    "created_at": datetime.utcnow()
+                })
+                save_user_tracks(user["id"], track_dicts)
+
+            result.update({
+                "status": "completed",
+                "analysis_id": analysis_id,
+                "execution_time": round(time.time() - start_time, 2)
+            })
+            progress.completed("run_workflow", analysis_id=analysis_id, stats=result["stats"])
+
+        except WorkflowError as e:
+            result.update({
+                "status": "failed",
+                "error": str(e),
+                "error_stage": e.stage,
+                "execution_time": round(time.time() - start_time, 2)
+            })
+            progress.failed("run_workflow", str(e))
 
-    except Exception as e:
-        result.update({
-            "status": "error",
-            "error": str(e),
-            "execution_time": round(time.time() - start_time, 2)
-        })
+        except Exception as e:
+            result.update({
+                "status": "error",
+                "error": str(e),
+                "execution_time": round(time.time() - start_time, 2)
+            })
+            progress.failed("run_workflow", str(e))
 
+    trace.log_summary()
+    result["trace"] = trace.to_dict()
+    save_analysis_trace(result.get("analysis_id"), result["trace"])
     return result
 
 
@@ -291,89 +408,158 @@ def print_summary(results: Dict) -> None:
 # --- Yeni Fonksiyonlar ---
 
 def get_breakdown_for_analysis(analysis_id: str) -> Dict:
-    analysis = load_analysis(analysis_id)
-    if not analysis or "genres" not in analysis:
+    summary = load_analysis_summary(analysis_id)
+    if not summary:
         raise WorkflowError("Analiz veya tür verisi bulunamadı", "breakdown")
-    return get_genre_breakdown(analysis["genres"])
+    return summary["breakdown"]
 
 
 def get_analysis_details(analysis_id: str) -> List[Dict]:
-    analysis = load_analysis(analysis_id)
-    if not analysis or "genres" not in analysis:
-        raise WorkflowError("Analiz veya tür verisi bulunamadı", "details")
+    index = get_analysis_index(analysis_id, "details")
 
-    genre_map = analysis["genres"]
-    track_id_set = {tid for tids in genre_map.values() for tid in tids}
-    cached_tracks = get_cached_tracks(list(track_id_set))
-
-    track_lookup = {t["_id"]: t for t in cached_tracks}
-    for t in analysis.get("tracks", []):
-        tid = t.get("id") or t.get("_id")
-        if tid:
-            track_lookup.setdefault(tid, {}).update({
-                "name": t.get("name"),
-                "artist": t.get("artist"),
-                "preview_url": t.get("preview_url")
-            })
+    # Analizde kaydı olmayan şarkılar yalnızca önbellekte varsa listelenir
+    track_lookup = index.tracks
+    missing_ids = [tid for tid in index.track_genres if tid not in track_lookup]
+    if missing_ids:
+        track_lookup = dict(track_lookup)
+        for t in get_cached_tracks(missing_ids, fields=["_id"]):
+            track_lookup[t["_id"]] = TrackRecord(t["_id"])
 
     genre_details = {}
-    for genre, track_ids in genre_map.items():
+    for genre, track_ids in index.genres.items():
         genre_details[genre] = [
             {
                 "id": tid,
-                "name": track_lookup.get(tid, {}).get("name", "Unknown"),
-                "artist": track_lookup.get(tid, {}).get("artist", "Unknown"),
-                "preview_url": track_lookup.get(tid, {}).get("preview_url")
+                "name": record.name or "Unknown",
+                "artist": record.artist or "Unknown",
+                "preview_url": record.preview_url
             }
-            for tid in track_ids if tid in track_lookup
+            for tid in track_ids
+            if (record := track_lookup.get(tid)) is not None
         ]
 
     return genre_details
 
 
+def stream_analysis_details(analysis_id: str, batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Dict]:
+    """get_analysis_details'in akış hâli; analiz yoksa akış başlamadan WorkflowError fırlatır.
+
+    Önce her tür için {"type": "genre"}, sonra her şarkı için {"type": "track"},
+    en sonda {"type": "end"} üretilir. Şarkı metadatası cursor'dan partiler
+    halinde okunur; bellekte yalnızca şarkı id → türler eşlemesi tutulur
+    (O(şarkı sayısı) id, metadata değil). Tür satırlarındaki sayılar
+    gerçekten gönderilecek şarkı satırlarıyla aynıdır.
+    """
+    genre_map = load_analysis_genres(analysis_id)
+    if genre_map is None:
+        raise WorkflowError("Analiz veya tür verisi bulunamadı", "details")
+    return _iter_analysis_details(analysis_id, genre_map, batch_size)
+
+
+def _iter_analysis_details(analysis_id: str, genre_map: Dict[str, List[str]], batch_size: int) -> Iterator[Dict]:
+    # Henüz yayınlanmamış şarkı → türler; şarkı yayınlandıkça çıkarılır
+    pending: Dict[str, tuple] = {}
+    for genre, track_ids in genre_map.items():
+        for tid in track_ids:
+            pending[tid] = pending.get(tid, ()) + (genre,)
+
+    # Gönderilebilecek şarkılar: analizde kaydı olanlar, olmayanlardan yalnızca önbellekte bulunanlar
+    stored = {track.get("id") for track in iter_analysis_tracks(analysis_id, batch_size, fields=("id",))}
+    cached = dict.fromkeys(iter_cached_track_ids([tid for tid in pending if tid not in stored], batch_size))
+    for genre, track_ids in genre_map.items():
+        count = sum(1 for tid in track_ids if tid in stored or tid in cached)
+        yield {"type": "genre", "genre": genre, "track_count": count}
+    genre_count = len(genre_map)
+    del genre_map, stored
+
+    emitted = 0
+    for track in iter_analysis_tracks(analysis_id, batch_size):
+        genres = pending.pop(track.get("id"), None)
+        for genre in genres or ():
+            emitted += 1
+            yield {
+                "type": "track",
+                "genre": genre,
+                "id": track["id"],
+                "name": track.get("name") or "Unknown",
+                "artist": track.get("artist") or "Unknown",
+                "preview_url": track.get("preview_url")
+            }
+
+    for tid in cached:
+        for genre in pending.get(tid, ()):
+            emitted += 1
+            yield {"type": "track", "genre": genre, "id": tid, "name": "Unknown", "artist": "Unknown", "preview_url": None}
+
+    yield {"type": "end", "genres": genre_count, "tracks": emitted}
+
+
 def get_filtered_genres(analysis_id: str, excluded_ids: List[str]) -> Dict[str, List[str]]:
-    analysis = load_analysis(analysis_id)
-    if not analysis or "genres" not in analysis:
-        raise WorkflowError("Analiz veya tür verisi bulunamadı", "filter")
+    index = get_analysis_index(analysis_id, "filter")
+    return index.filter(excluded_ids, drop_empty=True)
 
-    genre_map = analysis["genres"]
-    excluded_set = set(excluded_ids)
 
-    return {
-        genre: [tid for tid in tids if tid not in excluded_set]
-        for genre, tids in genre_map.items()
-        if any(tid not in excluded_set for tid in tids)
-    }
+def get_genre_clusters(analysis_id: str, k: int = DEFAULT_CLUSTER_COUNT) -> Dict:
+    """Analizdeki şarkıları track_cache'teki tüm türlerine göre k playlist kümesine ayırır"""
+    return cluster_index(get_analysis_index(analysis_id, "clusters"), k)
 
 
-def get_user_analysis_history(user_id: str) -> List[Dict]:
-    db = MongoDBManager()
-    collection = db.get_collection("analyses")
+def cluster_index(index: AnalysisIndex, k: int = DEFAULT_CLUSTER_COUNT) -> Dict:
+    track_ids = list(dict.fromkeys([*index.track_genres, *index.tracks]))
+
+    track_genres = {tid: [] for tid in track_ids}
+    for doc in get_cached_tracks(track_ids, fields=["genres", "sources"]):
+        if isinstance(doc.get("sources"), dict):
+            # Eski kayıtlarda "genres" kaynak sırasında; sıra her zaman kaynak puanlarından kurulur
+            track_genres[doc["_id"]] = rank_genres(doc["sources"])
+        elif isinstance(doc.get("genres"), list):
+            track_genres[doc["_id"]] = doc["genres"]
+    # Önbellekte tür listesi olmayan şarkılar analizdeki türleriyle katılır
+    for tid, genres in track_genres.items():
+        if not genres:
+            track_genres[tid] = list(index.track_genres.get(tid, ()))
+
+    with tracing.span("genre_clustering", track_count=len(track_ids)):
+        return cluster_tracks(track_genres, k)
+
+
+def group_by_clusters(
+        index: AnalysisIndex,
+        genre_map: Dict[str, List[str]],
+        k: int = DEFAULT_CLUSTER_COUNT
+) -> Dict[str, List[str]]:
+    """genre_map'teki şarkıları tür yerine kümelere göre gruplar (playlist adı = küme adı)"""
+    allowed = {tid for track_ids in genre_map.values() for tid in track_ids}
+    grouped = {}
+    for name, track_ids in clusters_to_genre_map(cluster_index(index, k)).items():
+        kept = [tid for tid in track_ids if tid in allowed]
+        if kept:
+            grouped[name] = kept
+    return grouped
+
+
+def get_user_analysis_history(
+        user_id: str,
+        limit: int = 20,
+        cursor: Optional[str] = None
+) -> Tuple[List[Dict], Optional[str]]:
+    return get_user_analyses(user_id, limit=limit, cursor=cursor)
+
 
-    analyses = collection.find(
-        {"user_id": user_id},
-        {"_id": 1, "created_at": 1, "tracks": 1, "genres": 1, "playlist_id": 1}
-    ).sort("created_at", -1)
-
-    return [
-        {
-            "analysis_id": str(doc["_id"]),
-            "created_at": doc.get("created_at"),
-            "track_count": len(doc.get("tracks", [])),
-            "genre_count": len(doc.get("genres", {}))
-        }
-        for doc in analyses
-    ]
 def delete_user_analysis_history(user_id: str) -> int:
     db = MongoDBManager()
     collection = db.get_collection("analyses")
     result = collection.delete_many({"user_id": user_id})
+    # Diğer worker'lardaki kopyalar get_analysis_index'teki varlık kontrolüyle düşer
+    analysis_index_cache.evict_user(user_id)
     return result.deleted_count
 
 # --- CLI Test ---
 if __name__ == "__main__":
+    configure_logging()
     try:
-        results = asyncio.run(run_workflow(max_tracks=100, confirmation=True))
+        # Kullanım: python workflow.py <spotify_user_id>
+        results = asyncio.run(run_workflow(sys.argv[1], max_tracks=100, confirmation=True))
         print("\n" + "=" * 50)
         print(f"{' SPOTİFY TÜR ORGANİZATÖRÜ ':=^50}")
 
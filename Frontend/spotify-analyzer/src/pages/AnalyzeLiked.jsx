@@ -4,6 +4,47 @@ import UserMenu from "../components/UserMenu.jsx";
 import PageWrapper from "../components/PageWrapper.jsx";
 import { API_BASE_URL } from "../config.js";
 
+// Sunucudaki aşama/sayaç olaylarını (SSE) ilerleme çubuğuna çevirir
+const STAGES = {
+  initialization: [2, "Spotify bağlantısı kuruluyor..."],
+  track_loading: [5, "Beğenilen şarkılar alınıyor..."],
+  genre_resolution: [30, "Türler çözülüyor..."],
+  persistence: [95, "Sonuçlar kaydediliyor..."],
+};
+
+function openProgressStream(setStatus, setProgress) {
+  if (typeof EventSource === "undefined") return Promise.resolve(null);
+  const source = new EventSource(`${API_BASE_URL}/progress/stream`, { withCredentials: true });
+
+  source.addEventListener("stage", (e) => {
+    const { stage } = JSON.parse(e.data);
+    if (!STAGES[stage]) return;
+    const [percent, label] = STAGES[stage];
+    setStatus(label);
+    setProgress((value) => Math.max(value, percent));
+  });
+
+  source.addEventListener("progress", (e) => {
+    const { stage, counters } = JSON.parse(e.data);
+    if (stage === "track_loading" && counters.max_tracks) {
+      setProgress((value) => Math.max(value, 5 + Math.round((25 * counters.tracks) / counters.max_tracks)));
+    } else if (stage === "genre_resolution" && counters.total) {
+      const done = counters.cache_hits + counters.resolved;
+      setStatus(`Türler çözülüyor (${done}/${counters.total})...`);
+      setProgress((value) => Math.max(value, 30 + Math.round((60 * done) / counters.total)));
+    }
+  });
+
+  // Akış açılmazsa analizi bekletme; ilerleme çubuğu olaysız da çalışır
+  return new Promise((resolve) => {
+    const timer = setTimeout(() => resolve(source), 1000);
+    source.onopen = () => {
+      clearTimeout(timer);
+      resolve(source);
+    };
+  });
+}
+
 function AnalyzeLiked() {
   const [status, setStatus] = useState("Hazırlanıyor...");
   const [progress, setProgress] = useState(0);
@@ -16,9 +57,10 @@ function AnalyzeLiked() {
     hasRun.current = true;
 
     const analyze = async () => {
+      const source = await openProgressStream(setStatus, setProgress);
       try {
         setStatus("Beğenilen şarkılar alınıyor...");
-        setProgress(25);
+        setProgress((value) => Math.max(value, 5));
 
         const res = await fetch(`${API_BASE_URL}/analyze-liked`, {
           method: "POST",
@@ -52,6 +94,8 @@ function AnalyzeLiked() {
         setError(err.message || "Bilinmeyen bir hata oluştu.");
         setStatus("Hata oluştu");
         setProgress(0);
+      } finally {
+        source?.close();
       }
     };
 